@@ -1,42 +1,44 @@
 import streamlit as st
 import os
 import sys
-from typing import List, Dict, Tuple
+import urllib.error
+from typing import List, Dict, Optional, Tuple
 
 # 현재 디렉토리를 Python 경로에 추가
 sys.path.append(os.path.dirname(__file__))
 
-from vector_db import VectorDB
-from llm_integration import SimpleRecommender, GemmaRecommender
+from service_client import ServiceClient, DEFAULT_SERVICE_URL
+
+# 서비스가 꺼져 있거나(연결 실패) 혼잡하거나(503) 응답이 끊긴 경우
+SERVICE_ERRORS = (urllib.error.URLError, ConnectionError, TimeoutError)
+
+def service_error_message(error: Exception) -> str:
+    if isinstance(error, urllib.error.HTTPError) and error.code == 503:
+        return "검색 서비스가 혼잡합니다. 잠시 후 다시 시도해주세요."
+    return f"검색 서비스 요청에 실패했습니다: {error}"
+
+@st.cache_data(ttl=600, show_spinner=False)
+def fetch_restaurant_list(base_url: str, index_version: Optional[str]) -> List[Dict]:
+    """식당 목록 (화면을 갱신할 때마다 받지 않고 인덱스 버전이 바뀔 때만 다시 받음)"""
+    return ServiceClient(base_url).stats()["restaurants"]
 
 class RestaurantRecommendationApp:
     def __init__(self):
-        self.vector_db = None
-        self.recommender = None
+        self.client = None
+        self.service_health = None
         self.use_llm = False
+        self.llm_max_time = None
         
-    @st.cache_resource
-    def load_vector_db(_self):
-        """벡터 DB 로드 (캐시됨)"""
-        vector_db = VectorDB()
-        
-        # 벡터 DB 파일 확인
-        index_path = "../models/faiss_index"
-        if not os.path.exists(os.path.join(index_path, "faiss_index.index")):
-            st.error("벡터 DB가 구축되지 않았습니다. src/vector_db.py를 먼저 실행해주세요.")
-            return None
-            
-        vector_db.load_index(index_path)
-        return vector_db
-    
-    @st.cache_resource
-    def load_llm_recommender(_self):
-        """LLM 추천기 로드 (캐시됨)"""
+    def connect_service(self):
+        """검색/추천 서비스 연결 확인 (벡터 DB와 모델은 service.py 프로세스가 한 번만 로드)"""
+        client = ServiceClient(os.environ.get("RECOMMENDER_SERVICE_URL", DEFAULT_SERVICE_URL))
         try:
-            return GemmaRecommender()
+            self.service_health = client.health()
         except Exception as e:
-            st.warning(f"LLM 로딩 실패: {e}")
+            st.error(f"검색 서비스에 연결할 수 없습니다 ({client.base_url}): {e}\n\n"
+                     "src/service.py를 먼저 실행해주세요.")
             return None
+        return client
     
     def run(self):
         # 페이지 설정
@@ -65,6 +67,12 @@ class RestaurantRecommendationApp:
                 help="Qwen2.5-1.5B-Instruct 모델로 자연스러운 추천글 생성 (1.5B 파라미터, 한국어 특화)"
             )
             
+            if self.use_llm:
+                self.llm_max_time = st.slider(
+                    "⏱️ AI 추천 최대 생성 시간(초)", 5, 60, 20,
+                    help="시간 안에 끝나지 않으면 마지막 완결 문장까지만 표시합니다"
+                )
+            
             # 검색 개수 설정
             num_results = st.slider("추천 식당 개수", 1, 5, 3)
             
@@ -79,21 +87,17 @@ class RestaurantRecommendationApp:
             3. 검색 버튼을 클릭하세요
             """)
         
-        # 벡터 DB 로드
-        if self.vector_db is None:
-            with st.spinner("벡터 DB 로딩 중..."):
-                self.vector_db = self.load_vector_db()
+        # 서비스 연결
+        if self.client is None:
+            self.client = self.connect_service()
                 
-        if self.vector_db is None:
+        if self.client is None:
             return
             
-        # LLM 로드 (필요시)
-        if self.use_llm and self.recommender is None:
-            with st.spinner("AI 모델 로딩 중... (최초 실행시 시간이 걸릴 수 있습니다)"):
-                self.recommender = self.load_llm_recommender()
-                if self.recommender is None:
-                    self.use_llm = False
-                    st.warning("LLM 로딩에 실패하여 간단 모드로 전환됩니다.")
+        # LLM은 서비스가 --llm으로 실행된 경우에만 사용 가능
+        if self.use_llm and not self.service_health["llm"]:
+            self.use_llm = False
+            st.warning("검색 서비스에 LLM이 로드되지 않아 간단 모드로 전환됩니다. (service.py --llm)")
         
         # 메인 컨텐츠
         col1, col2 = st.columns([2, 1])
@@ -131,41 +135,66 @@ class RestaurantRecommendationApp:
             
         # 샘플 데이터 표시
         with st.expander("📊 현재 데이터베이스 정보"):
-            if self.vector_db and self.vector_db.restaurants:
-                st.write(f"**총 {len(self.vector_db.restaurants)}개 식당 데이터**")
+            try:
+                service_stats = self.client.stats(restaurants=False)
+                restaurants = fetch_restaurant_list(self.client.base_url, self.service_health["index_version"])
+            except SERVICE_ERRORS as e:
+                st.error(service_error_message(e))
+                return
+            if restaurants:
+                st.write(f"**총 {len(restaurants)}개 식당 데이터**")
+                
+                if service_stats["query_cache"] is not None:
+                    cache_stats = service_stats["query_cache"]["results"]
+                    st.caption(f"검색 캐시: {cache_stats['entries']}개 항목, 적중률 {cache_stats['hit_rate']:.0%} "
+                               f"(적중 {cache_stats['hits']} / 미스 {cache_stats['misses']})")
                 
-                for restaurant in self.vector_db.restaurants:
+                for restaurant in restaurants:
                     st.write(f"- **{restaurant['name']}** ({restaurant['location']}) - {restaurant['menu_type']}")
     
     def perform_search(self, query: str, num_results: int):
         """검색 수행 및 결과 표시"""
         
-        with st.spinner("검색 중..."):
-            # 벡터 검색
-            search_results = self.vector_db.search(query, k=num_results)
+        try:
+            with st.spinner("검색 중..."):
+                # 검색은 서비스에서 수행, LLM 추천글은 검색 결과 뒤에 스트리밍으로 이어서 받음
+                search_results, llm_used, recommendation_stream = self.client.stream_recommend(
+                    query, k=num_results, use_llm=self.use_llm, max_time=self.llm_max_time
+                )
+        except SERVICE_ERRORS as e:
+            st.error(service_error_message(e))
+            return
             
         if not search_results:
+            # 추천글 스트림을 읽지 않으므로 연결을 바로 닫음
+            recommendation_stream.close()
             st.warning("검색 결과가 없습니다. 다른 키워드로 시도해보세요.")
             return
             
         st.markdown("---")
         st.subheader("🎯 검색 결과")
         
-        # 추천 텍스트 생성
-        if self.use_llm and self.recommender:
-            with st.spinner("AI가 추천글을 작성 중..."):
+        # 추천 텍스트 생성 (중간에 실패해도 연결은 닫음)
+        with recommendation_stream:
+            if llm_used:
+                st.markdown("### 🤖 AI 추천")
                 try:
-                    recommendation_text = self.recommender.generate_recommendation_text(query, search_results)
-                    st.markdown("### 🤖 AI 추천")
-                    st.markdown(recommendation_text)
+                    # 생성되는 대로 토큰을 바로 표시 (첫 토큰까지의 대기 시간 최소화)
+                    placeholder = st.empty()
+                    placeholder.markdown("_AI가 추천글을 작성 중..._")
+                    for recommendation_text in recommendation_stream:
+                        placeholder.markdown(recommendation_text)
                 except Exception as e:
                     st.error(f"AI 추천 생성 실패: {e}")
                     self.show_simple_results(search_results)
-        else:
-            # 간단한 결과 표시
-            simple_recommender = SimpleRecommender()
-            recommendation_text = simple_recommender.generate_recommendation_text(query, search_results)
-            st.markdown(recommendation_text)
+            else:
+                # 간단한 결과 표시 (서비스가 SimpleRecommender로 생성한 텍스트)
+                try:
+                    for recommendation_text in recommendation_stream:
+                        st.markdown(recommendation_text)
+                except SERVICE_ERRORS as e:
+                    st.error(service_error_message(e))
+                    self.show_simple_results(search_results)
             
         # 상세 결과 표시
         st.markdown("---")
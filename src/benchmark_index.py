@@ -0,0 +1,177 @@
+import argparse
+import json
+import os
+import time
+import numpy as np
+from typing import Dict, List, Tuple
+
+import index_factory
+from index_snapshots import resolve_snapshot
+from sparse_index import BM25Index
+
+def load_vectors(index_dir: str, synthetic: int, dimension: int, seed: int = 42) -> np.ndarray:
+    """벤치마크용 정규화 벡터 로드 (저장된 임베딩 또는 합성 데이터)"""
+    if synthetic > 0:
+        # 실제 임베딩처럼 군집 구조를 갖도록 중심점 주변에 샘플링
+        rng = np.random.default_rng(seed)
+        centers = rng.standard_normal((max(1, synthetic // 100), dimension)).astype(np.float32)
+        vectors = centers[rng.integers(0, len(centers), synthetic)]
+        vectors += 0.5 * rng.standard_normal(vectors.shape).astype(np.float32)
+    else:
+        vectors = np.load(os.path.join(resolve_snapshot(index_dir), "embeddings.npy")).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def make_queries(vectors: np.ndarray, num_queries: int, seed: int = 0) -> np.ndarray:
+    """데이터 벡터에 노이즈를 섞어 쿼리 생성"""
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.integers(0, len(vectors), num_queries)]
+    queries = queries + 0.3 * rng.standard_normal(queries.shape).astype(np.float32)
+    return np.ascontiguousarray(queries / np.linalg.norm(queries, axis=1, keepdims=True), dtype=np.float32)
+
+def recall_at_k(ground_truth: np.ndarray, retrieved: np.ndarray) -> float:
+    """flat 인덱스 결과 대비 recall@k"""
+    hits = sum(len(set(gt) & set(rt)) for gt, rt in zip(ground_truth, retrieved))
+    return hits / ground_truth.size
+
+def benchmark_config(name: str, index_type: str, vectors: np.ndarray, queries: np.ndarray,
+                     ground_truth: np.ndarray, k: int, index_params: Dict) -> Dict:
+    """단일 인덱스 설정의 구축 시간, recall@k, 쿼리 지연시간, 메모리 측정"""
+    start = time.perf_counter()
+    index = index_factory.build_index(index_type, vectors, index_params)
+    build_time = time.perf_counter() - start
+
+    _, retrieved = index.search(queries, k)
+
+    # 단건 쿼리 지연시간 (서빙 경로와 동일하게 쿼리 하나씩 검색)
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "name": name,
+        "index_type": index_type,
+        "index_params": index_params,
+        "recall_at_k": recall_at_k(ground_truth, retrieved),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "memory_mb": index_factory.index_memory_bytes(index) / 1024 / 1024,
+        "build_s": build_time,
+    }
+
+def build_synthetic_sparse(num_docs: int, num_queries: int, vocab_size: int = 20000, doc_len: int = 200,
+                           seed: int = 42) -> Tuple[BM25Index, List[str]]:
+    """합성 BM25 색인과 쿼리 생성
+
+    한글 음절 bigram 용어를 Zipf 분포로 뽑아, 흔한 bigram의 포스팅이 문서 대부분에 걸리는 실제 리뷰 색인과 비슷하게 만든다.
+    """
+    rng = np.random.default_rng(seed)
+    syllables = [chr(code) for code in range(0xAC00, 0xD7A4)]
+    terms = set()
+    while len(terms) < vocab_size:
+        first, second = rng.integers(0, len(syllables), 2)
+        terms.add(syllables[first] + syllables[second])
+    terms = sorted(terms)
+    probs = 1.0 / (np.arange(vocab_size) + 2.7)
+    probs /= probs.sum()
+
+    # (문서, 용어) 쌍을 세어 용어 빈도를 만들고 CSR 포스팅으로 바로 적재
+    pairs = np.repeat(np.arange(num_docs, dtype=np.int64), doc_len) * vocab_size
+    pairs += rng.choice(vocab_size, num_docs * doc_len, p=probs)
+    pairs, tfs = np.unique(pairs, return_counts=True)
+    index = BM25Index()
+    index.vocab = {term: i for i, term in enumerate(terms)}
+    index._set_postings(pairs % vocab_size, (pairs // vocab_size).astype(np.int32), tfs.astype(np.float32),
+                        np.arange(num_docs, dtype=np.int64), np.full(num_docs, doc_len, dtype=np.float32))
+
+    queries = [" ".join(terms[i] for i in rng.choice(vocab_size, rng.integers(2, 6), p=probs)) for _ in range(num_queries)]
+    return index, queries
+
+def benchmark_sparse(index: BM25Index, queries: List[str], k: int, mask_ratio: float, seed: int = 0) -> Dict:
+    """BM25 단건 쿼리 지연시간 측정 (mask_ratio > 0이면 그 비율의 문서만 허용하는 필터 적용)"""
+    doc_mask = None
+    if mask_ratio > 0:
+        doc_mask = np.random.default_rng(seed).random(len(index.doc_ids)) < mask_ratio
+    index.search(queries[0], k, doc_mask)
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, k, doc_mask)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "name": f"bm25(filter={mask_ratio:.0%})" if doc_mask is not None else "bm25",
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+def default_configs(dimension: int) -> List[Dict]:
+    """비교할 기본 인덱스 설정 목록"""
+    pq_m = 16 if dimension % 16 == 0 else 8
+    configs = [{"name": "flat", "index_type": "flat", "index_params": {}}]
+    for nprobe in (1, 8, 32):
+        configs.append({"name": f"ivf_flat(nprobe={nprobe})", "index_type": "ivf_flat", "index_params": {"nprobe": nprobe}})
+    for nprobe in (8, 32):
+        configs.append({"name": f"ivf_pq(m={pq_m},nprobe={nprobe})", "index_type": "ivf_pq",
+                        "index_params": {"nprobe": nprobe, "pq_m": pq_m}})
+    for ef_search in (16, 64, 256):
+        configs.append({"name": f"hnsw(efSearch={ef_search})", "index_type": "hnsw", "index_params": {"ef_search": ef_search}})
+    return configs
+
+def main():
+    parser = argparse.ArgumentParser(description="FAISS 인덱스 종류별 recall@k / 지연시간 / 메모리 비교")
+    parser.add_argument("--index-dir", default="models/faiss_index", help="embeddings.npy가 있는 디렉토리")
+    parser.add_argument("--synthetic", type=int, default=0, help="합성 벡터 개수 (0이면 저장된 임베딩 사용)")
+    parser.add_argument("--dimension", type=int, default=768, help="합성 벡터 차원")
+    parser.add_argument("--queries", type=int, default=1000, help="쿼리 개수")
+    parser.add_argument("-k", type=int, default=10, help="recall@k의 k")
+    parser.add_argument("--sparse-docs", type=int, default=0, help="합성 BM25 색인 문서 수 (0이면 키워드 검색 측정 생략)")
+    parser.add_argument("--output", help="결과를 저장할 JSON 파일 경로")
+    args = parser.parse_args()
+
+    vectors = load_vectors(args.index_dir, args.synthetic, args.dimension)
+    queries = make_queries(vectors, args.queries)
+    k = min(args.k, len(vectors))
+    print(f"벡터 {len(vectors)}개 (차원 {vectors.shape[1]}), 쿼리 {len(queries)}개, k={k}")
+
+    # 정답: 정확 검색(flat) 결과
+    flat_index = index_factory.build_index("flat", vectors)
+    _, ground_truth = flat_index.search(queries, k)
+
+    results = []
+    print(f"\n{'설정':<28} {'recall@k':>9} {'p50(ms)':>9} {'p99(ms)':>9} {'메모리(MB)':>11} {'구축(s)':>8}")
+    for config in default_configs(vectors.shape[1]):
+        try:
+            result = benchmark_config(config["name"], config["index_type"], vectors, queries,
+                                      ground_truth, k, config["index_params"])
+        except Exception as e:
+            print(f"{config['name']:<28} 실패: {e}")
+            continue
+        results.append(result)
+        print(f"{result['name']:<28} {result['recall_at_k']:>9.3f} {result['p50_ms']:>9.3f} "
+              f"{result['p99_ms']:>9.3f} {result['memory_mb']:>11.2f} {result['build_s']:>8.2f}")
+
+    report = {"num_vectors": len(vectors), "dimension": int(vectors.shape[1]), "k": k, "results": results}
+    if args.sparse_docs > 0:
+        start = time.perf_counter()
+        sparse_index, sparse_queries = build_synthetic_sparse(args.sparse_docs, args.queries)
+        build_time = time.perf_counter() - start
+        print(f"\n키워드 색인 {len(sparse_index)}개 문서, 포스팅 {len(sparse_index.posting_docs)}개 (구축 {build_time:.2f}s), k={args.k}")
+        print(f"{'설정':<28} {'p50(ms)':>9} {'p99(ms)':>9}")
+        sparse_results = []
+        for mask_ratio in (0.0, 0.5, 0.05):
+            result = benchmark_sparse(sparse_index, sparse_queries, args.k, mask_ratio)
+            sparse_results.append(result)
+            print(f"{result['name']:<28} {result['p50_ms']:>9.3f} {result['p99_ms']:>9.3f}")
+        report["sparse"] = {"num_docs": len(sparse_index), "num_postings": int(len(sparse_index.posting_docs)),
+                            "build_s": build_time, "k": args.k, "results": sparse_results}
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n결과 저장: {args.output}")
+
+if __name__ == "__main__":
+    main()
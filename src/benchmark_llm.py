@@ -0,0 +1,97 @@
+import argparse
+import json
+import subprocess
+import sys
+import time
+from typing import Dict
+
+# 벤치마크용 고정 검색 결과 (벡터 DB 없이 LLM 경로만 측정)
+SAMPLE_RESULTS = [
+    ({'name': '최원석의돼지한판&서해쭈꾸미 건대1호점', 'location': '건대', 'menu_type': '고기류',
+      'atmosphere': '회식, 단체모임', 'price_range': '2-4만원대', 'rating': 4.5,
+      'summary': '건대의 고기류 전문점. 회식, 단체모임 장소로 인기.'}, 0.82),
+    ({'name': '고베규카츠 건대점', 'location': '건대', 'menu_type': '고기류',
+      'atmosphere': '회식, 단체모임', 'price_range': '2-4만원대', 'rating': 4.5,
+      'summary': '건대의 고기류 전문점. 회식, 단체모임 장소로 인기.'}, 0.79),
+    ({'name': '송화산시도삭면 2호점', 'location': '건대', 'menu_type': '면요리',
+      'atmosphere': '간편식, 혼밥', 'price_range': '1-2만원대', 'rating': 4.0,
+      'summary': '건대의 면요리 전문점. 간편식, 혼밥 장소로 인기.'}, 0.71),
+]
+QUERIES = ["건대 고기집 추천해줘", "회식하기 좋은 식당", "혼밥하기 좋은 면요리집"]
+
+MODES = {
+    "baseline": {"cpu_int8": False, "prefix_cache": False},
+    "optimized": {"cpu_int8": True, "prefix_cache": True},
+}
+
+def current_rss_mb() -> float:
+    """현재 프로세스 RSS (MB, Linux /proc 기준)"""
+    with open("/proc/self/status", "r") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+def run_mode(mode: str, max_new_tokens: int, num_threads: int) -> Dict:
+    """한 가지 설정으로 모델을 로드하고 생성 속도/메모리 측정 (별도 프로세스에서 실행)"""
+    from llm_integration import GemmaRecommender
+
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    recommender = GemmaRecommender(max_new_tokens=max_new_tokens, num_threads=num_threads or None, **MODES[mode])
+    load_time = time.perf_counter() - start
+    rss_loaded = current_rss_mb()
+
+    runs = []
+    for query in QUERIES:
+        for _ in recommender.stream_recommendation_text(query, SAMPLE_RESULTS):
+            pass
+        runs.append(dict(recommender.last_generation_stats))
+
+    return {
+        "mode": mode,
+        "load_s": load_time,
+        "rss_before_mb": rss_before,
+        "rss_loaded_mb": rss_loaded,
+        "rss_after_generate_mb": current_rss_mb(),
+        "tokens_per_second": sum(r["new_tokens"] for r in runs) / sum(r["elapsed"] for r in runs),
+        "avg_time_to_first_token_s": sum(r["time_to_first_token"] or 0.0 for r in runs) / len(runs),
+        "runs": runs,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM CPU 추론 벤치마크 (fp32 vs int8 + prefix KV 캐시)")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--max-new-tokens", type=int, default=128)
+    parser.add_argument("--threads", type=int, default=0, help="CPU 스레드 수 (0이면 코어 수)")
+    parser.add_argument("--output", help="결과를 저장할 JSON 파일 경로")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_mode(args.worker, args.max_new_tokens, args.threads)))
+        return
+
+    # 설정마다 새 프로세스에서 측정해야 RSS가 서로 섞이지 않음
+    results = []
+    for mode in args.modes:
+        print(f"=== {mode} 측정 중 ===")
+        completed = subprocess.run(
+            [sys.executable, __file__, "--worker", mode, "--max-new-tokens", str(args.max_new_tokens),
+             "--threads", str(args.threads)],
+            capture_output=True, text=True, check=True,
+        )
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    print(f"\n{'설정':<10} {'tokens/s':>9} {'TTFT(s)':>8} {'RSS 로드후(MB)':>14} {'RSS 생성후(MB)':>14} {'로드(s)':>8}")
+    for result in results:
+        print(f"{result['mode']:<10} {result['tokens_per_second']:>9.2f} {result['avg_time_to_first_token_s']:>8.2f} "
+              f"{result['rss_loaded_mb']:>14.0f} {result['rss_after_generate_mb']:>14.0f} {result['load_s']:>8.1f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n결과 저장: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+import argparse
+import contextlib
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from benchmark_retrieval import git_commit, load_labeled_queries
+from benchmark_startup import SRC_DIR, _free_port, _poll_health
+from embedding_backends import STUB_LATENCY_ENV
+from service_client import ServiceClient
+
+# app.py 빠른 검색 버튼 쿼리
+QUICK_SEARCH_QUERIES = ["건대 고기집 추천해줘", "데이트하기 좋은 파스타집", "회식하기 좋은 식당", "고급스러운 일식집"]
+
+# 세션이 한 번에 수행하는 동작
+# - search: POST /search 한 번
+# - app: 앱 화면 갱신 한 번 (Streamlit은 상호작용마다 스크립트 전체를 다시 실행하므로
+#        /health 확인 → 스트리밍 /recommend(간단 모드) → 데이터베이스 정보의 /stats)
+# - app_llm: app과 같되 AI 추천 사용 (추천글 스트림을 끝까지 받음)
+SCENARIOS = ("search", "app", "app_llm")
+DEFAULT_MIX = "search=0.5,app=0.35,app_llm=0.15"
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """"search=0.5,app=0.5" → 시나리오별 비율 (합이 1이 되도록 정규화)"""
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise ValueError(f"알 수 없는 시나리오입니다: {name} (가능: {', '.join(SCENARIOS)})")
+        mix[name.strip()] = float(weight)
+    total = sum(mix.values())
+    if total <= 0:
+        raise ValueError("시나리오 비율의 합이 0입니다")
+    return {name: weight / total for name, weight in mix.items()}
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    """지연시간(초) 목록 → p50/p95/p99/평균 (ms)"""
+    if not values:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "mean_ms": None}
+    p50, p95, p99 = np.percentile(np.array(values) * 1000, [50, 95, 99]).tolist()
+    return {"p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "mean_ms": float(np.mean(values)) * 1000}
+
+class ProcessSampler:
+    """대상 프로세스의 CPU 사용률(%, 코어 1개 = 100)과 RSS(MB)를 주기적으로 기록 (Linux /proc 기준)"""
+
+    def __init__(self, pid: int, interval: float = 0.5):
+        self.pid = pid
+        self.interval = interval
+        self.samples: List[Dict] = []
+        self._ticks = os.sysconf("SC_CLK_TCK")
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _cpu_seconds(self) -> float:
+        with open(f"/proc/{self.pid}/stat", "r") as f:
+            # 프로세스 이름에 공백이 있을 수 있으므로 마지막 ')' 뒤부터 필드를 셈 (utime, stime은 14, 15번째)
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / self._ticks
+
+    def rss_mb(self) -> float:
+        with open(f"/proc/{self.pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+        return 0.0
+
+    def start(self) -> "ProcessSampler":
+        self._thread.start()
+        return self
+
+    def _run(self):
+        start = last_time = time.perf_counter()
+        last_cpu = self._cpu_seconds()
+        while not self._stop.wait(self.interval):
+            try:
+                now, cpu = time.perf_counter(), self._cpu_seconds()
+                self.samples.append({"t": now - start, "cpu_percent": (cpu - last_cpu) / (now - last_time) * 100,
+                                     "rss_mb": self.rss_mb()})
+            except OSError:
+                return
+            last_time, last_cpu = now, cpu
+
+    def stop(self) -> List[Dict]:
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+def run_action(client: ServiceClient, scenario: str, query: str, k: int, max_time: Optional[float]) -> Dict:
+    """동작 하나를 실행하고 전체 지연시간과 첫 응답(검색 결과/추천글 첫 줄)까지의 시간 기록"""
+    record = {"scenario": scenario, "first_result_s": None, "first_text_s": None}
+    start = time.perf_counter()
+    try:
+        if scenario == "search":
+            client.search(query, k=k)
+        else:
+            client.health()
+            _, _, texts = client.stream_recommend(query, k=k, use_llm=scenario == "app_llm", max_time=max_time)
+            record["first_result_s"] = time.perf_counter() - start
+            for _ in texts:
+                if record["first_text_s"] is None:
+                    record["first_text_s"] = time.perf_counter() - start
+            client.stats(restaurants=False)
+        record["status"] = "ok"
+    except urllib.error.HTTPError as e:
+        record["status"] = "busy" if e.code == 503 else "error"
+    except Exception:
+        record["status"] = "error"
+    record["latency_s"] = time.perf_counter() - start
+    return record
+
+def run_session(base_url: str, mix: Dict[str, float], queries: List[str], quick_ratio: float, k: int,
+                max_time: Optional[float], think_time: float, deadline: float, seed: int, records: List[Dict]):
+    """세션(브라우저 탭) 하나: deadline까지 동작을 고르고 실행한 뒤 think_time 전후로 쉼"""
+    rng = random.Random(seed)
+    client = ServiceClient(base_url)
+    scenarios, weights = list(mix), list(mix.values())
+    time.sleep(rng.uniform(0, think_time))
+    while time.perf_counter() < deadline:
+        query = rng.choice(QUICK_SEARCH_QUERIES if rng.random() < quick_ratio else queries)
+        records.append(run_action(client, rng.choices(scenarios, weights)[0], query, k, max_time))
+        if think_time:
+            time.sleep(rng.expovariate(1 / think_time))
+
+def run_level(base_url: str, concurrency: int, duration: float, sampler_pid: Optional[int], idle_rss: Optional[float],
+              sample_interval: float, **session_options) -> Dict:
+    """동시 세션 concurrency개로 duration초 동안 부하를 주고 처리량/지연시간/자원 사용량 요약"""
+    records: List[Dict] = []
+    sampler = ProcessSampler(sampler_pid, sample_interval).start() if sampler_pid else None
+    start = time.perf_counter()
+    deadline = start + duration
+    sessions = [threading.Thread(target=run_session, args=(base_url,),
+                                 kwargs=dict(session_options, deadline=deadline, seed=i, records=records), daemon=True)
+                for i in range(concurrency)]
+    for session in sessions:
+        session.start()
+    for session in sessions:
+        session.join()
+    elapsed = time.perf_counter() - start
+    samples = sampler.stop() if sampler else []
+
+    ok = [record for record in records if record["status"] == "ok"]
+    scenarios = {}
+    for scenario in SCENARIOS:
+        done = [record for record in records if record["scenario"] == scenario]
+        if not done:
+            continue
+        succeeded = [record for record in done if record["status"] == "ok"]
+        scenarios[scenario] = {
+            "count": len(done),
+            "errors": sum(record["status"] == "error" for record in done),
+            "busy": sum(record["status"] == "busy" for record in done),
+            **percentiles([record["latency_s"] for record in succeeded]),
+        }
+        if scenario != "search":
+            scenarios[scenario]["first_result"] = percentiles([record["first_result_s"] for record in succeeded])
+            scenarios[scenario]["first_text"] = percentiles(
+                [record["first_text_s"] for record in succeeded if record["first_text_s"] is not None])
+
+    summary = {
+        "concurrency": concurrency,
+        "duration_s": elapsed,
+        "requests": len(records),
+        "errors": sum(record["status"] == "error" for record in records),
+        "busy": sum(record["status"] == "busy" for record in records),
+        "throughput_rps": len(ok) / elapsed,
+        "latency": percentiles([record["latency_s"] for record in ok]),
+        "scenarios": scenarios,
+    }
+    if samples:
+        cpu = [sample["cpu_percent"] for sample in samples]
+        rss = [sample["rss_mb"] for sample in samples]
+        summary["cpu_percent"] = {"mean": float(np.mean(cpu)), "max": float(np.max(cpu))}
+        summary["rss_mb"] = {"start": rss[0], "peak": max(rss), "end": rss[-1]}
+        if idle_rss is not None:
+            # 세션 수에 비례해 늘어난 서비스 메모리 (요청별 버퍼/스트리밍 응답/캐시 항목)
+            summary["rss_per_session_mb"] = (max(rss) - idle_rss) / concurrency
+        summary["timeline"] = samples
+    return summary
+
+def build_stub_index(data_dir: str, save_dir: str):
+    """stub 임베딩 백엔드로 인덱스 구축 (모델 다운로드 없이 오프라인 부하 테스트용)"""
+    from vector_db import build_restaurant_db
+
+    print(f"stub 인덱스 구축 중: {data_dir} → {save_dir}")
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        build_restaurant_db(data_dir=data_dir, save_dir=save_dir, backend="stub", embedding_cache=False)
+
+def start_service(index_path: str, stub: bool, llm: bool, llm_stub_tps: float, stub_encode_ms: float,
+                  service_args: List[str], timeout: float) -> Tuple[subprocess.Popen, str]:
+    """service.py를 빈 생성 결과 캐시로 띄우고 임베딩 모델(과 LLM) 로드가 끝날 때까지 대기"""
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    cache_path = os.path.join(tempfile.mkdtemp(prefix="load_bench_"), "recommendation_cache.sqlite")
+    command = [sys.executable, os.path.join(SRC_DIR, "service.py"), "--index", index_path, "--port", str(port),
+               "--host", "127.0.0.1", "--reload-interval", "0", "--recommendation-cache", cache_path]
+    if stub:
+        command += ["--backend", "stub"]
+        if llm:
+            command += ["--llm-stub-tps", str(llm_stub_tps)]
+    elif llm:
+        command.append("--llm")
+    env = dict(os.environ, **{STUB_LATENCY_ENV: str(stub_encode_ms)})
+    process = subprocess.Popen(command + service_args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env)
+    deadline = time.perf_counter() + timeout
+    health = _poll_health(f"{base_url}/health", deadline, "embedding_model_loaded")
+    # LLM 로드가 끝날 때까지 대기 (로드에 실패하면 llm이 False가 되어 간단 모드로 동작)
+    while health is not None and health["llm"] and not health["llm_loaded"] and time.perf_counter() < deadline:
+        time.sleep(0.2)
+        health = _poll_health(f"{base_url}/health", deadline)
+    if health is None:
+        process.terminate()
+        raise RuntimeError(f"서비스가 {timeout}초 안에 준비되지 않았습니다")
+    return process, base_url
+
+def print_summary(levels: List[Dict], baseline: Optional[Dict] = None):
+    baseline_levels = {level["concurrency"]: level for level in (baseline or {}).get("levels", [])}
+    print(f"\n{'세션':>4} {'시나리오':<8} {'건수':>6} {'오류':>4} {'503':>4} {'p50(ms)':>9} {'p95(ms)':>9} "
+          f"{'p99(ms)':>9} {'첫 글(ms)':>9}")
+    for level in levels:
+        for name, scenario in level["scenarios"].items():
+            first_text = scenario.get("first_text", {}).get("p50_ms")
+            print(f"{level['concurrency']:>4} {name:<8} {scenario['count']:>6} {scenario['errors']:>4} "
+                  f"{scenario['busy']:>4} {scenario['p50_ms'] or 0:>9.1f} {scenario['p95_ms'] or 0:>9.1f} "
+                  f"{scenario['p99_ms'] or 0:>9.1f} {'-' if first_text is None else f'{first_text:.1f}':>9}")
+        line = f"     처리량 {level['throughput_rps']:.2f} req/s"
+        if "cpu_percent" in level:
+            line += (f", CPU 평균 {level['cpu_percent']['mean']:.0f}% / 최대 {level['cpu_percent']['max']:.0f}%, "
+                     f"RSS 최대 {level['rss_mb']['peak']:.0f}MB")
+            if "rss_per_session_mb" in level:
+                line += f" (세션당 +{level['rss_per_session_mb']:.2f}MB)"
+        previous = baseline_levels.get(level["concurrency"])
+        if previous:
+            change = level["throughput_rps"] / previous["throughput_rps"] - 1 if previous["throughput_rps"] else 0.0
+            line += f" | 기준 대비 처리량 {change:+.1%}"
+            if previous["latency"]["p95_ms"] and level["latency"]["p95_ms"]:
+                line += f", p95 {level['latency']['p95_ms'] / previous['latency']['p95_ms'] - 1:+.1%}"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="추천 앱 다중 세션 부하 테스트 (동시 세션별 처리량/지연시간/CPU/RSS)")
+    parser.add_argument("--url", help="이미 실행 중인 서비스 주소 (없으면 service.py를 직접 띄움)")
+    parser.add_argument("--pid", type=int, help="--url 서비스의 프로세스 id (CPU/RSS 측정용)")
+    parser.add_argument("--index", help="서비스에 로드할 인덱스 (--stub이면 기본: stub 인덱스를 구축해 사용)")
+    parser.add_argument("--stub", action="store_true",
+                        help="stub 임베딩 + stub LLM으로 서비스 실행 (모델 없이 오프라인에서 서비스 경로만 측정)")
+    parser.add_argument("--stub-index", default="../models/stub_index", help="--stub에서 사용할 인덱스 (없으면 구축)")
+    parser.add_argument("--stub-encode-ms", type=float, default=0.0, help="stub 임베딩의 텍스트당 모의 인코딩 시간(ms)")
+    parser.add_argument("--llm-stub-tps", type=float, default=20.0, help="stub LLM 생성 속도 (tokens/s)")
+    parser.add_argument("--data-dir", default="../data/", help="stub 인덱스 구축용 CSV 디렉토리")
+    parser.add_argument("--queries", default="../data/eval_queries.jsonl", help="자유 입력 쿼리 (JSONL의 query)")
+    parser.add_argument("--quick-ratio", type=float, default=0.3, help="빠른 검색 버튼 쿼리 비율")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"시나리오 비율 ({', '.join(SCENARIOS)})")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="동시 세션 수 (여러 개면 차례로)")
+    parser.add_argument("--duration", type=float, default=30.0, help="동시 세션 수마다 부하를 주는 시간(초)")
+    parser.add_argument("--think-time", type=float, default=1.0, help="세션의 동작 사이 평균 대기 시간(초, 지수 분포)")
+    parser.add_argument("--k", type=int, default=3, help="추천 식당 개수")
+    parser.add_argument("--llm-max-time", type=float, default=20.0, help="AI 추천 최대 생성 시간(초)")
+    parser.add_argument("--sample-interval", type=float, default=0.5, help="CPU/RSS 측정 주기(초)")
+    parser.add_argument("--timeout", type=float, default=300.0, help="서비스 준비 대기 시간(초)")
+    parser.add_argument("--baseline", help="비교할 이전 결과 JSON (처리량/p95 변화 출력)")
+    parser.add_argument("--output", help="결과를 저장할 JSON 파일 경로")
+    parser.add_argument("--service-args", nargs=argparse.REMAINDER, default=[], help="service.py에 넘길 추가 인자")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    queries = [entry["query"] for entry in load_labeled_queries(args.queries)] if os.path.exists(args.queries) \
+        else list(QUICK_SEARCH_QUERIES)
+    llm = "app_llm" in mix
+
+    process = None
+    base_url, pid = args.url, args.pid
+    if base_url is None:
+        index_path = args.index
+        if args.stub and index_path is None:
+            index_path = args.stub_index
+            if not os.path.exists(index_path):
+                build_stub_index(args.data_dir, index_path)
+        process, base_url = start_service(index_path or "../models/faiss_index", args.stub, llm, args.llm_stub_tps,
+                                          args.stub_encode_ms, args.service_args, args.timeout)
+        pid = process.pid
+    try:
+        health = ServiceClient(base_url).health()
+        print(f"대상 서비스: {base_url} (식당 {health['restaurants']}개, LLM {'사용' if health['llm'] else '미사용'}, "
+              f"{'stub' if args.stub else '실제 모델'})")
+        # 첫 요청의 지연 로드/캐시 준비가 측정에 섞이지 않도록 시나리오마다 한 번씩 먼저 실행
+        for scenario in mix:
+            run_action(ServiceClient(base_url), scenario, queries[0], args.k, args.llm_max_time)
+        idle_rss = ProcessSampler(pid).rss_mb() if pid else None
+
+        levels = []
+        for concurrency in args.concurrency:
+            print(f"=== 동시 세션 {concurrency}개, {args.duration:.0f}초 ===")
+            levels.append(run_level(base_url, concurrency, args.duration, pid, idle_rss, args.sample_interval,
+                                    mix=mix, queries=queries, quick_ratio=args.quick_ratio, k=args.k,
+                                    max_time=args.llm_max_time, think_time=args.think_time))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_summary(levels, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "commit": git_commit(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "config": {name: value for name, value in vars(args).items()
+                           if name not in ("url", "pid", "output", "baseline")},
+                "idle_rss_mb": idle_rss,
+                "levels": levels,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n결과 저장: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import unicodedata
+import numpy as np
+from typing import Dict, List
+
+import index_factory
+from embedding_backends import BACKENDS
+
+# 검색 모드별 VectorDB.search 옵션
+MODES = {
+    "dense": {"fusion": None, "rerank_results": False},
+    "hybrid": {"fusion": "weighted", "rerank_results": False},
+    "hybrid+rerank": {"fusion": "weighted", "rerank_results": True},
+    "rrf": {"fusion": "rrf", "rerank_results": False},
+    "rrf+rerank": {"fusion": "rrf", "rerank_results": True},
+}
+# 재정렬 점검: "<모드>+rerank"의 품질이 "<모드>"보다 이 값 이상 낮으면 회귀로 보고
+RERANK_TOLERANCE = 1e-9
+DEFAULT_MODELS = ["jhgan/ko-sroberta-multitask"]
+CUTOFFS = (1, 3, 5, 10)
+
+def load_labeled_queries(path: str) -> List[Dict]:
+    """정답 쿼리 파일 로드 (JSONL: {"query", "relevant"})
+
+    relevant는 식당 이름 리스트(관련도 1) 또는 {식당 이름: 관련도} dict
+    """
+    labeled = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            relevant = entry["relevant"]
+            if isinstance(relevant, list):
+                relevant = {name: 1 for name in relevant}
+            labeled.append({
+                "query": entry["query"],
+                "relevant": {unicodedata.normalize("NFC", name): grade for name, grade in relevant.items()},
+            })
+    return labeled
+
+def ranking_metrics(retrieved: List[str], relevant: Dict[str, float]) -> Dict[str, float]:
+    """한 쿼리의 recall@k / nDCG@k (CUTOFFS별)와 MRR"""
+    metrics = {}
+    ideal = sorted(relevant.values(), reverse=True)
+    gains = [relevant.get(name, 0) for name in retrieved]
+    for k in CUTOFFS:
+        metrics[f"recall@{k}"] = sum(1 for gain in gains[:k] if gain > 0) / len(relevant)
+        dcg = sum((2 ** gain - 1) / np.log2(rank + 2) for rank, gain in enumerate(gains[:k]))
+        idcg = sum((2 ** gain - 1) / np.log2(rank + 2) for rank, gain in enumerate(ideal[:k]))
+        metrics[f"ndcg@{k}"] = dcg / idcg if idcg > 0 else 0.0
+    first_hit = next((rank for rank, gain in enumerate(gains) if gain > 0), None)
+    metrics["mrr"] = 1.0 / (first_hit + 1) if first_hit is not None else 0.0
+    return metrics
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    return {f"p{p}_ms": float(np.percentile(latencies, p)) for p in (50, 95, 99)}
+
+def peak_rss_mb() -> float:
+    """프로세스 최대 RSS (MB, Linux ru_maxrss는 KB 단위)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def evaluate(vector_db, labeled: List[Dict], mode: str, repeat: int) -> Dict:
+    """정답 쿼리로 품질 지표와 인코딩/검색/전체 지연시간 측정"""
+    options = MODES[mode]
+    depth = max(CUTOFFS)
+    per_query = []
+    encode_ms, search_ms, end_to_end_ms = [], [], []
+    for entry in labeled:
+        query = entry["query"]
+        for _ in range(repeat):
+            # 전체: 캐시 없이 인코딩 + 검색
+            vector_db.query_cache.clear()
+            start = time.perf_counter()
+            results = vector_db.search(query, k=depth, **options)
+            end_to_end_ms.append((time.perf_counter() - start) * 1000)
+
+            # 검색: 쿼리 임베딩은 캐시에 있고 결과 캐시만 비운 상태
+            vector_db.query_cache.clear_results()
+            start = time.perf_counter()
+            vector_db.search(query, k=depth, **options)
+            search_ms.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            vector_db._encode_queries_uncached([query], batch_size=1)
+            encode_ms.append((time.perf_counter() - start) * 1000)
+        retrieved = [unicodedata.normalize("NFC", restaurant["name"]) for restaurant, _ in results]
+        per_query.append(ranking_metrics(retrieved, entry["relevant"]))
+
+    quality = {name: float(np.mean([metrics[name] for metrics in per_query])) for name in per_query[0]}
+    return {
+        "quality": quality,
+        "latency": {
+            "encode": percentiles(encode_ms),
+            "search": percentiles(search_ms),
+            "end_to_end": percentiles(end_to_end_ms),
+        },
+    }
+
+def run_model(model_name: str, data_dir: str, queries_path: str, index_types: List[str], modes: List[str],
+              repeat: int, backend: str = "torch") -> List[Dict]:
+    """임베딩 모델 하나로 DB를 구축하고 인덱스 종류 × 검색 모드별로 평가 (별도 프로세스에서 실행)"""
+    from data_preprocessing import RestaurantDataProcessor
+    from vector_db import VectorDB
+
+    labeled = load_labeled_queries(queries_path)
+    processor = RestaurantDataProcessor(data_dir)
+    restaurant_data = processor.preprocess_data()
+
+    rss_before = peak_rss_mb()
+    vector_db = VectorDB(model_name, backend=backend)
+    start = time.perf_counter()
+    vector_db.build_index(restaurant_data)
+    embed_s = time.perf_counter() - start
+    start = time.perf_counter()
+    vector_db.build_sparse_index(processor.iter_review_documents(restaurant_data))
+    sparse_s = time.perf_counter() - start
+
+    results = []
+    for index_type in index_types:
+        start = time.perf_counter()
+        vector_db.rebuild_index(index_type)
+        index_s = time.perf_counter() - start
+        for mode in modes:
+            result = evaluate(vector_db, labeled, mode, repeat)
+            result.update({
+                "model": model_name,
+                "backend": backend,
+                "index_type": index_type,
+                "index_params": vector_db.index_params,
+                "mode": mode,
+                "build": {
+                    "embed_s": embed_s,
+                    "sparse_index_s": sparse_s,
+                    "index_s": index_s,
+                    "index_memory_mb": index_factory.index_memory_bytes(vector_db.index) / 1024 / 1024,
+                    "peak_rss_mb": peak_rss_mb(),
+                    "peak_rss_growth_mb": peak_rss_mb() - rss_before,
+                },
+            })
+            results.append(result)
+    return results
+
+def rerank_regressions(results: List[Dict]) -> List[str]:
+    """재정렬을 켰을 때 같은 모델/백엔드/인덱스의 재정렬 없는 모드보다 낮아진 품질 지표"""
+    by_key = {(result["model"], result["backend"], result["index_type"], result["mode"]): result
+              for result in results}
+    regressions = []
+    for (model, backend, index_type, mode), result in by_key.items():
+        if not mode.endswith("+rerank"):
+            continue
+        base = by_key.get((model, backend, index_type, mode[:-len("+rerank")]))
+        if base is None:
+            continue
+        for name, value in result["quality"].items():
+            if value < base["quality"][name] - RERANK_TOLERANCE:
+                regressions.append(f"{model} ({backend}, {index_type}) {mode}: {name} "
+                                   f"{base['quality'][name]:.3f} → {value:.3f}")
+    return regressions
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return ""
+
+def main():
+    parser = argparse.ArgumentParser(description="정답 쿼리 기반 검색 품질(recall@k, MRR, nDCG) / 지연시간 / 구축 비용 벤치마크")
+    parser.add_argument("--data-dir", default="../data/", help="CSV 데이터 디렉토리")
+    parser.add_argument("--queries", default="../data/eval_queries.jsonl", help="정답 쿼리 JSONL 파일")
+    parser.add_argument("--models", nargs="+", default=DEFAULT_MODELS, help="비교할 임베딩 모델")
+    parser.add_argument("--backends", nargs="+", default=["torch"], choices=BACKENDS, help="비교할 임베딩 백엔드")
+    parser.add_argument("--index-types", nargs="+", default=list(index_factory.INDEX_TYPES),
+                        choices=index_factory.INDEX_TYPES)
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--repeat", type=int, default=3, help="쿼리당 지연시간 측정 반복 횟수")
+    parser.add_argument("--output", help="결과를 저장할 JSON 파일 경로")
+    parser.add_argument("--check-rerank", action="store_true",
+                        help="재정렬을 켰을 때 품질 지표가 하나라도 낮아지면 종료 코드 1")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--worker-backend", default="torch", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_model(args.worker, args.data_dir, args.queries, args.index_types, args.modes,
+                                   args.repeat, args.worker_backend), ensure_ascii=False))
+        return
+
+    # 모델/백엔드마다 새 프로세스에서 측정해야 최대 메모리가 서로 섞이지 않음
+    results = []
+    for model_name in args.models:
+        for backend in args.backends:
+            print(f"=== {model_name} ({backend}) 측정 중 ===")
+            completed = subprocess.run(
+                [sys.executable, __file__, "--worker", model_name, "--worker-backend", backend,
+                 "--data-dir", args.data_dir, "--queries", args.queries, "--index-types", *args.index_types,
+                 "--modes", *args.modes, "--repeat", str(args.repeat)],
+                capture_output=True, text=True,
+            )
+            if completed.returncode != 0:
+                print(f"{model_name} ({backend}) 실패:\n{completed.stderr[-2000:]}")
+                continue
+            results.extend(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    print(f"\n{'모델':<30} {'백엔드':<10} {'인덱스':<9} {'모드':<14} {'R@3':>6} {'MRR':>6} {'nDCG@3':>7} "
+          f"{'검색p50':>8} {'전체p95':>8} {'임베딩(s)':>9} {'RSS(MB)':>8}")
+    for result in results:
+        quality, latency, build = result["quality"], result["latency"], result["build"]
+        print(f"{result['model'][-30:]:<30} {result['backend']:<10} {result['index_type']:<9} {result['mode']:<14} "
+              f"{quality['recall@3']:>6.3f} {quality['mrr']:>6.3f} {quality['ndcg@3']:>7.3f} "
+              f"{latency['search']['p50_ms']:>8.2f} {latency['end_to_end']['p95_ms']:>8.2f} "
+              f"{build['embed_s']:>9.1f} {build['peak_rss_mb']:>8.0f}")
+
+    regressions = rerank_regressions(results)
+    if regressions:
+        print("\n⚠️ 재정렬 후 품질 하락:")
+        for regression in regressions:
+            print(f"  {regression}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "commit": git_commit(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "queries": os.path.abspath(args.queries),
+                "num_queries": len(load_labeled_queries(args.queries)),
+                "results": results,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n결과 저장: {args.output}")
+    if args.check_rerank and regressions:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
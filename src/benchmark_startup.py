@@ -0,0 +1,157 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+import numpy as np
+from typing import Dict, List, Optional
+
+from benchmark_retrieval import git_commit
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 무거운 의존성 (import 시점에 로드되면 시작이 수 초 늦어짐)
+HEAVY_MODULES = ("torch", "transformers", "sentence_transformers", "optimum", "onnxruntime", "pandas", "faiss",
+                 "streamlit")
+
+# 진입점별로 import 시점에 로드되면 안 되는 모듈
+# app은 서비스 클라이언트이므로 검색/LLM 스택 전체, 서비스/검색은 LLM·임베딩 모델과 전처리(pandas)
+FORBIDDEN_MODULES = {
+    "app": ("torch", "transformers", "sentence_transformers", "optimum", "onnxruntime", "pandas", "faiss"),
+    "service": ("torch", "transformers", "sentence_transformers", "optimum", "onnxruntime", "pandas"),
+    "vector_db": ("torch", "transformers", "sentence_transformers", "optimum", "onnxruntime", "pandas"),
+    "llm_integration": ("torch", "transformers"),
+    "recommendation_cache": ("torch", "transformers"),
+}
+
+# 새 인터프리터에서 모듈 하나를 import하고 소요 시간과 로드된 무거운 모듈을 출력
+IMPORT_PROBE = """
+import json, sys, time
+sys.path.insert(0, {src_dir!r})
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"import_ms": elapsed * 1000,
+                   "heavy": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+def measure_import(module: str, repeat: int) -> Dict:
+    """모듈 import 시간 (매번 새 프로세스, 중앙값) + import 시점에 로드된 무거운 모듈"""
+    code = IMPORT_PROBE.format(src_dir=SRC_DIR, module=module, heavy=HEAVY_MODULES)
+    import_ms, process_ms, heavy = [], [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+        process_ms.append((time.perf_counter() - start) * 1000)
+        if completed.returncode != 0:
+            return {"module": module, "error": (completed.stderr.strip().splitlines() or ["?"])[-1]}
+        probe = json.loads(completed.stdout.strip().splitlines()[-1])
+        import_ms.append(probe["import_ms"])
+        heavy = probe["heavy"]
+    forbidden = [name for name in heavy if name in FORBIDDEN_MODULES.get(module, ())]
+    return {
+        "module": module,
+        "import_ms": float(np.median(import_ms)),
+        "process_ms": float(np.median(process_ms)),
+        "heavy_modules": heavy,
+        "forbidden_modules": forbidden,
+    }
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _poll_health(url: str, until: float, ready_key: Optional[str] = None) -> Optional[Dict]:
+    while time.perf_counter() < until:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                health = json.loads(response.read())
+            if ready_key is None or health.get(ready_key):
+                return health
+        except OSError:
+            pass
+        time.sleep(0.05)
+    return None
+
+def measure_service_startup(index_path: str, timeout: float, extra_args: List[str]) -> Dict:
+    """service.py 실행부터 /health 응답까지, 임베딩 모델 로드 완료까지, 첫 검색 응답까지의 시간"""
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(SRC_DIR, "service.py"), "--index", index_path, "--port", str(port),
+         "--host", "127.0.0.1", "--reload-interval", "0", *extra_args],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = start + timeout
+        if _poll_health(f"{base_url}/health", deadline) is None:
+            raise RuntimeError(f"서비스가 {timeout}초 안에 시작되지 않았습니다")
+        health_s = time.perf_counter() - start
+        _poll_health(f"{base_url}/health", deadline, "embedding_model_loaded")
+        model_s = time.perf_counter() - start
+        request = urllib.request.Request(f"{base_url}/search", data=json.dumps({"query": "맛집", "k": 3}).encode("utf-8"),
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+        first_search_s = time.perf_counter() - start
+    finally:
+        process.terminate()
+        process.wait()
+    return {"health_s": health_s, "embedding_model_loaded_s": model_s, "first_search_s": first_search_s}
+
+def main():
+    parser = argparse.ArgumentParser(description="진입점 import 시간 / 서비스 시작 시간 벤치마크")
+    parser.add_argument("--modules", nargs="+", default=list(FORBIDDEN_MODULES), help="측정할 모듈")
+    parser.add_argument("--repeat", type=int, default=5, help="모듈당 측정 횟수 (새 프로세스)")
+    parser.add_argument("--service-index", help="지정하면 이 인덱스로 service.py를 띄워 시작 시간도 측정")
+    parser.add_argument("--service-args", nargs=argparse.REMAINDER, default=[], help="service.py에 넘길 추가 인자")
+    parser.add_argument("--timeout", type=float, default=300.0, help="서비스 시작 대기 시간(초)")
+    parser.add_argument("--check", action="store_true",
+                        help="금지된 무거운 모듈이 import 시점에 로드되면 실패 (종료 코드 1)")
+    parser.add_argument("--max-import-ms", type=float, help="--check에서 허용할 모듈별 최대 import 시간(ms)")
+    parser.add_argument("--output", help="결과를 저장할 JSON 파일 경로")
+    args = parser.parse_args()
+
+    results = [measure_import(module, args.repeat) for module in args.modules]
+    print(f"{'모듈':<22} {'import(ms)':>11} {'프로세스(ms)':>12}  무거운 모듈")
+    failures = []
+    for result in results:
+        if "error" in result:
+            print(f"{result['module']:<22} 실패: {result['error']}")
+            continue
+        print(f"{result['module']:<22} {result['import_ms']:>11.1f} {result['process_ms']:>12.1f}  "
+              f"{', '.join(result['heavy_modules']) or '-'}")
+        if result["forbidden_modules"]:
+            failures.append(f"{result['module']}: import 시점에 {', '.join(result['forbidden_modules'])} 로드")
+        if args.max_import_ms is not None and result["import_ms"] > args.max_import_ms:
+            failures.append(f"{result['module']}: import {result['import_ms']:.0f}ms > {args.max_import_ms:.0f}ms")
+
+    service = None
+    if args.service_index:
+        service = measure_service_startup(args.service_index, args.timeout, args.service_args)
+        print(f"\n서비스 /health 응답: {service['health_s']:.2f}s, 임베딩 모델 로드 완료: "
+              f"{service['embedding_model_loaded_s']:.2f}s, 첫 검색 응답: {service['first_search_s']:.2f}s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "commit": git_commit(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "imports": results,
+                "service": service,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n결과 저장: {args.output}")
+
+    if args.check and failures:
+        print("\n시작 시간 점검 실패:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
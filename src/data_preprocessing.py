@@ -1,82 +1,268 @@
 import pandas as pd
 import numpy as np
 import glob
+import hashlib
 import os
-from typing import List, Dict
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Optional, Iterator, Tuple
+
+import metrics
+from reranker import REVIEW_SNIPPET_SEPARATOR
+
+REQUIRED_COLUMNS = ['식당명', '작성일', '방문횟수', '리뷰 내용', '리뷰 태그']
+
+# 평점 추정용 감성 키워드 (단일 정규식으로 컴파일하여 한 번의 스캔으로 모두 매칭)
+POSITIVE_WORDS = ['맛있', '좋', '추천', '최고', '훌륭', '만족']
+NEGATIVE_WORDS = ['별로', '실망', '아쉽', '그냥', '보통']
+POSITIVE_PATTERN = re.compile("|".join(map(re.escape, POSITIVE_WORDS)))
+NEGATIVE_PATTERN = re.compile("|".join(map(re.escape, NEGATIVE_WORDS)))
+# 리뷰별 긍정/부정 키워드 수 컬럼 (리뷰 저장소에 저장되어 있으면 다시 세지 않음)
+SENTIMENT_COLUMNS = ['긍정 키워드 수', '부정 키워드 수']
+
+# 식당명 기반 위치/메뉴 분류 규칙 (위에서부터 먼저 매칭되는 규칙 적용)
+LOCATIONS = ("건대", "홍대", "성수")
+MENU_RULES = [
+    (re.compile("돼지|고기|갈비|삼겹|곱창|규카츠"), "고기류", "회식, 단체모임", "2-4만원대"),
+    (re.compile("면|국수|라면|우동"), "면요리", "간편식, 혼밥", "1-2만원대"),
+    (re.compile("카츠|일식|스시|회"), "일식", "데이트, 모임", "2-5만원대"),
+    (re.compile("빙수|디저트|카페"), "디저트", "데이트, 휴식", "1-2만원대"),
+    (re.compile("포케|타코|웨스턴"), "퓨전", "캐주얼, 데이트", "1-3만원대"),
+]
+DEFAULT_MENU_INFO = ("한식", "캐주얼", "1-3만원대")
+
+# 중복 리뷰 처리 방식 (drop: 대표 리뷰만 남김 / weight: 모두 남기되 평점 계산에서 묶음 크기로 나눈 가중치)
+DEDUP_MODES = ("drop", "weight")
+# 제거한 리뷰로 절약한 임베딩 연산 추정용 (ko-sroberta-multitask ≈ 1.1억 파라미터, 한국어 WordPiece ≈ 토큰당 2글자)
+EMBEDDING_MODEL_PARAMS = 110_000_000
+CHARS_PER_TOKEN = 2.0
+# cross-encoder 재정렬에 쓸 식당별 대표 리뷰 (긴 리뷰 순, 리뷰마다 앞부분만, 구분자로 이어 저장)
+REVIEW_SNIPPET_COUNT = 3
+REVIEW_SNIPPET_CHARS = 200
+
+def review_snippets(reviews: pd.Series, count: int = REVIEW_SNIPPET_COUNT,
+                    max_chars: int = REVIEW_SNIPPET_CHARS) -> str:
+    """내용이 가장 긴 서로 다른 리뷰 count개의 앞부분을 REVIEW_SNIPPET_SEPARATOR로 이은 문자열"""
+    texts = sorted({" ".join(str(review).split()) for review in reviews}, key=lambda text: (-len(text), text))
+    return REVIEW_SNIPPET_SEPARATOR.join(text[:max_chars] for text in texts[:count] if text)
+
+def score_reviews(reviews: pd.Series) -> pd.DataFrame:
+    """리뷰별 긍정/부정 키워드 수 (컴파일된 정규식으로 컬럼 단위 벡터화 계산, 컬럼명은 SENTIMENT_COLUMNS)"""
+    reviews = reviews.fillna('').astype(str)
+    return pd.DataFrame({
+        SENTIMENT_COLUMNS[0]: reviews.str.count(POSITIVE_PATTERN.pattern).to_numpy(dtype=np.int32),
+        SENTIMENT_COLUMNS[1]: reviews.str.count(NEGATIVE_PATTERN.pattern).to_numpy(dtype=np.int32),
+    }, index=reviews.index)
+
+def list_csv_files(data_dir: str) -> List[str]:
+    """데이터 디렉토리의 CSV 파일 목록 (정렬됨)"""
+    return sorted(glob.glob(os.path.join(data_dir, "*.csv")))
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    """파일 내용 기반 SHA-256 해시 (증분 빌드 매니페스트용)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def tag_text(tags) -> str:
+    """'리뷰 태그' 값 → 쉼표 구분 문자열 (리뷰 저장소에서 읽은 값은 이미 분리된 태그 목록)"""
+    if isinstance(tags, (list, tuple, np.ndarray)):
+        return ", ".join(tags)
+    return str(tags)
+
+def count_tags(df: pd.DataFrame) -> Counter:
+    """'리뷰 태그' 컬럼의 쉼표 구분 태그 빈도"""
+    tag_counts = Counter()
+    for tags in df['리뷰 태그'].dropna():
+        if isinstance(tags, (list, tuple, np.ndarray)):
+            tag_counts.update(tags)
+        else:
+            tag_counts.update(tag.strip() for tag in str(tags).split(','))
+    return tag_counts
+
+class ReviewDeduplicator:
+    """문자 shingle MinHash + LSH 기반 유사 중복 리뷰 탐지
+
+    리뷰마다 shingle_size 글자 shingle 집합의 MinHash 서명(num_perm개 해시의 최솟값)을 NumPy로 계산하고,
+    서명을 bands개 구간으로 나눠 한 구간이라도 값이 같은 리뷰끼리만 비교하므로 전체 쌍 비교 없이 거의 선형 시간.
+    후보 중 추정 Jaccard 유사도(서명 일치 비율)가 threshold 이상이면 같은 묶음으로 합치고 묶음의 첫 리뷰를 대표로 둠.
+    버킷에는 묶음마다 리뷰 하나만 남기므로 같은 템플릿 리뷰가 많아도 비교 횟수는 리뷰 수에 비례
+    """
+
+    MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+
+    def __init__(self, shingle_size: int = 5, num_perm: int = 64, bands: int = 16, threshold: float = 0.8,
+                 seed: int = 1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm({num_perm})은 bands({bands})로 나누어떨어져야 합니다")
+        self.shingle_size = shingle_size
+        self.num_perm = num_perm
+        self.bands = bands
+        self.threshold = threshold
+        rng = np.random.default_rng(seed)
+        # (a * h + b) mod p 해시족, a, b, h < p = 2^31 - 1이므로 uint64에서 넘치지 않음
+        # (a, b를 p보다 작게 뽑지 않으면 mod가 한 번도 일어나지 않는 작은 h가 모든 해시에서 최솟값이 되어 서명이 겹침)
+        prime = int(self.MERSENNE_PRIME)
+        self._a = rng.integers(1, prime, num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.integers(0, prime, num_perm, dtype=np.uint64)[:, None]
+        self._powers = np.uint64(1_000_003) ** np.arange(shingle_size - 1, -1, -1, dtype=np.uint64)
+
+    def shingle_hashes(self, text: str) -> np.ndarray:
+        """공백을 정규화한 텍스트의 글자 shingle 해시 (p 미만, shingle_size보다 짧으면 전체를 shingle 하나로)"""
+        codes = np.frombuffer(" ".join(text.split()).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        if len(codes) < self.shingle_size:
+            codes = np.concatenate([codes, np.zeros(self.shingle_size - len(codes), dtype=np.uint64)])
+        windows = np.lib.stride_tricks.sliding_window_view(codes, self.shingle_size)
+        return np.unique((windows * self._powers).sum(axis=1) % self.MERSENNE_PRIME)
+
+    def signatures(self, texts: List[str]) -> np.ndarray:
+        """(리뷰 수, num_perm) MinHash 서명"""
+        signatures = np.empty((len(texts), self.num_perm), dtype=np.uint64)
+        for i, text in enumerate(texts):
+            hashes = self.shingle_hashes(text)[None, :]
+            signatures[i] = ((self._a * hashes + self._b) % self.MERSENNE_PRIME).min(axis=1)
+        return signatures
+
+    def find_duplicates(self, texts: List[str]) -> np.ndarray:
+        """리뷰별 대표 리뷰 위치 (대표 리뷰는 자기 자신, 빈 리뷰는 중복으로 보지 않음)"""
+        parent = np.arange(len(texts))
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        positions = [i for i, text in enumerate(texts) if text.strip()]
+        if len(positions) < 2:
+            return parent
+        signatures = self.signatures([texts[i] for i in positions])
+        rows = self.num_perm // self.bands
+        for band in range(self.bands):
+            buckets = {}
+            band_keys = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+            for i, key in enumerate(map(bytes, band_keys)):
+                # 버킷의 묶음별 대표 리뷰와만 비교 (이미 같은 묶음이면 건너뜀)
+                bucket = buckets.setdefault(key, [])
+                merged = False
+                for j in bucket:
+                    root_i, root_j = find(positions[i]), find(positions[j])
+                    if root_i == root_j:
+                        merged = True
+                    elif np.count_nonzero(signatures[i] == signatures[j]) >= self.threshold * self.num_perm:
+                        parent[max(root_i, root_j)] = min(root_i, root_j)
+                        merged = True
+                if not merged:
+                    bucket.append(i)
+        return np.array([find(i) for i in range(len(texts))])
+
+def _ingest_csv_file(data_dir: str, csv_file: str, position: int, dedup: Optional[str] = None,
+                     dedup_threshold: float = 0.8) -> Tuple[str, Optional[Dict], Counter, Optional[Dict], Optional[Tuple]]:
+    """프로세스 풀 작업: CSV 하나를 식당 레코드 + 태그 빈도 + 중복 리뷰 통계로 축약 (DataFrame은 워커 안에서 해제)
+
+    중복 처리 모드면 (리뷰 수, 리뷰별 대표 리뷰 위치)도 돌려줘 부모 프로세스가 청크/키워드 색인 단계에서 다시 계산하지 않음
+    """
+    processor = RestaurantDataProcessor(data_dir, dedup=dedup, dedup_threshold=dedup_threshold)
+    df = processor.load_csv_file(csv_file)
+    if df is None:
+        return csv_file, None, Counter(), None, None
+    restaurant = processor.process_restaurant(df, csv_file, position)
+    source_file = os.path.basename(csv_file)
+    return (csv_file, restaurant, count_tags(df), processor.dedup_stats.get(source_file),
+            processor._duplicate_groups.get(source_file))
 
 class RestaurantDataProcessor:
-    def __init__(self, data_dir: str = "data/"):
+    def __init__(self, data_dir: str = "data/", store_dir: Optional[str] = None, dedup: Optional[str] = None,
+                 dedup_threshold: float = 0.8):
+        """
+        store_dir: 리뷰 저장소(review_store.py로 변환한 Parquet)가 있으면 CSV 대신 필요한 컬럼만 읽음
+        dedup: 식당별 유사 중복 리뷰 처리 (drop / weight, None이면 처리 안 함, DEDUP_MODES 참고)
+        """
+        if dedup is not None and dedup not in DEDUP_MODES:
+            raise ValueError(f"지원하지 않는 중복 처리 방식입니다: {dedup}")
         self.data_dir = data_dir
+        self.dedup = dedup
+        self.dedup_threshold = dedup_threshold
+        self.deduplicator = ReviewDeduplicator(threshold=dedup_threshold) if dedup else None
+        # 원본 CSV 이름 → (리뷰 수, 리뷰별 대표 리뷰 위치), 중복 리뷰 통계
+        self._duplicate_groups = {}
+        self.dedup_stats = {}
         self.df_list = []
         self.restaurants = []
+        # 병렬 수집 시 DataFrame 대신 보관하는 태그 빈도 (get_top_tags용)
+        self.tag_counts = Counter()
+        self.review_store = None
+        if store_dir is not None:
+            from review_store import ReviewStore
+            self.review_store = ReviewStore(store_dir)
+            if not self.review_store.exists():
+                raise FileNotFoundError(f"리뷰 저장소가 없습니다: {store_dir} (review_store.py로 먼저 변환하세요)")
         
+    def load_csv_file(self, csv_file: str) -> Optional[pd.DataFrame]:
+        """단일 CSV 파일 로드 (필수 컬럼 누락/로드 실패 시 None)"""
+        try:
+            df = pd.read_csv(csv_file)
+            
+            # '방문자 유형' 컬럼이 있으면 제거
+            if '방문자 유형' in df.columns:
+                df = df.drop('방문자 유형', axis=1)
+                print(f"'{os.path.basename(csv_file)}'에서 '방문자 유형' 컬럼 제거")
+            
+            # 필수 컬럼 확인
+            if all(col in df.columns for col in REQUIRED_COLUMNS):
+                print(f"로드 완료: {os.path.basename(csv_file)} ({len(df)}개 리뷰)")
+                return df
+            print(f"필수 컬럼 누락으로 스킵: {os.path.basename(csv_file)}")
+                
+        except Exception as e:
+            print(f"파일 로드 실패: {os.path.basename(csv_file)} - {e}")
+        return None
+        
+    @metrics.timed("ingest.load_all_csv_files")
     def load_all_csv_files(self) -> List[pd.DataFrame]:
         """모든 CSV 파일 로드"""
-        csv_files = glob.glob(os.path.join(self.data_dir, "*.csv"))
+        csv_files = list_csv_files(self.data_dir)
         print(f"발견된 CSV 파일: {len(csv_files)}개")
         
         for csv_file in csv_files:
-            try:
-                df = pd.read_csv(csv_file)
-                
-                # '방문자 유형' 컬럼이 있으면 제거
-                if '방문자 유형' in df.columns:
-                    df = df.drop('방문자 유형', axis=1)
-                    print(f"'{os.path.basename(csv_file)}'에서 '방문자 유형' 컬럼 제거")
-                
-                # 필수 컬럼 확인
-                required_cols = ['식당명', '작성일', '방문횟수', '리뷰 내용', '리뷰 태그']
-                if all(col in df.columns for col in required_cols):
-                    self.df_list.append((df, csv_file))
-                    print(f"로드 완료: {os.path.basename(csv_file)} ({len(df)}개 리뷰)")
-                else:
-                    print(f"필수 컬럼 누락으로 스킵: {os.path.basename(csv_file)}")
-                    
-            except Exception as e:
-                print(f"파일 로드 실패: {os.path.basename(csv_file)} - {e}")
+            df = self.load_csv_file(csv_file)
+            if df is not None:
+                self.df_list.append((df, csv_file))
                 
         print(f"총 {len(self.df_list)}개 파일 성공적으로 로드")
         return self.df_list
     
+    @metrics.timed("ingest.load_review_store")
+    def load_review_store(self) -> List[Tuple[int, pd.DataFrame, str]]:
+        """리뷰 저장소에서 식당별 (식당 id, DataFrame, 원본 CSV 이름) 로드 (CSV 파싱 없이 필요한 컬럼만)
+
+        저장소 변환 이후 바뀐 CSV가 있으면 해당 파티션만 먼저 다시 변환함
+        (오래된 저장소로 구축하면 증분 빌드 매니페스트가 반영되지 않은 CSV를 최신으로 기록하게 됨)
+        """
+        stale = self.review_store.stale_files(self.data_dir)
+        if stale:
+            print(f"리뷰 저장소 변환 이후 바뀐 CSV {len(stale)}개를 다시 변환합니다: {stale[:5]}")
+            self.review_store.compact(self.data_dir)
+        frames = list(self.review_store.iter_frames())
+        self.df_list = [(df, source_file) for _, source_file, df in frames]
+        print(f"리뷰 저장소 로드 완료: {len(frames)}개 식당, {sum(len(df) for _, _, df in frames)}개 리뷰")
+        return frames
+    
     def extract_restaurant_info(self, restaurant_name: str) -> Dict:
         """식당명에서 정보 추출"""
-        # 기본값 설정
-        location = "건대"
-        menu_type = "한식"
-        atmosphere = "캐주얼"
-        price_range = "1-3만원대"
-        
         name = restaurant_name.strip()
         
-        # 위치 정보 추출
-        if "건대" in name:
-            location = "건대"
-        elif "홍대" in name:
-            location = "홍대"
-        elif "성수" in name:
-            location = "성수"
-            
-        # 메뉴 타입 추정
-        if any(keyword in name for keyword in ["돼지", "고기", "갈비", "삼겹", "곱창", "규카츠"]):
-            menu_type = "고기류"
-            atmosphere = "회식, 단체모임"
-            price_range = "2-4만원대"
-        elif any(keyword in name for keyword in ["면", "국수", "라면", "우동"]):
-            menu_type = "면요리"
-            atmosphere = "간편식, 혼밥"
-            price_range = "1-2만원대"
-        elif any(keyword in name for keyword in ["카츠", "일식", "스시", "회"]):
-            menu_type = "일식"
-            atmosphere = "데이트, 모임"
-            price_range = "2-5만원대"
-        elif any(keyword in name for keyword in ["빙수", "디저트", "카페"]):
-            menu_type = "디저트"
-            atmosphere = "데이트, 휴식"
-            price_range = "1-2만원대"
-        elif any(keyword in name for keyword in ["포케", "타코", "웨스턴"]):
-            menu_type = "퓨전"
-            atmosphere = "캐주얼, 데이트"
-            price_range = "1-3만원대"
+        # 위치 정보 추출 (기본값: 건대)
+        location = next((location for location in LOCATIONS if location in name), "건대")
+        
+        # 메뉴 타입 추정 (규칙 순서대로 첫 번째로 매칭되는 메뉴)
+        for pattern, menu_type, atmosphere, price_range in MENU_RULES:
+            if pattern.search(name):
+                break
+        else:
+            menu_type, atmosphere, price_range = DEFAULT_MENU_INFO
             
         return {
             "location": location,
@@ -85,40 +271,90 @@ class RestaurantDataProcessor:
             "price_range": price_range
         }
     
-    def preprocess_data(self) -> List[Dict]:
-        """모든 CSV 파일에서 데이터 전처리"""
-        self.load_all_csv_files()
-        restaurant_data = []
+    def score_loaded_reviews(self):
+        """로드된 모든 식당의 리뷰를 한 컬럼으로 모아 키워드 수를 한 번에 계산한 뒤 식당별 DataFrame에 컬럼으로 추가"""
+        frames = [df for df, _ in self.df_list if not set(SENTIMENT_COLUMNS) <= set(df.columns)]
+        if not frames:
+            return
+        with metrics.span("ingest.score_reviews"):
+            scores = score_reviews(pd.concat([df['리뷰 내용'] for df in frames], ignore_index=True))
+        start = 0
+        for df in frames:
+            df[SENTIMENT_COLUMNS] = scores.iloc[start:start + len(df)].to_numpy()
+            start += len(df)
+    
+    def _duplicate_representatives(self, df: pd.DataFrame, source_file: str) -> np.ndarray:
+        """리뷰별 대표 리뷰 위치 (원본 CSV마다 한 번만 계산하고 통계 기록)"""
+        source_file = os.path.basename(source_file)
+        cached = self._duplicate_groups.get(source_file)
+        if cached is not None and cached[0] == len(df):
+            return cached[1]
         
-        for idx, (df, csv_file) in enumerate(self.df_list, 1):
-            # 결측값 처리
-            df = df.fillna('')
-            
-            # 식당명 추출 (첫 번째 행에서)
-            restaurant_name = df['식당명'].iloc[0] if len(df) > 0 else os.path.basename(csv_file)
-            
-            # 식당명 정리 (개행 문자 제거 등)
-            clean_name_parts = []
-            for part in str(restaurant_name).split('\n'):
-                part = part.strip()
-                if part and not any(word in part for word in ['예약', '톡톡', '쿠폰', '육류', '고기요리']):
-                    clean_name_parts.append(part)
-            
-            clean_name = clean_name_parts[0] if clean_name_parts else f"식당_{idx}"
-            
-            # 식당 정보 추출
-            restaurant_info = self.extract_restaurant_info(clean_name)
-            
-            # 리뷰 데이터 처리
-            all_reviews = " ".join(df['리뷰 내용'].astype(str))
-            all_tags = " ".join(df['리뷰 태그'].astype(str))
-            
-            # 통계 계산
-            avg_visits = df['방문횟수'].mean() if '방문횟수' in df.columns else 1.0
-            total_reviews = len(df)
-            
-            # 검색용 텍스트 생성
-            search_text = f"""
+        with metrics.span("ingest.deduplicate"):
+            reviews = [str(review) for review in df['리뷰 내용'].fillna('')]
+            representatives = self.deduplicator.find_duplicates(reviews)
+        duplicates = np.flatnonzero(representatives != np.arange(len(reviews)))
+        self._duplicate_groups[source_file] = (len(df), representatives)
+        self.dedup_stats[source_file] = {
+            "reviews": len(reviews),
+            "duplicates": len(duplicates),
+            "duplicate_chars": sum(len(reviews[i]) for i in duplicates),
+            # 기본 청크 길이(200자)로 나눴을 때 임베딩하지 않아도 되는 리뷰 청크 수
+            "duplicate_chunks": sum(-(-len(" ".join(reviews[i].split())) // 200) for i in duplicates),
+            "examples": [[reviews[representatives[i]][:80], reviews[i][:80]] for i in duplicates[:3]],
+        }
+        metrics.incr("ingest.duplicate_reviews", len(duplicates))
+        return representatives
+    
+    def deduplicate_reviews(self, df: pd.DataFrame, source_file: str) -> pd.DataFrame:
+        """임베딩/키워드 색인에 넣을 리뷰 (drop 모드면 유사 중복 리뷰를 빼고 대표 리뷰만)"""
+        if self.dedup != "drop" or len(df) == 0:
+            return df
+        representatives = self._duplicate_representatives(df, source_file)
+        return df[representatives == np.arange(len(df))]
+    
+    def process_restaurant(self, df: pd.DataFrame, csv_file: str, idx: int) -> Dict:
+        """단일 식당 CSV 데이터를 식당 레코드로 변환
+        
+        중복 처리 모드면 리뷰 요약/평점 추정에서 유사 중복 리뷰를 빼거나(drop) 묶음 크기만큼 가중치를 낮춤(weight)
+        (review_count는 중복을 포함한 전체 리뷰 수)
+        """
+        # 리뷰 저장소/score_loaded_reviews에서 미리 계산한 키워드 수 (이전 버전 저장소의 빈 값이면 다시 계산)
+        scored = set(SENTIMENT_COLUMNS) <= set(df.columns) and not df[SENTIMENT_COLUMNS].isna().any(axis=None)
+        
+        # 결측값 처리
+        df = df.fillna('')
+        total_reviews = len(df)
+        weights = None
+        if self.dedup == "weight" and total_reviews:
+            representatives = self._duplicate_representatives(df, csv_file)
+            weights = 1.0 / np.bincount(representatives, minlength=total_reviews)[representatives]
+        df = self.deduplicate_reviews(df, csv_file)
+        
+        # 식당명 추출 (첫 번째 행에서)
+        restaurant_name = df['식당명'].iloc[0] if len(df) > 0 else os.path.basename(csv_file)
+        
+        # 식당명 정리 (개행 문자 제거 등)
+        clean_name_parts = []
+        for part in str(restaurant_name).split('\n'):
+            part = part.strip()
+            if part and not any(word in part for word in ['예약', '톡톡', '쿠폰', '육류', '고기요리']):
+                clean_name_parts.append(part)
+        
+        clean_name = clean_name_parts[0] if clean_name_parts else f"식당_{idx}"
+        
+        # 식당 정보 추출
+        restaurant_info = self.extract_restaurant_info(clean_name)
+        
+        # 리뷰 데이터 처리
+        all_reviews = " ".join(df['리뷰 내용'].astype(str))
+        all_tags = " ".join(tag_text(tags) for tags in df['리뷰 태그'])
+        
+        # 통계 계산
+        avg_visits = df['방문횟수'].mean() if '방문횟수' in df.columns else 1.0
+        
+        # 검색용 텍스트 생성
+        search_text = f"""
             식당명: {clean_name}
             위치: {restaurant_info['location']} 건대입구역 근처
             메뉴: {restaurant_info['menu_type']}
@@ -126,51 +362,186 @@ class RestaurantDataProcessor:
             가격대: {restaurant_info['price_range']}
             리뷰요약: {all_reviews[:500]}
             태그: {all_tags[:200]}
-            """
-            
-            # 평점 추정 (리뷰 내용 기반)
-            positive_words = ['맛있', '좋', '추천', '최고', '훌륭', '만족']
-            negative_words = ['별로', '실망', '아쉽', '그냥', '보통']
-            
-            positive_count = sum(all_reviews.count(word) for word in positive_words)
-            negative_count = sum(all_reviews.count(word) for word in negative_words)
-            
-            if positive_count > negative_count * 2:
-                rating = 4.5
-            elif positive_count > negative_count:
-                rating = 4.0
-            else:
-                rating = 3.5
-            
-            restaurant_info_dict = {
-                'id': idx,
-                'name': clean_name,
-                'location': restaurant_info['location'],
-                'menu_type': restaurant_info['menu_type'],
-                'atmosphere': restaurant_info['atmosphere'],
-                'price_range': restaurant_info['price_range'],
-                'rating': rating,
-                'review_count': total_reviews,
-                'avg_visits': avg_visits,
-                'search_text': search_text.strip(),
-                'summary': f"{restaurant_info['location']}의 {restaurant_info['menu_type']} 전문점. {restaurant_info['atmosphere']} 장소로 인기."
-            }
-            
-            restaurant_data.append(restaurant_info_dict)
-            print(f"처리 완료: {clean_name} ({total_reviews}개 리뷰)")
+        """
+        
+        # 평점 추정 (리뷰 내용 기반, 리뷰별 긍정/부정 키워드 수 합산)
+        if scored:
+            review_scores = df[SENTIMENT_COLUMNS].astype(np.int32)
+        else:
+            review_scores = score_reviews(df['리뷰 내용'])
+        positive, negative = (review_scores[column].to_numpy() for column in SENTIMENT_COLUMNS)
+        if weights is None:
+            positive_count = int(positive.sum())
+            negative_count = int(negative.sum())
+            positive_review_ratio = float((positive > negative).mean()) if len(df) else 0.0
+        else:
+            positive_count = int(round(float(positive @ weights)))
+            negative_count = int(round(float(negative @ weights)))
+            positive_review_ratio = float(np.average(positive > negative, weights=weights))
+        
+        if positive_count > negative_count * 2:
+            rating = 4.5
+        elif positive_count > negative_count:
+            rating = 4.0
+        else:
+            rating = 3.5
+        
+        restaurant_info_dict = {
+            'id': idx,
+            'source_file': os.path.basename(csv_file),
+            'name': clean_name,
+            'location': restaurant_info['location'],
+            'menu_type': restaurant_info['menu_type'],
+            'atmosphere': restaurant_info['atmosphere'],
+            'price_range': restaurant_info['price_range'],
+            'rating': rating,
+            'review_count': total_reviews,
+            'avg_visits': avg_visits,
+            'positive_count': positive_count,
+            'negative_count': negative_count,
+            'positive_review_ratio': positive_review_ratio,
+            'duplicate_reviews': self.dedup_stats.get(os.path.basename(csv_file), {}).get("duplicates", 0),
+            'search_text': search_text.strip(),
+            'review_snippets': review_snippets(df['리뷰 내용']),
+            'summary': f"{restaurant_info['location']}의 {restaurant_info['menu_type']} 전문점. {restaurant_info['atmosphere']} 장소로 인기."
+        }
+        print(f"처리 완료: {clean_name} ({total_reviews}개 리뷰)")
+        return restaurant_info_dict
+    
+    def iter_restaurants_parallel(self, max_workers: Optional[int] = None) -> Iterator[Dict]:
+        """프로세스 풀에서 CSV별로 파싱+축약한 식당 레코드를 스트리밍
+        
+        각 워커는 CSV 하나의 DataFrame만 잠시 보유하고 레코드와 태그 빈도만 돌려주므로
+        최대 메모리는 전체 데이터 크기가 아니라 워커 수에 비례함.
+        id를 순차 실행과 동일하게 부여하기 위해 파일 순서대로 결과를 내보냄.
+        """
+        csv_files = list_csv_files(self.data_dir)
+        print(f"발견된 CSV 파일: {len(csv_files)}개 (병렬 처리, 워커 {max_workers or os.cpu_count()}개)")
+        
+        idx = 0
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(_ingest_csv_file, [self.data_dir] * len(csv_files), csv_files,
+                                   range(1, len(csv_files) + 1), [self.dedup] * len(csv_files),
+                                   [self.dedup_threshold] * len(csv_files))
+            for csv_file, restaurant, tag_counts, dedup_stats, duplicate_groups in results:
+                if restaurant is None:
+                    continue
+                idx += 1
+                restaurant['id'] = idx
+                self.tag_counts.update(tag_counts)
+                if dedup_stats is not None:
+                    self.dedup_stats[os.path.basename(csv_file)] = dedup_stats
+                if duplicate_groups is not None:
+                    self._duplicate_groups[os.path.basename(csv_file)] = duplicate_groups
+                yield restaurant
+    
+    @metrics.timed("ingest.preprocess_data")
+    def preprocess_data(self, parallel: bool = False, max_workers: Optional[int] = None) -> List[Dict]:
+        """모든 CSV 파일에서 데이터 전처리
+        
+        parallel=True이면 프로세스 풀로 수집하고 DataFrame을 보관하지 않음
+        리뷰 저장소를 지정했으면 CSV 대신 저장소를 읽고, 식당 id는 저장소에서 부여한 값을 사용
+        """
+        if self.review_store is not None:
+            restaurant_data = [self.process_restaurant(df, source_file, restaurant_id)
+                               for restaurant_id, source_file, df in self.load_review_store()]
+            print(f"\n전체 전처리 완료: {len(restaurant_data)}개 식당 데이터")
+            return restaurant_data
+        
+        if parallel:
+            restaurant_data = list(self.iter_restaurants_parallel(max_workers))
+            print(f"\n전체 전처리 완료: {len(restaurant_data)}개 식당 데이터")
+            return restaurant_data
+        
+        self.load_all_csv_files()
+        self.score_loaded_reviews()
+        restaurant_data = []
+        
+        for idx, (df, csv_file) in enumerate(self.df_list, 1):
+            restaurant_data.append(self.process_restaurant(df, csv_file, idx))
         
         print(f"\n전체 전처리 완료: {len(restaurant_data)}개 식당 데이터")
         return restaurant_data
     
+    def extract_review_chunks(self, df: pd.DataFrame, restaurant: Dict, chunk_chars: int = 200) -> Iterator[str]:
+        """리뷰 단위 청크 생성 (긴 리뷰는 chunk_chars 길이로 분할)"""
+        # 청크만으로도 식당을 구분할 수 있도록 식당 정보를 앞에 붙임
+        prefix = f"{restaurant['name']} ({restaurant['location']}, {restaurant['menu_type']})"
+        
+        for review, tags in zip(df['리뷰 내용'].fillna(''), df['리뷰 태그'].fillna('')):
+            review = " ".join(str(review).split())
+            if not review:
+                continue
+            for start in range(0, len(review), chunk_chars):
+                yield f"{prefix} {review[start:start + chunk_chars]} 태그: {tag_text(tags)}"
+    
+    def _iter_restaurant_frames(self, restaurant_data: List[Dict]) -> Iterator[Tuple[Dict, pd.DataFrame]]:
+        """로드된 CSV들에서 (식당, DataFrame) 스트리밍 (drop 모드면 유사 중복 리뷰 제외)
+        
+        DataFrame을 보관하지 않은 경우(병렬 수집) 식당별 CSV를 하나씩 다시 읽음
+        """
+        if not self.df_list and self.review_store is not None:
+            self.load_review_store()
+        if not self.df_list:
+            for restaurant in restaurant_data:
+                df = self.load_csv_file(os.path.join(self.data_dir, restaurant['source_file']))
+                if df is not None:
+                    yield restaurant, self.deduplicate_reviews(df, restaurant['source_file'])
+            return
+        
+        restaurants_by_file = {restaurant['source_file']: restaurant for restaurant in restaurant_data}
+        
+        for df, csv_file in self.df_list:
+            restaurant = restaurants_by_file.get(os.path.basename(csv_file))
+            if restaurant is not None:
+                yield restaurant, self.deduplicate_reviews(df, csv_file)
+    
+    def iter_review_chunks(self, restaurant_data: List[Dict], chunk_chars: int = 200) -> Iterator[Tuple[int, str]]:
+        """로드된 CSV들에서 (식당 id, 리뷰 청크) 스트리밍"""
+        for restaurant, df in self._iter_restaurant_frames(restaurant_data):
+            for chunk in self.extract_review_chunks(df, restaurant, chunk_chars):
+                yield restaurant['id'], chunk
+    
+    def build_review_document(self, df: pd.DataFrame, restaurant: Dict) -> str:
+        """키워드 검색용 문서 (식당명/메뉴 분류 + 잘리지 않은 전체 리뷰 내용과 태그)"""
+        reviews = " ".join(str(review) for review in df['리뷰 내용'].fillna(''))
+        tags = " ".join(tag_text(tags) for tags in df['리뷰 태그'].fillna(''))
+        return f"{restaurant['name']} {restaurant['menu_type']} {reviews} {tags}"
+    
+    def iter_review_documents(self, restaurant_data: List[Dict]) -> Iterator[Tuple[int, str]]:
+        """로드된 CSV들에서 (식당 id, 키워드 검색용 문서) 스트리밍"""
+        for restaurant, df in self._iter_restaurant_frames(restaurant_data):
+            yield restaurant['id'], self.build_review_document(df, restaurant)
+    
+    def dedup_report(self, chunks_embedded: bool = False) -> Dict:
+        """중복 리뷰 제거 결과와 절약한 리뷰 청크 임베딩 연산 추정 (FLOPs ≈ 2 × 파라미터 수 × 토큰 수)
+
+        chunks_embedded: 리뷰 청크 인덱스를 구축했는지 여부 (구축하지 않으면 리뷰는 임베딩되지 않으므로 절약도 0)
+        """
+        reviews = sum(stats["reviews"] for stats in self.dedup_stats.values())
+        duplicates = sum(stats["duplicates"] for stats in self.dedup_stats.values())
+        duplicate_chars = sum(stats["duplicate_chars"] for stats in self.dedup_stats.values())
+        dropped = self.dedup == "drop" and chunks_embedded
+        tokens_saved = duplicate_chars / CHARS_PER_TOKEN if dropped else 0.0
+        return {
+            "mode": self.dedup,
+            "threshold": self.deduplicator.threshold if self.deduplicator else None,
+            "reviews": reviews,
+            "duplicates": duplicates,
+            "duplicate_ratio": duplicates / reviews if reviews else 0.0,
+            "chunks_saved": sum(stats["duplicate_chunks"] for stats in self.dedup_stats.values()) if dropped else 0,
+            "estimated_tokens_saved": tokens_saved,
+            "estimated_embedding_flops_saved": 2 * EMBEDDING_MODEL_PARAMS * tokens_saved,
+            "restaurants": {name: stats for name, stats in sorted(self.dedup_stats.items()) if stats["duplicates"]},
+        }
+    
     def get_top_tags(self, n=10) -> List[str]:
-        """가장 많이 언급된 태그들 반환"""
-        all_tags = []
+        """가장 많이 언급된 태그들 반환 (리뷰 저장소가 있으면 태그 컬럼만 읽어 집계)"""
+        if self.review_store is not None:
+            return [tag for tag, count in self.review_store.tag_counts().most_common(n)]
+        tag_counts = Counter(self.tag_counts)
         for df, _ in self.df_list:
-            for tags in df['리뷰 태그'].dropna():
-                all_tags.extend([tag.strip() for tag in str(tags).split(',')])
-                
-        from collections import Counter
-        tag_counts = Counter(all_tags)
+            tag_counts.update(count_tags(df))
         return [tag for tag, count in tag_counts.most_common(n)]
 
 if __name__ == "__main__":
@@ -0,0 +1,200 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+import numpy as np
+from typing import Dict, List, Optional, Sequence
+
+# 임베딩 백엔드 종류
+# - torch: SentenceTransformer (fp32)
+# - torch-int8: SentenceTransformer의 Linear 층을 int8 동적 양자화 (CPU)
+# - onnx / onnx-int8: ONNX Runtime (optimum으로 변환, int8은 onnxruntime 동적 양자화)
+# - stub: 모델 없이 글자 2-gram 해시로 만든 벡터 (오프라인 부하 테스트용, 검색 품질은 의미 없음)
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8", "stub")
+ONNX_EXPORT_DIR = "models/onnx"
+# stub 백엔드의 텍스트당 모의 인코딩 시간(ms), 모델 추론처럼 GIL을 놓고 대기
+STUB_LATENCY_ENV = "RECOMMENDER_STUB_ENCODE_MS"
+
+class SentenceTransformerBackend:
+    """SentenceTransformer 임베딩 (quantize=True이면 CPU int8 동적 양자화)"""
+
+    def __init__(self, model_name: str, batch_size: int = 64, max_seq_length: Optional[int] = None,
+                 quantize: bool = False):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device="cpu" if quantize else None)
+        if max_seq_length:
+            self.model.max_seq_length = max_seq_length
+        if quantize:
+            import torch
+            self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.batch_size = batch_size
+        self.dimension = self.model.get_sentence_embedding_dimension()
+        self.name = f"{model_name}|{'torch-int8' if quantize else 'torch'}|{self.model.max_seq_length}"
+
+    def encode(self, texts: Sequence[str], batch_size: Optional[int] = None,
+               show_progress_bar: bool = False) -> np.ndarray:
+        embeddings = self.model.encode(list(texts), batch_size=batch_size or self.batch_size,
+                                       show_progress_bar=show_progress_bar)
+        return np.asarray(embeddings, dtype=np.float32)
+
+class OnnxBackend:
+    """ONNX Runtime 임베딩 (토큰 임베딩 mean pooling, ko-sroberta-multitask의 pooling 방식과 동일)
+
+    최초 실행 시 모델을 ONNX로 변환해 export_dir에 저장하고 이후에는 저장된 파일을 사용
+    """
+
+    def __init__(self, model_name: str, batch_size: int = 64, max_seq_length: Optional[int] = None,
+                 quantize: bool = False, export_dir: str = ONNX_EXPORT_DIR):
+        try:
+            from optimum.onnxruntime import ORTModelForFeatureExtraction
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise ImportError("ONNX 백엔드에는 optimum[onnxruntime] 패키지가 필요합니다: "
+                              "pip install optimum[onnxruntime]") from e
+
+        model_dir = os.path.join(export_dir, re.sub(r"[^0-9A-Za-z._-]", "_", model_name))
+        if not os.path.exists(os.path.join(model_dir, "model.onnx")):
+            print(f"ONNX 변환 중: {model_name} → {model_dir}")
+            ORTModelForFeatureExtraction.from_pretrained(model_name, export=True).save_pretrained(model_dir)
+            AutoTokenizer.from_pretrained(model_name).save_pretrained(model_dir)
+
+        file_name = "model.onnx"
+        if quantize:
+            file_name = "model_int8.onnx"
+            if not os.path.exists(os.path.join(model_dir, file_name)):
+                from onnxruntime.quantization import QuantType, quantize_dynamic
+                quantize_dynamic(os.path.join(model_dir, "model.onnx"), os.path.join(model_dir, file_name),
+                                 weight_type=QuantType.QInt8)
+
+        self.model = ORTModelForFeatureExtraction.from_pretrained(model_dir, file_name=file_name)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.batch_size = batch_size
+        self.max_seq_length = max_seq_length or min(self.tokenizer.model_max_length, 512)
+        self.dimension = self.model.config.hidden_size
+        self.name = f"{model_name}|{'onnx-int8' if quantize else 'onnx'}|{self.max_seq_length}"
+
+    def encode(self, texts: Sequence[str], batch_size: Optional[int] = None,
+               show_progress_bar: bool = False) -> np.ndarray:
+        texts = list(texts)
+        batch_size = batch_size or self.batch_size
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            inputs = self.tokenizer(texts[start:start + batch_size], padding=True, truncation=True,
+                                    max_length=self.max_seq_length, return_tensors="np")
+            token_embeddings = self.model(**inputs).last_hidden_state
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            embeddings[start:start + batch_size] = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            if show_progress_bar:
+                print(f"\r임베딩 {min(start + batch_size, len(texts))}/{len(texts)}", end="", flush=True)
+        if show_progress_bar:
+            print()
+        return embeddings
+
+class StubBackend:
+    """모델 없이 동작하는 임베딩 (글자 2-gram을 crc32로 dimension개 버킷에 해싱, 같은 텍스트는 항상 같은 벡터)
+
+    부하 테스트에서 서비스 경로(HTTP/스레드/캐시/FAISS)만 측정하기 위한 용도이며,
+    환경변수 RECOMMENDER_STUB_ENCODE_MS로 텍스트당 인코딩 시간을 흉내낼 수 있음
+    """
+
+    def __init__(self, model_name: str, batch_size: int = 64, max_seq_length: Optional[int] = None,
+                 dimension: int = 768):
+        self.batch_size = batch_size
+        self.max_seq_length = max_seq_length or 512
+        self.dimension = dimension
+        self.latency = float(os.environ.get(STUB_LATENCY_ENV, "0")) / 1000
+        self.name = f"{model_name}|stub|{self.max_seq_length}"
+
+    def encode(self, texts: Sequence[str], batch_size: Optional[int] = None,
+               show_progress_bar: bool = False) -> np.ndarray:
+        texts = list(texts)
+        if self.latency:
+            time.sleep(self.latency * len(texts))
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            text = " ".join(text.split())[:self.max_seq_length]
+            buckets = [zlib.crc32(text[i:i + 2].encode("utf-8")) % self.dimension for i in range(len(text) - 1)]
+            np.add.at(embeddings[row], buckets or [0], 1.0)
+        return embeddings
+
+_backends: Dict = {}
+_backends_lock = threading.Lock()
+
+def get_backend(model_name: str, backend: str = "torch", batch_size: int = 64,
+                max_seq_length: Optional[int] = None):
+    """임베딩 백엔드 생성 (같은 설정은 프로세스 안에서 한 번만 로드해 VectorDB 인스턴스 간 공유)"""
+    if backend not in BACKENDS:
+        raise ValueError(f"지원하지 않는 임베딩 백엔드입니다: {backend}")
+    key = (model_name, backend, batch_size, max_seq_length)
+    with _backends_lock:
+        if key not in _backends:
+            quantize = backend.endswith("-int8")
+            if backend == "stub":
+                _backends[key] = StubBackend(model_name, batch_size, max_seq_length)
+            elif backend.startswith("onnx"):
+                _backends[key] = OnnxBackend(model_name, batch_size, max_seq_length, quantize)
+            else:
+                _backends[key] = SentenceTransformerBackend(model_name, batch_size, max_seq_length, quantize)
+        return _backends[key]
+
+class EmbeddingCache:
+    """텍스트 → 임베딩 영구 캐시 (SQLite, 키는 백엔드 이름 + 텍스트의 sha256)
+
+    백엔드 이름에 모델/양자화/최대 길이가 들어가므로 설정이 바뀌면 자동으로 다른 키가 됨
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30.0)
+
+    @staticmethod
+    def make_key(backend_name: str, text: str) -> str:
+        return hashlib.sha256(f"{backend_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._connect() as conn:
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                found.update((key, np.frombuffer(vector, dtype=np.float32)) for key, vector in rows)
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items.items()],
+            )
+
+    def encode(self, backend, texts: Sequence[str], batch_size: Optional[int] = None,
+               show_progress_bar: bool = False) -> np.ndarray:
+        """캐시에 없는 텍스트만 백엔드로 인코딩 (중복 텍스트는 한 번만)"""
+        texts = list(texts)
+        keys = [self.make_key(backend.name, text) for text in texts]
+        cached = self.get_many(list(dict.fromkeys(keys)))
+        missing = {key: text for key, text in zip(keys, texts) if key not in cached}
+        self.hits += len(texts) - sum(1 for key in keys if key in missing)
+        self.misses += len(missing)
+        if missing:
+            new_embeddings = backend.encode(list(missing.values()), batch_size, show_progress_bar)
+            new_items = dict(zip(missing.keys(), new_embeddings))
+            self.put_many(new_items)
+            cached.update(new_items)
+        if not texts:
+            return np.zeros((0, backend.dimension), dtype=np.float32)
+        return np.vstack([cached[key] for key in keys])
@@ -0,0 +1,116 @@
+import faiss
+import numpy as np
+from typing import Dict, Optional
+
+# 지원하는 인덱스 종류
+# - flat: 정확한 전수 검색 (IndexFlatIP)
+# - ivf_flat: 클러스터 기반 근사 검색 (nprobe로 정확도/속도 조절)
+# - ivf_pq: IVF + Product Quantization (메모리 절감, 근사 점수)
+# - hnsw: 그래프 기반 근사 검색 (efSearch로 정확도/속도 조절)
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+DEFAULT_INDEX_PARAMS = {
+    "nlist": None,          # None이면 벡터 수에 맞춰 자동 결정 (4 * sqrt(N))
+    "nprobe": 8,
+    "pq_m": 16,             # 벡터를 나눌 서브벡터 수 (차원의 약수여야 함)
+    "pq_nbits": 8,
+    "hnsw_m": 32,
+    "ef_construction": 200,
+    "ef_search": 64,
+    "train_sample_size": 100000,
+}
+
+def resolve_index_params(index_params: Optional[Dict] = None) -> Dict:
+    """기본값에 사용자 설정을 덮어쓴 인덱스 파라미터 반환"""
+    params = dict(DEFAULT_INDEX_PARAMS)
+    if index_params:
+        unknown = set(index_params) - set(params)
+        if unknown:
+            raise ValueError(f"알 수 없는 인덱스 파라미터: {sorted(unknown)}")
+        params.update(index_params)
+    return params
+
+def _num_clusters(num_vectors: int, nlist: Optional[int]) -> int:
+    """IVF 클러스터 수 결정 (k-means 학습에 클러스터당 최소 39개 벡터 필요)"""
+    if nlist is None:
+        nlist = int(4 * np.sqrt(num_vectors))
+    return max(1, min(nlist, num_vectors // 39))
+
+def create_index(index_type: str, dimension: int, num_vectors: int, index_params: Optional[Dict] = None) -> faiss.Index:
+    """설정에 맞는 FAISS 인덱스 생성 (내적 = 정규화 벡터의 코사인 유사도)"""
+    params = resolve_index_params(index_params)
+
+    if index_type == "flat":
+        return faiss.IndexFlatIP(dimension)
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, params["hnsw_m"], faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = params["ef_construction"]
+        return index
+
+    if index_type in ("ivf_flat", "ivf_pq"):
+        nlist = _num_clusters(num_vectors, params["nlist"])
+        quantizer = faiss.IndexFlatIP(dimension)
+        if index_type == "ivf_flat":
+            return faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+
+        if dimension % params["pq_m"] != 0:
+            raise ValueError(f"pq_m({params['pq_m']})은 임베딩 차원({dimension})의 약수여야 합니다.")
+        # 코드북 학습에 2^nbits개 이상의 벡터가 필요하므로 소규모 데이터에서는 nbits를 줄임
+        nbits = max(1, min(params["pq_nbits"], int(np.log2(max(num_vectors, 2)))))
+        return faiss.IndexIVFPQ(quantizer, dimension, nlist, params["pq_m"], nbits, faiss.METRIC_INNER_PRODUCT)
+
+    raise ValueError(f"지원하지 않는 인덱스 종류입니다: {index_type} (지원: {', '.join(INDEX_TYPES)})")
+
+def train_index(index: faiss.Index, vectors: np.ndarray, index_params: Optional[Dict] = None, seed: int = 42):
+    """학습이 필요한 인덱스(IVF 계열)를 샘플로 학습"""
+    if index.is_trained:
+        return
+    params = resolve_index_params(index_params)
+    sample_size = min(len(vectors), params["train_sample_size"])
+    if sample_size < len(vectors):
+        rng = np.random.default_rng(seed)
+        vectors = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    print(f"인덱스 학습 중... ({sample_size}개 샘플)")
+    index.train(np.ascontiguousarray(vectors, dtype=np.float32))
+
+def set_search_params(index: faiss.Index, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+    """쿼리 시점 정확도/속도 파라미터 설정 (nprobe: IVF, efSearch: HNSW)"""
+    if nprobe is not None and hasattr(index, "nprobe"):
+        index.nprobe = nprobe
+    if ef_search is not None and hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search
+
+def build_index(index_type: str, vectors: np.ndarray, index_params: Optional[Dict] = None) -> faiss.Index:
+    """정규화된 벡터로 인덱스 생성 + 학습 + 추가 + 검색 파라미터 설정"""
+    params = resolve_index_params(index_params)
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index = create_index(index_type, vectors.shape[1], len(vectors), params)
+    train_index(index, vectors, params)
+    index.add(vectors)
+    set_search_params(index, params["nprobe"], params["ef_search"])
+    return index
+
+_warned_no_mmap_ifc = False
+
+def mmap_io_flags(index_type: str) -> int:
+    """인덱스 종류에 맞는 메모리 맵 읽기 플래그
+
+    IVF 계열은 역리스트를 IO_FLAG_MMAP으로 매핑 (IO_FLAG_MMAP_IFC를 주면 읽기 실패),
+    flat/HNSW의 벡터 코드는 IO_FLAG_MMAP_IFC(faiss 1.11+)가 있어야 매핑되고 없으면 메모리로 복사됨
+    """
+    flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    if index_type in ("ivf_flat", "ivf_pq"):
+        return flags
+    if not hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+        global _warned_no_mmap_ifc
+        if not _warned_no_mmap_ifc:
+            print(f"경고: faiss {faiss.__version__}에는 IO_FLAG_MMAP_IFC가 없어 {index_type} 인덱스가 메모리 맵 대신 "
+                  "메모리로 복사됩니다 (프로세스 간 공유 안 됨, faiss-cpu 1.11 이상 필요).")
+            _warned_no_mmap_ifc = True
+        return flags
+    return flags | faiss.IO_FLAG_MMAP_IFC
+
+def index_memory_bytes(index: faiss.Index) -> int:
+    """직렬화 크기로 추정한 인덱스 메모리 사용량"""
+    return int(faiss.serialize_index(index).nbytes)
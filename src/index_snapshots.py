@@ -0,0 +1,116 @@
+import os
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+# 스냅샷 구조
+#   <save_dir>/snapshots/<버전>/   한 번 게시된 뒤에는 수정하지 않는 인덱스 파일들
+#   <save_dir>/CURRENT             현재 서빙할 스냅샷 이름 (임시 파일 작성 후 os.replace로 원자적 교체)
+SNAPSHOTS_DIR = "snapshots"
+CURRENT_FILE = "CURRENT"
+
+def current_snapshot(save_dir: str) -> Optional[str]:
+    """CURRENT 포인터가 가리키는 스냅샷 이름 (스냅샷 구조가 아니면 None)"""
+    try:
+        with open(os.path.join(save_dir, CURRENT_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def resolve_snapshot(save_dir: str) -> str:
+    """현재 스냅샷 디렉토리 경로 (포인터가 없는 이전 구조는 save_dir 자체)"""
+    name = current_snapshot(save_dir)
+    return os.path.join(save_dir, SNAPSHOTS_DIR, name) if name else save_dir
+
+def _switch_current(save_dir: str, name: str):
+    tmp_path = os.path.join(save_dir, f"{CURRENT_FILE}.{uuid.uuid4().hex[:8]}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(save_dir, CURRENT_FILE))
+
+def prune_snapshots(save_dir: str, keep: int):
+    """현재 스냅샷과 최근 스냅샷 keep개만 남기고 삭제
+
+    이미 mmap으로 열린 파일은 삭제되어도 마지막 참조가 닫힐 때까지 유지되므로 서빙 중인 프로세스에 영향 없음
+    """
+    snapshots_dir = os.path.join(save_dir, SNAPSHOTS_DIR)
+    current = current_snapshot(save_dir)
+    entries = [entry for entry in os.scandir(snapshots_dir) if entry.is_dir() and not entry.name.startswith(".")]
+    entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in entries[keep:]:
+        if entry.name != current:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+@contextmanager
+def publish_snapshot(save_dir: str, version: str, keep: int = 3) -> Iterator[str]:
+    """새 스냅샷 디렉토리에 파일을 쓰고, 모두 성공하면 CURRENT 포인터를 교체
+
+    with publish_snapshot(save_dir, version) as snapshot_dir:
+        ... snapshot_dir에 파일 저장 ...
+    읽는 쪽은 항상 완성된 스냅샷만 보게 되며, 실패하면 작성 중이던 디렉토리를 지움
+    """
+    snapshots_dir = os.path.join(save_dir, SNAPSHOTS_DIR)
+    os.makedirs(snapshots_dir, exist_ok=True)
+    name = version
+    if os.path.exists(os.path.join(snapshots_dir, name)):
+        name = f"{version}-{uuid.uuid4().hex[:4]}"
+    tmp_dir = os.path.join(snapshots_dir, f".{name}.tmp")
+    os.makedirs(tmp_dir)
+    try:
+        yield tmp_dir
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    os.rename(tmp_dir, os.path.join(snapshots_dir, name))
+    _switch_current(save_dir, name)
+    prune_snapshots(save_dir, keep)
+
+class SnapshotWatcher:
+    """CURRENT 포인터를 주기적으로 확인해 새 스냅샷을 백그라운드에서 로드하고 교체하는 감시 스레드
+
+    load_fn(스냅샷 디렉토리)로 새 인덱스를 기존 인덱스와 별도로 완전히 로드한 뒤 on_swap(new)을 호출한다.
+    on_swap은 참조 하나만 바꾸면 되며, 진행 중인 검색은 이전 객체로 끝나고 마지막 참조가 사라질 때 해제된다.
+    """
+
+    def __init__(self, save_dir: str, load_fn: Callable[[str], object], on_swap: Callable[[object], None],
+                 interval: float = 10.0, loaded: Optional[str] = None):
+        self.save_dir = save_dir
+        self.load_fn = load_fn
+        self.on_swap = on_swap
+        self.interval = interval
+        self.loaded = loaded if loaded is not None else current_snapshot(save_dir)
+        self.reloads = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> "SnapshotWatcher":
+        self._thread.start()
+        return self
+
+    def check(self) -> bool:
+        """새 스냅샷이 게시되었으면 로드 후 교체 (교체했으면 True)"""
+        name = current_snapshot(self.save_dir)
+        if name is None or name == self.loaded:
+            return False
+        print(f"새 인덱스 스냅샷 감지: {name} (이전: {self.loaded})")
+        new = self.load_fn(os.path.join(self.save_dir, SNAPSHOTS_DIR, name))
+        self.on_swap(new)
+        self.loaded = name
+        self.reloads += 1
+        print(f"인덱스 스냅샷 교체 완료: {name}")
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                # 로드 실패 시 기존 인덱스로 계속 서빙하고 다음 주기에 재시도
+                print(f"인덱스 스냅샷 로드 실패: {e}")
+
+    def stop(self):
+        self._stop.set()
@@ -1,12 +1,60 @@
-from transformers import pipeline
-import torch
-from typing import List, Dict, Tuple
+import copy
+import os
+import queue
+import time
+from concurrent.futures import Future
+from threading import Event, Thread
+from typing import Callable, List, Dict, Tuple, Iterator, Optional
+
+import metrics
+
+# torch / transformers는 모듈 import 시점이 아니라 GemmaRecommender를 처음 만들 때 로드
+# (SimpleRecommender, RESPONSE_HEADER만 쓰는 서비스/캐시는 LLM 스택 없이 빠르게 시작)
+
+RESPONSE_HEADER = "🤖 **Qwen AI 추천**\n\n"
+
+# 모든 요청이 공유하는 고정 프롬프트 (KV 캐시를 미리 계산해 재사용할 수 있도록 시스템 메시지에 지시문을 모음)
+SYSTEM_PROMPT = (
+    "당신은 친근하고 도움이 되는 한국 맛집 추천 전문가입니다. "
+    "사용자 요청과 추천할 식당 목록이 주어지면, 식당들을 사용자 요청에 맞게 매력적으로 추천해주세요. "
+    "각 식당의 특별한 점과 추천 이유를 포함해서 자연스럽게 한국어로 설명해주세요."
+)
+SENTENCE_ENDINGS = (".", "!", "?", "\n", "。", "~")
+
+def truncate_at_sentence(text: str, min_ratio: float = 0.5) -> str:
+    """예산 초과로 끊긴 생성문을 마지막 완결 문장에서 자름 (너무 많이 잘리면 말줄임표로 마무리)"""
+    text = text.rstrip()
+    cut = max(text.rfind(ending) for ending in SENTENCE_ENDINGS)
+    if cut >= len(text) * min_ratio:
+        return text[:cut + 1].rstrip()
+    return text + "…"
 
 class GemmaRecommender:
-    def __init__(self):
-        """Qwen2.5-1.5B-Instruct 모델 초기화 (Pipeline 방식)"""
+    def __init__(self, max_new_tokens: int = 1000, max_time: Optional[float] = None,
+                 cpu_int8: bool = False, num_threads: Optional[int] = None, prefix_cache: bool = True,
+                 temperature: float = 0.7, top_p: float = 0.9, do_sample: bool = True):
+        """Qwen2.5-1.5B-Instruct 모델 초기화 (Pipeline 방식)
+        
+        max_new_tokens / max_time: 생성 토큰 수 / 생성 시간(초) 예산 (max_time=None이면 시간 제한 없음)
+        cpu_int8: GPU가 없을 때 Linear 레이어에 동적 int8 양자화 적용 (출력 품질이 달라질 수 있어 기본 꺼짐)
+        num_threads: CPU 추론 스레드 수 (None이면 CPU 코어 수)
+        prefix_cache: 고정 시스템 프롬프트의 KV 캐시를 미리 계산해 매 요청에서 재사용
+        temperature / top_p / do_sample: 샘플링 설정 (do_sample=False면 결정적 생성)
+        """
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.top_p = top_p
+        self.do_sample = do_sample
+        self.quantized = False
+        self.max_time = max_time
+        self.last_generation_stats = {}
+        self._prefix_ids = None
+        self._prefix_cache = None
         print("🚀 Qwen2.5-1.5B-Instruct 모델 로딩 중... (최초 실행시 다운로드로 시간이 걸릴 수 있습니다)")
         try:
+            import torch
+            from transformers import pipeline
+            
             # Qwen2.5-1.5B-Instruct Pipeline 방식 (안정적이고 한국어 지원 우수)
             self.pipe = pipeline(
                 "text-generation", 
@@ -15,6 +63,11 @@ class GemmaRecommender:
                 torch_dtype=torch.bfloat16 if torch.cuda.is_available() else torch.float32
             )
             
+            if not torch.cuda.is_available():
+                self._optimize_for_cpu(cpu_int8, num_threads)
+            if prefix_cache:
+                self._build_prefix_cache()
+            
             print("✅ Qwen2.5-1.5B-Instruct 모델 로딩 완료!")
             print("💡 Qwen2.5는 1.5B 파라미터로 가볍고 한국어 지원이 우수합니다")
             
@@ -26,16 +79,68 @@ class GemmaRecommender:
             print("   3. 라이센스 동의: https://huggingface.co/Qwen/Qwen2.5-1.5B-Instruct")
             raise e
     
-    def generate_recommendation_text(self, query: str, search_results: List[Tuple[Dict, float]]) -> str:
-        """Qwen AI를 사용한 자연스러운 추천 텍스트 생성"""
-        if not search_results:
-            return "검색 결과가 없습니다."
+    def _optimize_for_cpu(self, cpu_int8: bool, num_threads: Optional[int]):
+        """CPU 추론 최적화: 스레드 수 고정 + Linear 레이어 동적 int8 양자화"""
+        import torch
         
-        try:
-            # 검색 결과 정리
-            restaurants_info = []
-            for i, (restaurant, score) in enumerate(search_results[:3], 1):
-                restaurants_info.append(f"""
+        num_threads = num_threads or os.cpu_count()
+        torch.set_num_threads(num_threads)
+        print(f"🧵 CPU 추론 스레드: {num_threads}개")
+        
+        if cpu_int8:
+            self.pipe.model.eval()
+            torch.quantization.quantize_dynamic(self.pipe.model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+            self.quantized = True
+            print("⚡ Linear 레이어 동적 int8 양자화 적용")
+    
+    def _build_prefix_cache(self):
+        """모든 요청이 공유하는 프롬프트 앞부분(시스템 메시지 + user 턴 시작)의 KV 캐시 사전 계산"""
+        import torch
+        
+        tokenizer = self.pipe.tokenizer
+        prefix_text = tokenizer.apply_chat_template(
+            [{"role": "system", "content": SYSTEM_PROMPT}], tokenize=False
+        ) + "<|im_start|>user\n"
+        self._prefix_ids = tokenizer(prefix_text, return_tensors="pt")["input_ids"].to(self.pipe.model.device)
+        with torch.no_grad():
+            self._prefix_cache = self.pipe.model(self._prefix_ids, use_cache=True).past_key_values
+        print(f"🗂️ 프롬프트 prefix KV 캐시 준비 완료 ({self._prefix_ids.shape[1]} 토큰)")
+    
+    def _prefix_cache_for(self, input_ids: "torch.Tensor"):
+        """입력이 캐시된 prefix로 시작하면 (변경되지 않도록 복사한) prefix KV 캐시 반환"""
+        if self._prefix_cache is None:
+            return None
+        import torch
+        
+        prefix_length = self._prefix_ids.shape[1]
+        if input_ids.shape[1] <= prefix_length or not torch.equal(input_ids[:, :prefix_length], self._prefix_ids):
+            return None
+        return copy.deepcopy(self._prefix_cache)
+    
+    def sampling_config(self) -> Dict:
+        """생성 결과에 영향을 주는 설정 (생성 결과 캐시 키에 포함)"""
+        return {
+            "model": "Qwen/Qwen2.5-1.5B-Instruct",
+            "quantized": self.quantized,
+            "system_prompt": SYSTEM_PROMPT,
+            "max_new_tokens": self.max_new_tokens,
+            "temperature": self.temperature if self.do_sample else None,
+            "top_p": self.top_p if self.do_sample else None,
+            "do_sample": self.do_sample,
+        }
+    
+    def _sampling_kwargs(self) -> Dict:
+        """generate/pipeline에 넘길 샘플링 인자"""
+        if not self.do_sample:
+            return {"do_sample": False}
+        return {"do_sample": True, "temperature": self.temperature, "top_p": self.top_p}
+    
+    def _build_messages(self, query: str, search_results: List[Tuple[Dict, float]]) -> List[Dict]:
+        """검색 결과로 Qwen2.5 채팅 메시지 구성"""
+        # 검색 결과 정리
+        restaurants_info = []
+        for i, (restaurant, score) in enumerate(search_results[:3], 1):
+            restaurants_info.append(f"""
 {i}. **{restaurant['name']}**
    - 위치: {restaurant['location']}
    - 메뉴: {restaurant['menu_type']}
@@ -44,34 +149,50 @@ class GemmaRecommender:
    - 평점: {restaurant['rating']}/5.0
    - 한줄평: {restaurant['summary']}
 """)
-            
-            restaurants_text = "\n".join(restaurants_info)
-            
-            # Qwen2.5를 위한 메시지 구성
-            messages = [
-                {
-                    "role": "system", 
-                    "content": "당신은 친근하고 도움이 되는 한국 맛집 추천 전문가입니다."
-                },
-                {
-                    "role": "user", 
-                    "content": f"""사용자 요청: "{query}"
+        
+        restaurants_text = "\n".join(restaurants_info)
+        
+        # Qwen2.5를 위한 메시지 구성
+        return [
+            {
+                "role": "system", 
+                "content": SYSTEM_PROMPT
+            },
+            {
+                "role": "user", 
+                "content": f"""사용자 요청: "{query}"
 
 추천할 식당들:
 {restaurants_text}
 
-위 식당들을 사용자 요청에 맞게 매력적으로 추천해주세요. 각 식당의 특별한 점과 추천 이유를 포함해서 자연스럽게 한국어로 설명해주세요. 간결하고 친근하게 작성해주세요."""
-                }
-            ]
+간결하고 친근하게 작성해주세요."""
+            }
+        ]
+    
+    def generate_recommendation_text(self, query: str, search_results: List[Tuple[Dict, float]]) -> str:
+        """Qwen AI를 사용한 자연스러운 추천 텍스트 생성"""
+        if not search_results:
+            return "검색 결과가 없습니다."
+        
+        # prefix KV 캐시는 직접 generate를 호출하는 스트리밍 경로에서만 재사용 가능
+        if self._prefix_cache is not None:
+            recommendation_text = ""
+            for recommendation_text in self.stream_recommendation_text(query, search_results):
+                pass
+            return recommendation_text
+        
+        try:
+            messages = self._build_messages(query, search_results)
             
             # Pipeline을 사용한 텍스트 생성
-            outputs = self.pipe(
-                messages, 
-                max_new_tokens=1000,
-                temperature=0.7,
-                top_p=0.9,
-                do_sample=True
-            )
+            generation_kwargs = {"max_time": self.max_time} if self.max_time else {}
+            with metrics.span("llm.generate"):
+                outputs = self.pipe(
+                    messages, 
+                    max_new_tokens=self.max_new_tokens,
+                    **self._sampling_kwargs(),
+                    **generation_kwargs
+                )
             
             # 응답 추출
             if outputs and len(outputs) > 0:
@@ -81,14 +202,14 @@ class GemmaRecommender:
                     # 마지막 메시지 (assistant 응답) 추출
                     assistant_response = generated_text[-1]["content"].strip()
                     if assistant_response:
-                        return f"🤖 **Qwen AI 추천**\n\n{assistant_response}"
+                        return f"{RESPONSE_HEADER}{assistant_response}"
                 elif isinstance(generated_text, str):
                     # 문자열인 경우 원본 프롬프트 이후 부분 추출
                     prompt_end = generated_text.find("간결하고 친근하게 작성해주세요.")
                     if prompt_end != -1:
                         response = generated_text[prompt_end + len("간결하고 친근하게 작성해주세요."):].strip()
                         if response:
-                            return f"🤖 **Qwen AI 추천**\n\n{response}"
+                            return f"{RESPONSE_HEADER}{response}"
             
             # 응답이 없으면 폴백
             return self._fallback_response(query, search_results)
@@ -97,6 +218,185 @@ class GemmaRecommender:
             print(f"AI 추천 생성 중 오류: {e}")
             return self._fallback_response(query, search_results)
     
+    def stream_recommendation_text(self, query: str, search_results: List[Tuple[Dict, float]],
+                                   max_new_tokens: Optional[int] = None, max_time: Optional[float] = None,
+                                   stop_event: Optional[Event] = None) -> Iterator[str]:
+        """추천 텍스트를 토큰이 생성되는 대로 스트리밍
+        
+        매번 지금까지 생성된 전체 텍스트를 yield하며, 마지막 값이 최종 텍스트.
+        토큰/시간 예산에 걸려 중단되면 마지막 값은 완결된 문장까지만 남김.
+        stop_event: 설정되면 다음 토큰에서 생성을 멈춤 (클라이언트 연결이 끊긴 경우, 잘린 응답으로 기록)
+        """
+        if not search_results:
+            yield "검색 결과가 없습니다."
+            return
+        
+        max_new_tokens = max_new_tokens or self.max_new_tokens
+        max_time = max_time if max_time is not None else self.max_time
+        
+        try:
+            tokenizer = self.pipe.tokenizer
+            model = self.pipe.model
+            prompt = tokenizer.apply_chat_template(self._build_messages(query, search_results),
+                                                   tokenize=False, add_generation_prompt=True)
+            inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+            input_length = inputs["input_ids"].shape[1]
+        except Exception as e:
+            print(f"AI 추천 생성 중 오류: {e}")
+            yield self._fallback_response(query, search_results)
+            return
+        
+        # 생성은 백그라운드 스레드에서, 토큰은 스트리머를 통해 받음
+        from transformers import TextIteratorStreamer
+        streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        generation_kwargs = dict(
+            **inputs,
+            streamer=streamer,
+            max_new_tokens=max_new_tokens,
+            **self._sampling_kwargs(),
+        )
+        if max_time:
+            generation_kwargs["max_time"] = max_time
+        if stop_event is not None:
+            generation_kwargs["stopping_criteria"] = self._stop_on(stop_event)
+        prefix_cache = self._prefix_cache_for(inputs["input_ids"])
+        if prefix_cache is not None:
+            generation_kwargs["past_key_values"] = prefix_cache
+        
+        result = {}
+        def run_generation():
+            try:
+                result["output"] = model.generate(**generation_kwargs)
+            except Exception as e:
+                result["error"] = e
+                streamer.end()
+        
+        start = time.perf_counter()
+        first_token_time = None
+        thread = Thread(target=run_generation, daemon=True)
+        thread.start()
+        
+        response = ""
+        for new_text in streamer:
+            if not new_text:
+                continue
+            if first_token_time is None:
+                first_token_time = time.perf_counter() - start
+            response += new_text
+            yield f"{RESPONSE_HEADER}{response}"
+        thread.join()
+        elapsed = time.perf_counter() - start
+        
+        if "error" in result or not response.strip():
+            if "error" in result:
+                print(f"AI 추천 생성 중 오류: {result['error']}")
+            yield self._fallback_response(query, search_results)
+            return
+        
+        # 예산에 걸려 중단된 경우 마지막 완결 문장에서 자름
+        num_tokens = result["output"].shape[1] - input_length
+        stopped = stop_event is not None and stop_event.is_set()
+        truncated = num_tokens >= max_new_tokens or bool(max_time and elapsed >= max_time) or stopped
+        if truncated:
+            response = truncate_at_sentence(response)
+        metrics.incr("llm.stopped", int(stopped))
+        metrics.observe("llm.generate", elapsed)
+        if first_token_time is not None:
+            metrics.observe("llm.time_to_first_token", first_token_time)
+        metrics.incr("llm.prompt_tokens", input_length)
+        metrics.incr("llm.new_tokens", int(num_tokens))
+        metrics.incr("llm.truncated", int(truncated))
+        self.last_generation_stats = {
+            "time_to_first_token": first_token_time,
+            "elapsed": elapsed,
+            "new_tokens": int(num_tokens),
+            "truncated": truncated,
+            "tokens_per_second": num_tokens / elapsed if elapsed > 0 else 0.0,
+            "prefix_cache_hit": prefix_cache is not None,
+        }
+        yield f"{RESPONSE_HEADER}{response.strip()}"
+    
+    @staticmethod
+    def _stop_on(stop_event: Event):
+        """stop_event가 설정되면 생성을 멈추는 stopping criteria"""
+        import torch
+        from transformers import StoppingCriteria, StoppingCriteriaList
+        
+        class StopOnEvent(StoppingCriteria):
+            def __call__(self, input_ids, scores, **kwargs):
+                return torch.full((input_ids.shape[0],), stop_event.is_set(), dtype=torch.bool, device=input_ids.device)
+        
+        return StoppingCriteriaList([StopOnEvent()])
+    
+    def generate_batch(self, requests: List[Tuple[str, List[Tuple[Dict, float]]]],
+                       max_new_tokens: Optional[int] = None) -> List[str]:
+        """여러 (쿼리, 검색 결과) 요청을 왼쪽 패딩한 하나의 배치로 생성
+
+        요청별 생성 토큰 수와 예산 초과 여부는 last_batch_stats에 (예산에 걸린 응답은 완결 문장까지만 남김)
+        """
+        max_new_tokens = max_new_tokens or self.max_new_tokens
+        responses = [None] * len(requests)
+        self.last_batch_stats = [{"new_tokens": 0, "truncated": False} for _ in requests]
+        prompts, prompt_positions = [], []
+        for i, (query, search_results) in enumerate(requests):
+            if not search_results:
+                responses[i] = "검색 결과가 없습니다."
+                continue
+            prompts.append(self.pipe.tokenizer.apply_chat_template(
+                self._build_messages(query, search_results), tokenize=False, add_generation_prompt=True
+            ))
+            prompt_positions.append(i)
+        if not prompts:
+            return responses
+        
+        import torch
+        
+        tokenizer = self.pipe.tokenizer
+        model = self.pipe.model
+        start = time.perf_counter()
+        try:
+            # decoder-only 모델은 생성 위치가 맞도록 왼쪽 패딩
+            padding_side = tokenizer.padding_side
+            tokenizer.padding_side = "left"
+            try:
+                inputs = tokenizer(prompts, return_tensors="pt", padding=True).to(model.device)
+            finally:
+                tokenizer.padding_side = padding_side
+            
+            generation_kwargs = {"max_time": self.max_time} if self.max_time else {}
+            with torch.no_grad(), metrics.span("llm.generate_batch"):
+                outputs = model.generate(
+                    **inputs,
+                    max_new_tokens=max_new_tokens,
+                    **self._sampling_kwargs(),
+                    pad_token_id=tokenizer.pad_token_id or tokenizer.eos_token_id,
+                    **generation_kwargs
+                )
+            new_tokens = outputs[:, inputs["input_ids"].shape[1]:]
+            texts = tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
+            token_counts = (new_tokens != (tokenizer.pad_token_id or tokenizer.eos_token_id)).sum(dim=1).tolist()
+            metrics.incr("llm.prompt_tokens", int(inputs["attention_mask"].sum()))
+            metrics.incr("llm.new_tokens", int(sum(token_counts)))
+        except Exception as e:
+            print(f"AI 추천 배치 생성 중 오류: {e}")
+            texts = [""] * len(prompts)
+            token_counts = [0] * len(prompts)
+        out_of_time = bool(self.max_time and time.perf_counter() - start >= self.max_time)
+        
+        for i, text, num_tokens in zip(prompt_positions, texts, token_counts):
+            query, search_results = requests[i]
+            text = text.strip()
+            if not text:
+                responses[i] = self._fallback_response(query, search_results)
+                continue
+            truncated = num_tokens >= max_new_tokens or out_of_time
+            if truncated:
+                text = truncate_at_sentence(text)
+            metrics.incr("llm.truncated", int(truncated))
+            self.last_batch_stats[i] = {"new_tokens": int(num_tokens), "truncated": truncated}
+            responses[i] = f"{RESPONSE_HEADER}{text}"
+        return responses
+    
     def _fallback_response(self, query: str, search_results: List[Tuple[Dict, float]]) -> str:
         """AI 실패시 폴백 응답"""
         simple_recommender = SimpleRecommender()
@@ -105,6 +405,94 @@ class GemmaRecommender:
 # 호환성을 위한 별칭
 LlamaRecommender = GemmaRecommender
 
+class RecommendationBatcher:
+    """동시 요청을 모아 한 번의 배치 생성으로 처리하는 마이크로 배칭 스케줄러
+    
+    요청은 큐에 쌓이고, 워커 스레드가 첫 요청 이후 최대 max_wait_ms 동안(또는 max_batch_size개가
+    찰 때까지) 요청을 모아 GemmaRecommender.generate_batch로 한 번에 생성한 뒤 Future로 결과를 전달.
+    GemmaRecommender와 같은 generate_recommendation_text 인터페이스를 제공.
+    
+    run: 배치 생성을 실행할 함수 (기본: 워커 스레드에서 바로 실행). 서비스는 생성 스레드에 넘겨
+         스트리밍 생성과 같은 모델을 동시에 쓰지 않도록 함
+    """
+    
+    def __init__(self, recommender: GemmaRecommender, max_batch_size: int = 8, max_wait_ms: float = 20.0,
+                 run: Optional[Callable[[Callable], object]] = None):
+        self.recommender = recommender
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._execute = run or (lambda fn: fn())
+        self._queue = queue.Queue()
+        self._stopped = False
+        self.stats = {"batches": 0, "requests": 0, "max_batch_size_seen": 0}
+        self._worker = Thread(target=self._run, daemon=True)
+        self._worker.start()
+    
+    def submit(self, query: str, search_results: List[Tuple[Dict, float]]) -> Future:
+        """추천 생성 요청 등록 (결과는 Future로 반환, 완료 후 future.generation_stats에 요청별 생성 통계)"""
+        if self._stopped:
+            raise RuntimeError("배치 스케줄러가 종료되었습니다.")
+        future = Future()
+        self._queue.put((query, search_results, future))
+        return future
+    
+    def generate_recommendation_text(self, query: str, search_results: List[Tuple[Dict, float]],
+                                     timeout: Optional[float] = None) -> str:
+        """요청을 등록하고 배치 생성 결과를 기다림"""
+        return self.submit(query, search_results).result(timeout)
+    
+    def _collect_batch(self, first_item) -> List:
+        batch = [first_item]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+    
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = self._collect_batch(item)
+            # 대기 중 취소된 요청은 제외
+            batch = [entry for entry in batch if entry[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            
+            self.stats["batches"] += 1
+            self.stats["requests"] += len(batch)
+            self.stats["max_batch_size_seen"] = max(self.stats["max_batch_size_seen"], len(batch))
+            try:
+                requests = [(query, results) for query, results, _ in batch]
+                responses, batch_stats = self._execute(lambda: self._generate(requests))
+                for (_, _, future), response, stats in zip(batch, responses, batch_stats):
+                    future.generation_stats = stats
+                    future.set_result(response)
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+    
+    def _generate(self, requests: List[Tuple[str, List[Tuple[Dict, float]]]]) -> Tuple[List[str], List[Dict]]:
+        responses = self.recommender.generate_batch(requests)
+        return responses, getattr(self.recommender, "last_batch_stats", None) or [{} for _ in requests]
+    
+    def shutdown(self, wait: bool = True):
+        """워커 종료 (이미 큐에 들어온 요청은 처리 후 종료)"""
+        self._stopped = True
+        self._queue.put(None)
+        if wait:
+            self._worker.join()
+
 # 간단한 테스트용 클래스 (LLM 없이)
 class SimpleRecommender:
     def generate_recommendation_text(self, user_query: str, search_results: List[Tuple[Dict, float]]) -> str:
@@ -125,4 +513,101 @@ class SimpleRecommender:
 """
         
         response += "💡 **더 자연스러운 AI 추천을 원하시면 사이드바에서 'Gemma AI 추천 사용'을 체크해보세요!**"
-        return response 
\ No newline at end of file
+        return response 
+
+class StubRecommender:
+    """LLM 없이 GemmaRecommender의 스트리밍 인터페이스를 흉내내는 추천기 (오프라인 부하 테스트용)
+
+    SimpleRecommender 템플릿 텍스트를 time_to_first_token 뒤 tokens_per_second 속도로 흘려보냄 (토큰 = 2글자).
+    대기는 sleep이므로 CPU는 쓰지 않고 생성 스레드 점유 시간과 스트리밍 지연만 재현함
+    """
+    
+    def __init__(self, tokens_per_second: float = 20.0, time_to_first_token: float = 0.5,
+                 max_new_tokens: int = 128, max_time: Optional[float] = None):
+        self.tokens_per_second = tokens_per_second
+        self.time_to_first_token = time_to_first_token
+        self.max_new_tokens = max_new_tokens
+        self.max_time = max_time
+        self.last_generation_stats = {}
+    
+    def sampling_config(self) -> Dict:
+        return {"model": "stub", "tokens_per_second": self.tokens_per_second, "max_new_tokens": self.max_new_tokens}
+    
+    def stream_recommendation_text(self, query: str, search_results: List[Tuple[Dict, float]],
+                                   max_new_tokens: Optional[int] = None, max_time: Optional[float] = None,
+                                   stop_event: Optional[Event] = None) -> Iterator[str]:
+        if not search_results:
+            yield "검색 결과가 없습니다."
+            return
+        
+        max_new_tokens = max_new_tokens or self.max_new_tokens
+        max_time = max_time if max_time is not None else self.max_time
+        text = SimpleRecommender().generate_recommendation_text(query, search_results)
+        tokens = [text[i:i + 2] for i in range(0, len(text), 2)]
+        
+        start = time.perf_counter()
+        time.sleep(self.time_to_first_token)
+        response = ""
+        num_tokens = 0
+        for token in tokens[:max_new_tokens]:
+            if max_time and time.perf_counter() - start >= max_time:
+                break
+            if stop_event is not None and stop_event.is_set():
+                metrics.incr("llm.stopped")
+                break
+            if num_tokens:
+                time.sleep(1 / self.tokens_per_second)
+            response += token
+            num_tokens += 1
+            yield f"{RESPONSE_HEADER}{response}"
+        elapsed = time.perf_counter() - start
+        
+        truncated = num_tokens < len(tokens)
+        if truncated:
+            response = truncate_at_sentence(response)
+        metrics.observe("llm.generate", elapsed)
+        metrics.observe("llm.time_to_first_token", self.time_to_first_token)
+        metrics.incr("llm.new_tokens", num_tokens)
+        metrics.incr("llm.truncated", int(truncated))
+        self.last_generation_stats = {
+            "time_to_first_token": self.time_to_first_token,
+            "elapsed": elapsed,
+            "new_tokens": num_tokens,
+            "truncated": truncated,
+            "tokens_per_second": num_tokens / elapsed if elapsed > 0 else 0.0,
+            "prefix_cache_hit": False,
+        }
+        yield f"{RESPONSE_HEADER}{response.strip()}"
+    
+    def generate_recommendation_text(self, query: str, search_results: List[Tuple[Dict, float]]) -> str:
+        return list(self.stream_recommendation_text(query, search_results))[-1]
+    
+    def generate_batch(self, requests: List[Tuple[str, List[Tuple[Dict, float]]]],
+                       max_new_tokens: Optional[int] = None) -> List[str]:
+        """배치 생성 흉내: 배치 전체가 가장 긴 요청의 토큰 수만큼 한 번에 디코딩된다고 보고 그 시간만 대기"""
+        max_new_tokens = max_new_tokens or self.max_new_tokens
+        texts = [SimpleRecommender().generate_recommendation_text(query, search_results) if search_results else ""
+                 for query, search_results in requests]
+        lengths = [min(max_new_tokens, (len(text) + 1) // 2) for text in texts]
+        steps = max(lengths, default=0)
+        if self.max_time:
+            steps = min(steps, int((self.max_time - self.time_to_first_token) * self.tokens_per_second) + 1)
+        time.sleep(self.time_to_first_token + max(steps - 1, 0) / self.tokens_per_second)
+        
+        responses = []
+        self.last_batch_stats = []
+        for text, length in zip(texts, lengths):
+            if not text:
+                responses.append("검색 결과가 없습니다.")
+                self.last_batch_stats.append({"new_tokens": 0, "truncated": False})
+                continue
+            num_tokens = min(length, steps)
+            response = text[:num_tokens * 2]
+            truncated = len(response) < len(text)
+            if truncated:
+                response = truncate_at_sentence(response)
+            metrics.incr("llm.new_tokens", num_tokens)
+            metrics.incr("llm.truncated", int(truncated))
+            self.last_batch_stats.append({"new_tokens": num_tokens, "truncated": truncated})
+            responses.append(f"{RESPONSE_HEADER}{response.strip()}")
+        return responses
@@ -0,0 +1,99 @@
+import json
+import numbers
+import os
+import numpy as np
+from typing import Dict, Iterator, List
+
+SCHEMA_FILE = "schema.json"
+
+class RestaurantStore:
+    """컬럼 단위로 저장된 식당 메타데이터 (읽기 전용, 행 단위 지연 로드)
+
+    - 숫자 컬럼: 컬럼별 .npy 배열
+    - 문자열 컬럼: UTF-8 바이트를 이어붙인 .data.npy + 행 경계 .offsets.npy
+    모든 배열을 np.load(mmap_mode='r')로 열기 때문에 여러 프로세스가 같은 페이지 캐시를 공유하고,
+    검색 결과로 선택된 행만 dict로 만들어 반환한다. list 대신 self.restaurants로 사용할 수 있다.
+    """
+
+    def __init__(self, store_dir: str):
+        with open(os.path.join(store_dir, SCHEMA_FILE), "r", encoding="utf-8") as f:
+            schema = json.load(f)
+        self.store_dir = store_dir
+        self.columns = schema["columns"]
+        self._size = schema["size"]
+        self._arrays = {}
+        for name, kind in self.columns.items():
+            if kind == "str":
+                self._arrays[name] = (
+                    np.load(os.path.join(store_dir, f"{name}.data.npy"), mmap_mode="r"),
+                    np.load(os.path.join(store_dir, f"{name}.offsets.npy"), mmap_mode="r"),
+                )
+            else:
+                self._arrays[name] = np.load(os.path.join(store_dir, f"{name}.npy"), mmap_mode="r")
+
+    @staticmethod
+    def write(store_dir: str, restaurants: List[Dict]):
+        """식당 dict 리스트를 컬럼 파일들로 저장
+
+        증분 빌드로 이전 버전 레코드와 새 필드가 있는 레코드가 섞이면 없는 값은 빈 문자열로 저장
+        """
+        os.makedirs(store_dir, exist_ok=True)
+        columns = {}
+        for name in dict.fromkeys(name for restaurant in restaurants for name in restaurant):
+            values = [restaurant.get(name, "") for restaurant in restaurants]
+            if all(isinstance(v, numbers.Integral) and not isinstance(v, bool) for v in values):
+                columns[name] = "int"
+                np.save(os.path.join(store_dir, f"{name}.npy"), np.array(values, dtype=np.int64))
+            elif all(isinstance(v, numbers.Real) for v in values):
+                columns[name] = "float"
+                np.save(os.path.join(store_dir, f"{name}.npy"), np.array(values, dtype=np.float64))
+            else:
+                columns[name] = "str"
+                encoded = [str(v).encode("utf-8") for v in values]
+                offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+                offsets[1:] = np.cumsum([len(b) for b in encoded])
+                data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+                np.save(os.path.join(store_dir, f"{name}.data.npy"), data)
+                np.save(os.path.join(store_dir, f"{name}.offsets.npy"), offsets)
+
+        with open(os.path.join(store_dir, SCHEMA_FILE), "w", encoding="utf-8") as f:
+            json.dump({"size": len(restaurants), "columns": columns}, f, ensure_ascii=False, indent=2)
+
+    def column(self, name: str) -> np.ndarray:
+        """숫자 컬럼 전체 배열 (mmap)"""
+        if self.columns[name] == "str":
+            raise ValueError(f"문자열 컬럼은 배열로 반환할 수 없습니다: {name}")
+        return self._arrays[name]
+
+    def string_column(self, name: str) -> List[str]:
+        """문자열 컬럼 전체 디코딩 (필터 비트맵 구축용)"""
+        if self.columns[name] != "str":
+            return [str(v) for v in self._arrays[name]]
+        data, offsets = self._arrays[name]
+        raw = bytes(data)
+        return [raw[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(self._size)]
+
+    def _value(self, name: str, idx: int):
+        kind = self.columns[name]
+        if kind == "str":
+            data, offsets = self._arrays[name]
+            return bytes(data[offsets[idx]:offsets[idx + 1]]).decode("utf-8")
+        value = self._arrays[name][idx]
+        return int(value) if kind == "int" else float(value)
+
+    def __getitem__(self, idx: int) -> Dict:
+        if idx < 0:
+            idx += self._size
+        if not 0 <= idx < self._size:
+            raise IndexError(idx)
+        return {name: self._value(name, idx) for name in self.columns}
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Dict]:
+        for idx in range(self._size):
+            yield self[idx]
+
+    def __bool__(self) -> bool:
+        return self._size > 0
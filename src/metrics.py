@@ -0,0 +1,179 @@
+import bisect
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from contextlib import nullcontext
+from typing import Callable, Dict, Optional, Tuple
+
+# 구간(span) 지연시간 히스토그램 버킷 (초)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class _Histogram:
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        i = bisect.bisect_left(LATENCY_BUCKETS, value)
+        if i < len(self.buckets):
+            self.buckets[i] += 1
+
+class _Span:
+    __slots__ = ("registry", "name", "start")
+
+    def __init__(self, registry: "MetricsRegistry", name: str):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.registry.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+class MetricsRegistry:
+    """구간별 지연시간 히스토그램 + 카운터 (프로세스 전역, 스레드 안전)
+
+    비활성 상태에서는 span()이 공유 nullcontext를, timed 함수는 원래 함수를 바로 호출하므로
+    플래그 확인 한 번 외의 비용이 없음. 환경변수 RECOMMENDER_METRICS=1 또는 enable()로 활성화.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._spans: Dict[str, _Histogram] = {}
+        self._counters: Dict[str, float] = {}
+
+    def enable(self, enabled: bool = True):
+        self.enabled = enabled
+
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
+
+    def observe(self, name: str, seconds: float):
+        """구간 소요 시간 직접 기록 (예: 첫 토큰까지의 시간)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._spans.get(name)
+            if histogram is None:
+                histogram = self._spans[name] = _Histogram()
+            histogram.observe(seconds)
+
+    def incr(self, name: str, value: float = 1):
+        if not self.enabled or not value:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def span(self, name: str):
+        """with metrics.span("search.faiss"): ... 구간 시간 측정"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def timed(self, name: str) -> Callable:
+        """함수 전체 시간을 측정하는 데코레이터"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with _Span(self, name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self) -> Dict:
+        """JSON 로그용 현재 값"""
+        with self._lock:
+            return {
+                "timestamp": time.time(),
+                "spans": {
+                    name: {"count": h.count, "sum_s": h.total, "max_s": h.max,
+                           "avg_ms": h.total / h.count * 1000 if h.count else 0.0}
+                    for name, h in sorted(self._spans.items())
+                },
+                "counters": dict(sorted(self._counters.items())),
+            }
+
+    def log_json(self, path: str):
+        """현재 값을 JSON Lines 파일에 한 줄 추가"""
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(self.snapshot(), ensure_ascii=False) + "\n")
+
+    def prometheus_text(self, prefix: str = "recommender") -> str:
+        """Prometheus 텍스트 노출 형식"""
+        lines = []
+        with self._lock:
+            if self._spans:
+                lines.append(f"# TYPE {prefix}_span_seconds histogram")
+            for name, h in sorted(self._spans.items()):
+                label = f'span="{name}"'
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, h.buckets):
+                    cumulative += count
+                    lines.append(f'{prefix}_span_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f'{prefix}_span_seconds_bucket{{{label},le="+Inf"}} {h.count}')
+                lines.append(f"{prefix}_span_seconds_sum{{{label}}} {h.total}")
+                lines.append(f"{prefix}_span_seconds_count{{{label}}} {h.count}")
+            for name, value in sorted(self._counters.items()):
+                metric = f"{prefix}_{name.replace('.', '_')}_total"
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+_NULL_SPAN = nullcontext()
+
+METRICS = MetricsRegistry(enabled=os.environ.get("RECOMMENDER_METRICS") == "1")
+span = METRICS.span
+timed = METRICS.timed
+observe = METRICS.observe
+incr = METRICS.incr
+
+def run_profiled(fn: Callable, *args, profiler: str = "cprofile", top: int = 30, **kwargs) -> Tuple[object, str]:
+    """요청 하나를 프로파일링하며 실행하고 (결과, 텍스트 리포트) 반환
+
+    cProfile은 호출한 스레드만 측정하므로 실제 작업이 실행되는 스레드 안에서 호출해야 함.
+    profiler="pyinstrument"이면 샘플링 프로파일러 사용 (pip install pyinstrument)
+    """
+    if profiler == "pyinstrument":
+        from pyinstrument import Profiler
+
+        sampler = Profiler()
+        sampler.start()
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            sampler.stop()
+        return result, sampler.output_text(unicode=True)
+
+    profile = cProfile.Profile()
+    result = profile.runcall(fn, *args, **kwargs)
+    report = io.StringIO()
+    pstats.Stats(profile, stream=report).sort_stats("cumulative").print_stats(top)
+    return result, report.getvalue()
+
+def maybe_profiled(enabled: bool, fn: Callable, *args, profiler: str = "cprofile",
+                   **kwargs) -> Tuple[object, Optional[str]]:
+    """enabled일 때만 run_profiled, 아니면 (결과, None)"""
+    if not enabled:
+        return fn(*args, **kwargs), None
+    return run_profiled(fn, *args, profiler=profiler, **kwargs)
@@ -0,0 +1,102 @@
+import sys
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import numpy as np
+
+def normalize_query(query: str, lowercase: bool = True) -> str:
+    """캐시 키용 쿼리 정규화 (유니코드 NFC, 공백 정리, 소문자화)
+
+    키에만 쓰고 인코딩에는 원문을 사용 (대소문자를 구분하는 임베딩 모델은 "BBQ"와 "bbq"를 다르게 인코딩하므로
+    검색 결과 캐시는 lowercase=False로 대소문자를 유지)
+    """
+    query = " ".join(unicodedata.normalize("NFC", query).split())
+    return query.lower() if lowercase else query
+
+def estimate_size(value: Any) -> int:
+    """캐시 항목 크기 추정 (numpy 배열은 실제 버퍼 크기, 검색 결과는 리스트/튜플 오버헤드)"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes + 112
+    if isinstance(value, list):
+        # 식당 dict는 VectorDB와 공유되므로 리스트와 (dict, score) 튜플 비용만 계산
+        return sys.getsizeof(value) + len(value) * 88
+    return sys.getsizeof(value)
+
+class LRUCache:
+    """바이트 크기 기준 LRU 캐시 (스레드 안전, 적중/미스 카운터 포함)"""
+
+    def __init__(self, max_bytes: int, size_fn: Callable[[Any], int] = estimate_size):
+        self.max_bytes = max_bytes
+        self.size_fn = size_fn
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any):
+        size = self.size_fn(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            self._data[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._data.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.current_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+class QueryCache:
+    """쿼리 임베딩 캐시 + (쿼리, k, 검색 옵션) 결과 캐시"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, result_ratio: float = 0.25):
+        result_bytes = int(max_bytes * result_ratio)
+        self.embeddings = LRUCache(max_bytes - result_bytes)
+        self.results = LRUCache(result_bytes)
+
+    def clear_results(self):
+        """인덱스가 바뀌면 검색 결과만 무효화 (임베딩은 모델이 같으므로 유지)"""
+        self.results.clear()
+
+    def clear(self):
+        self.embeddings.clear()
+        self.results.clear()
+
+    def stats(self) -> Dict:
+        return {"embeddings": self.embeddings.stats(), "results": self.results.stats()}
@@ -0,0 +1,65 @@
+import re
+from typing import Dict, Hashable, Optional, Tuple
+
+# 검색 필터 키
+# - location / menu_type / price_range: 값 하나 또는 값 리스트 (리스트면 OR)
+# - min_rating / min_review_count: 하한값
+CATEGORICAL_FILTERS = ("location", "menu_type", "price_range")
+NUMERIC_FILTERS = {"min_rating": "rating", "min_review_count": "review_count"}
+
+# 쿼리 표현 → 필터 값 (RestaurantDataProcessor의 분류 체계와 동일한 값 사용)
+LOCATION_KEYWORDS = [
+    (re.compile("건대|건국대|건입|자양동|화양동"), "건대"),
+    (re.compile("홍대|홍익대|연남|합정"), "홍대"),
+    (re.compile("성수|서울숲|뚝섬"), "성수"),
+]
+MENU_KEYWORDS = [
+    (re.compile("고기|삼겹|갈비|곱창|돼지|소고기|한우|숯불|규카츠"), "고기류"),
+    (re.compile("면요리|국수|라멘|라면|우동|쌀국수|냉면|칼국수|짬뽕|도삭면"), "면요리"),
+    (re.compile("일식|스시|초밥|카츠|돈가스|돈까스|사시미|오마카세"), "일식"),
+    (re.compile("디저트|카페|빙수|케이크|젤라또|베이커리|빵집"), "디저트"),
+    (re.compile("퓨전|포케|타코|웨스턴|멕시칸"), "퓨전"),
+    (re.compile("한식|백반|국밥|찌개"), "한식"),
+]
+CHEAP_PATTERN = re.compile("저렴|가성비|(?<!비)싼 |(?<!비)싸게|학생")
+CHEAP_PRICE_RANGES = ["1-2만원대", "1-3만원대"]
+HIGH_RATING_PATTERN = re.compile("평점 ?높|별점 ?높|평이 좋|맛집 중의 맛집")
+HIGH_RATING_THRESHOLD = 4.0
+
+def parse_query_filters(query: str) -> Dict:
+    """한국어 쿼리에서 위치/메뉴/가격/평점 필터 추출 (해당 표현이 없으면 필터 없음)"""
+    filters = {}
+
+    locations = [value for pattern, value in LOCATION_KEYWORDS if pattern.search(query)]
+    if locations:
+        filters["location"] = locations if len(locations) > 1 else locations[0]
+
+    # 메뉴는 가장 먼저 매칭되는 분류 하나만 사용 (예: "규카츠"는 고기류)
+    menu_type = next((value for pattern, value in MENU_KEYWORDS if pattern.search(query)), None)
+    if menu_type:
+        filters["menu_type"] = menu_type
+
+    if CHEAP_PATTERN.search(query + " "):
+        filters["price_range"] = list(CHEAP_PRICE_RANGES)
+
+    if HIGH_RATING_PATTERN.search(query):
+        filters["min_rating"] = HIGH_RATING_THRESHOLD
+
+    return filters
+
+def validate_filters(filters: Optional[Dict]) -> Dict:
+    """알 수 없는 필터 키 검사"""
+    filters = filters or {}
+    unknown = set(filters) - set(CATEGORICAL_FILTERS) - set(NUMERIC_FILTERS)
+    if unknown:
+        raise ValueError(f"알 수 없는 검색 필터: {sorted(unknown)}")
+    return filters
+
+def filters_key(filters: Optional[Dict]) -> Tuple[Hashable, ...]:
+    """캐시 키로 쓸 수 있는 필터 표현"""
+    if not filters:
+        return ()
+    return tuple(sorted(
+        (name, tuple(sorted(value)) if isinstance(value, (list, tuple, set)) else value)
+        for name, value in filters.items()
+    ))
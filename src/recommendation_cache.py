@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import metrics
+from query_cache import normalize_query
+from llm_integration import RESPONSE_HEADER
+
+class RecommendationCache:
+    """LLM 추천글 영구 캐시 (SQLite, 여러 Streamlit 워커 프로세스가 같은 파일을 공유)
+
+    키: 정규화된 쿼리 + 순서가 있는 식당 id 목록 + 인덱스 버전 + 샘플링 설정
+    만료(TTL)와 항목 수 상한(오래 사용되지 않은 항목부터 삭제)으로 크기를 제한
+    """
+
+    def __init__(self, db_path: str = "models/recommendation_cache.sqlite",
+                 ttl_seconds: float = 7 * 24 * 3600, max_entries: int = 10000):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            # WAL: 읽기와 쓰기가 서로 막지 않아 여러 프로세스가 동시에 사용 가능
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS recommendations ("
+                " key TEXT PRIMARY KEY,"
+                " text TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON recommendations(last_access)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # 작업마다 새 연결을 사용 (스레드/프로세스 간 연결 공유 없음)
+        return sqlite3.connect(self.db_path, timeout=5.0)
+
+    @staticmethod
+    def make_key(query: str, restaurant_ids: List[int], index_version: Optional[str], sampling: Dict) -> str:
+        payload = json.dumps(
+            [normalize_query(query), list(restaurant_ids), index_version, sampling],
+            ensure_ascii=False, sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT text, created_at FROM recommendations WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM recommendations WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE recommendations SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, text: str):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO recommendations (key, text, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, text, now, now),
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """만료 항목 삭제 후 상한을 넘으면 가장 오래 사용되지 않은 항목부터 삭제"""
+        conn.execute("DELETE FROM recommendations WHERE created_at < ?", (now - self.ttl_seconds,))
+        (count,) = conn.execute("SELECT COUNT(*) FROM recommendations").fetchone()
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM recommendations WHERE key IN ("
+                " SELECT key FROM recommendations ORDER BY last_access ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM recommendations")
+
+    def __len__(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM recommendations").fetchone()[0]
+
+    def stats(self) -> Dict:
+        """이 프로세스 기준 적중/미스 + 파일 전체 항목 수"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def lookup(self, recommender, query: str, search_results: List[Tuple[Dict, float]],
+               index_version: Optional[str]) -> Tuple[str, Optional[str]]:
+        """(캐시 키, 캐시된 추천글 또는 None)"""
+        key = self.make_key(query, [restaurant['id'] for restaurant, _ in search_results[:3]],
+                            index_version, recommender.sampling_config())
+        cached = self.get(key)
+        metrics.incr("recommendation_cache.hits" if cached is not None else "recommendation_cache.misses")
+        return key, cached
+
+    def store(self, key: str, text: str, generation_stats: Optional[Dict] = None):
+        """생성한 추천글 저장 (폴백 응답이나 시간/토큰 예산으로 잘린 응답은 저장하지 않음)"""
+        if text.startswith(RESPONSE_HEADER) and not (generation_stats or {}).get("truncated"):
+            self.put(key, text)
+
+    def stream(self, recommender, query: str, search_results: List[Tuple[Dict, float]],
+               index_version: Optional[str], **stream_kwargs) -> Iterator[str]:
+        """캐시에 있으면 바로 반환하고, 없으면 recommender로 스트리밍 생성 후 저장"""
+        key, cached = self.lookup(recommender, query, search_results, index_version)
+        if cached is not None:
+            yield cached
+            return
+
+        text = ""
+        for text in recommender.stream_recommendation_text(query, search_results, **stream_kwargs):
+            yield text
+        self.store(key, text, getattr(recommender, "last_generation_stats", {}))
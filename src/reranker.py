@@ -0,0 +1,111 @@
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# 후보 내에서 0~1로 정규화한 1차 검색 점수에 더할 식당 속성 가중치 (속성도 후보 내에서 0~1로 정규화)
+# 합이 작아 관련도가 거의 같은 후보끼리만 순서를 바꿈 (크게 하면 평점/리뷰 수가 관련도를 이겨
+# benchmark_retrieval.py의 재정렬 점검에서 품질이 떨어짐)
+DEFAULT_FEATURE_WEIGHTS = {
+    "rating": 0.005,
+    "review_count": 0.003,
+    "avg_visits": 0.002,
+    "positive_review_ratio": 0.003,
+}
+DEFAULT_CROSS_ENCODER = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+# 식당 레코드의 review_snippets에서 대표 리뷰를 구분하는 문자 (data_preprocessing.review_snippets 참고)
+REVIEW_SNIPPET_SEPARATOR = "\n"
+
+class FeatureReranker:
+    """1차 검색 점수 + 평점/리뷰 수/재방문/긍정 리뷰 비율을 결합한 재정렬 (후보 전체를 행렬 연산으로 계산)
+
+    1차 점수는 fusion 방식마다 척도가 다르므로(코사인 ≈ 0~1, RRF ≈ 0.03) 후보 내에서 min-max 정규화한 뒤 결합.
+    반환 점수는 CrossEncoderReranker와 같이 1차 점수를 내림차순으로 새 순서에 다시 배정해 척도를 유지함
+    """
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None, similarity_weight: float = 1.0):
+        self.weights = dict(DEFAULT_FEATURE_WEIGHTS if weights is None else weights)
+        self.similarity_weight = similarity_weight
+
+    def features(self, candidates: List[Tuple[Dict, float]]) -> np.ndarray:
+        """후보 × 속성 행렬 (평점은 5점 만점, 개수형 속성은 log 스케일 후 후보 내 최댓값으로 나눔)"""
+        raw = np.array([[float(restaurant.get(name) or 0.0) for name in self.weights]
+                        for restaurant, _ in candidates], dtype=np.float64).reshape(len(candidates), len(self.weights))
+        for column, name in enumerate(self.weights):
+            if name == "rating":
+                raw[:, column] /= 5.0
+            elif name in ("review_count", "avg_visits"):
+                raw[:, column] = np.log1p(np.maximum(raw[:, column], 0.0))
+                peak = raw[:, column].max() if len(raw) else 0.0
+                if peak > 0:
+                    raw[:, column] /= peak
+        return raw
+
+    def rerank(self, query: str, candidates: List[Tuple[Dict, float]]) -> List[Tuple[Dict, float]]:
+        if len(candidates) < 2:
+            return candidates
+        previous = np.array([score for _, score in candidates], dtype=np.float64)
+        span = previous.max() - previous.min()
+        similarity = (previous - previous.min()) / span if span > 0 else np.ones_like(previous)
+        scores = self.similarity_weight * similarity + self.features(candidates) @ np.array(list(self.weights.values()))
+        order = np.argsort(-scores, kind="stable")
+        return [(candidates[i][0], float(score)) for i, score in zip(order, np.sort(previous)[::-1])]
+
+class CrossEncoderReranker:
+    """CPU cross-encoder로 (쿼리, 리뷰) 쌍을 배치 단위로 채점하는 재정렬
+
+    입력 후보 중 앞쪽 max_candidates개만 채점하고 나머지는 뒤에 그대로 붙임.
+    식당마다 대표 리뷰(review_snippets, 없으면 search_text) 각각과 쿼리를 채점해 가장 높은 점수로 순서를 정함.
+    배치마다 경과 시간을 확인해 latency_budget_ms를 넘기면 (마지막 배치 포함) 입력 순서(이전 단계 순서)를 그대로 반환.
+    cross-encoder 점수(logit)는 이전 단계 점수와 척도가 다르므로 순서만 바꾸고, 점수는 앞쪽 후보들의
+    이전 단계 점수를 내림차순으로 새 순서에 다시 배정해 반환 목록 전체가 한 척도를 유지함
+    """
+
+    def __init__(self, model_name: str = DEFAULT_CROSS_ENCODER, latency_budget_ms: float = 150.0,
+                 batch_size: int = 16, max_candidates: int = 20, max_length: int = 256,
+                 text_field: str = "review_snippets", fallback_field: str = "search_text"):
+        from sentence_transformers import CrossEncoder
+
+        self.model = CrossEncoder(model_name, max_length=max_length, device="cpu")
+        self.latency_budget = latency_budget_ms / 1000
+        self.batch_size = batch_size
+        self.max_candidates = max_candidates
+        self.text_field = text_field
+        self.fallback_field = fallback_field
+        self.stats = {"calls": 0, "fallbacks": 0}
+
+    def _texts(self, restaurant: Dict) -> List[str]:
+        """채점할 리뷰 텍스트들 (대표 리뷰가 없는 이전 인덱스는 검색용 텍스트 하나)"""
+        texts = [text for text in str(restaurant.get(self.text_field) or "").split(REVIEW_SNIPPET_SEPARATOR) if text]
+        return texts or [restaurant[self.fallback_field]]
+
+    def rerank(self, query: str, candidates: List[Tuple[Dict, float]]) -> List[Tuple[Dict, float]]:
+        if len(candidates) < 2:
+            return candidates
+        self.stats["calls"] += 1
+        start = time.perf_counter()
+        head, tail = candidates[:self.max_candidates], candidates[self.max_candidates:]
+        pairs, owners = [], []
+        for position, (restaurant, _) in enumerate(head):
+            for text in self._texts(restaurant):
+                pairs.append((query, text))
+                owners.append(position)
+        scores = []
+        for batch_start in range(0, len(pairs), self.batch_size):
+            scores.extend(self.model.predict(pairs[batch_start:batch_start + self.batch_size],
+                                             batch_size=self.batch_size, show_progress_bar=False))
+            if time.perf_counter() - start > self.latency_budget:
+                self.stats["fallbacks"] += 1
+                return candidates
+        # 식당별 최고 리뷰 점수
+        best = np.full(len(head), -np.inf)
+        np.maximum.at(best, np.asarray(owners), np.asarray(scores, dtype=np.float64))
+        order = np.argsort(-best, kind="stable")
+        previous_scores = sorted((score for _, score in head), reverse=True)
+        return [(head[i][0], float(score)) for i, score in zip(order, previous_scores)] + tail
+
+def rerank(rerankers: List, query: str, candidates: List[Tuple[Dict, float]]) -> List[Tuple[Dict, float]]:
+    """재정렬 단계들을 순서대로 적용 (각 단계는 rerank(query, candidates) 인터페이스)"""
+    for reranker in rerankers:
+        candidates = reranker.rerank(query, candidates)
+    return candidates
@@ -0,0 +1,239 @@
+import argparse
+import datetime
+import json
+import os
+import re
+import uuid
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import metrics
+from data_preprocessing import (SENTIMENT_COLUMNS, RestaurantDataProcessor, file_sha256, list_csv_files,
+                                score_reviews)
+
+# 리뷰 컬럼 저장소 구조
+#   <store_dir>/manifest.json               원본 CSV별 sha256, 식당 id, 파티션 파일, 리뷰 수
+#   <store_dir>/<식당 id>-<해시>-v<버전>.parquet 원본 CSV 하나 = 파티션 하나 (리뷰 한 행씩, zstd 압축)
+# CSV가 바뀌면 해당 파티션만 다시 쓰고, 식당 id는 처음 부여한 값을 유지함
+REVIEW_STORE_DIR = "review_store"
+STORE_MANIFEST = "manifest.json"
+# 파티션 스키마가 바뀌면 올림 (버전이 다른 저장소는 모든 파티션을 다시 씀)
+STORE_VERSION = 2
+
+# 반복되는 식당명/태그 문자열은 Parquet 사전 인코딩으로 한 번씩만 저장됨
+SCHEMA = pa.schema([
+    ("restaurant_id", pa.int32()),
+    ("source_file", pa.string()),
+    ("restaurant_name", pa.string()),
+    ("written_date", pa.date32()),
+    ("visit_count", pa.int16()),
+    ("review", pa.string()),
+    ("tags", pa.list_(pa.string())),
+    # 리뷰별 긍정/부정 키워드 수 (변환할 때 한 번 계산, 평점 추정/순위 특성에 재사용)
+    ("positive_count", pa.int16()),
+    ("negative_count", pa.int16()),
+])
+
+# 저장소 컬럼 → 원본 CSV 컬럼 (RestaurantDataProcessor가 그대로 처리할 수 있도록)
+CSV_COLUMNS = {
+    "restaurant_name": "식당명",
+    "written_date": "작성일",
+    "visit_count": "방문횟수",
+    "review": "리뷰 내용",
+    "tags": "리뷰 태그",
+    "positive_count": SENTIMENT_COLUMNS[0],
+    "negative_count": SENTIMENT_COLUMNS[1],
+}
+# 식당 레코드/청크/키워드 문서 생성에 필요한 컬럼 (작성일은 읽지 않음)
+PROCESSING_COLUMNS = ["restaurant_name", "visit_count", "review", "tags", "positive_count", "negative_count"]
+
+# 작성일 "6.6.금" / "24.12.3.화" / "2024.12.3.화" (연도가 없으면 크롤링 날짜 기준으로 추정)
+DATE_PATTERN = re.compile(r"^(?:(\d{2}|\d{4})\.)?(\d{1,2})\.(\d{1,2})")
+CRAWL_DATE_PATTERN = re.compile(r"_(\d{4})-(\d{2})-(\d{2})_")
+
+def crawl_date(csv_file: str) -> Optional[datetime.date]:
+    """파일명의 크롤링 날짜 (예: ..._2025-06-11_22-59-19.csv)"""
+    match = CRAWL_DATE_PATTERN.search(os.path.basename(csv_file))
+    if match is None:
+        return None
+    return datetime.date(*map(int, match.groups()))
+
+def parse_review_date(text: str, reference: Optional[datetime.date]) -> Optional[datetime.date]:
+    """작성일 문자열을 날짜로 변환 (연도가 없으면 reference 이전의 가장 가까운 날짜, 해석할 수 없으면 None)"""
+    match = DATE_PATTERN.match(str(text).strip())
+    if match is None:
+        return None
+    year, month, day = match.groups()
+    try:
+        if year is not None:
+            year = int(year) + (2000 if len(year) == 2 else 0)
+            return datetime.date(year, int(month), int(day))
+        reference = reference or datetime.date.today()
+        date = datetime.date(reference.year, int(month), int(day))
+        return date if date <= reference else date.replace(year=reference.year - 1)
+    except ValueError:
+        return None
+
+def split_tags(text) -> List[str]:
+    return [tag.strip() for tag in str(text).split(',') if tag.strip()] if text else []
+
+class ReviewStore:
+    """원본 크롤링 CSV를 한 번 변환해 둔 리뷰 단위 Parquet 저장소
+
+    리뷰 한 행에 식당 id, 날짜로 변환한 작성일, 정수 방문횟수, 미리 분리한 태그 목록을 담아
+    이후 단계는 CSV 파싱 없이 필요한 컬럼만 타입이 정해진 채로 읽는다.
+    """
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.store_dir, STORE_MANIFEST)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.manifest_path)
+
+    def load_manifest(self) -> Dict:
+        if not self.exists():
+            return {"files": {}, "next_id": 1, "version": STORE_VERSION}
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_manifest(self, manifest: Dict):
+        tmp_path = f"{self.manifest_path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def stale_files(self, data_dir: str) -> List[str]:
+        """저장소 변환 이후 추가/변경/삭제된 CSV 이름"""
+        manifest = self.load_manifest()
+        files = manifest["files"]
+        current = {os.path.basename(f): f for f in list_csv_files(data_dir)}
+        if manifest.get("version") != STORE_VERSION:
+            return sorted(set(current) | set(files))
+        changed = [name for name, path in current.items()
+                   if name not in files or files[name]["sha256"] != file_sha256(path)]
+        return sorted(changed + [name for name in files if name not in current])
+
+    @staticmethod
+    def _to_table(df, csv_file: str, restaurant_id: int) -> pa.Table:
+        df = df.fillna('')
+        reference = crawl_date(csv_file)
+        visit_counts = pd.to_numeric(df['방문횟수'], errors='coerce').fillna(1).astype(int).tolist()
+        scores = score_reviews(df['리뷰 내용'])
+        return pa.Table.from_pydict({
+            "restaurant_id": [restaurant_id] * len(df),
+            "source_file": [os.path.basename(csv_file)] * len(df),
+            "restaurant_name": [str(name) for name in df['식당명']],
+            "written_date": [parse_review_date(text, reference) for text in df['작성일']],
+            "visit_count": visit_counts,
+            "review": [str(review) for review in df['리뷰 내용']],
+            "tags": [split_tags(tags) for tags in df['리뷰 태그']],
+            "positive_count": scores[SENTIMENT_COLUMNS[0]].to_numpy(),
+            "negative_count": scores[SENTIMENT_COLUMNS[1]].to_numpy(),
+        }, schema=SCHEMA)
+
+    @metrics.timed("ingest.compact_reviews")
+    def compact(self, data_dir: str) -> Dict[str, List[str]]:
+        """CSV 디렉토리를 저장소로 변환 (추가/변경된 CSV만 다시 쓰고 삭제된 CSV의 파티션은 제거)
+
+        저장소 버전이 다르면 스키마를 맞추기 위해 모든 파티션을 다시 씀 (식당 id는 유지)
+        """
+        os.makedirs(self.store_dir, exist_ok=True)
+        manifest = self.load_manifest()
+        rewrite_all = manifest.get("version") != STORE_VERSION
+        manifest["version"] = STORE_VERSION
+        files = manifest["files"]
+        current = {os.path.basename(f): f for f in list_csv_files(data_dir)}
+        processor = RestaurantDataProcessor(data_dir)
+        report = {"added": [], "changed": [], "removed": [], "skipped": []}
+        # 교체/삭제된 파티션은 새 매니페스트를 저장한 뒤 지움 (중간에 실패해도 매니페스트가 가리키는 파일은 남아 있음)
+        superseded = []
+
+        for name, csv_file in current.items():
+            sha256 = file_sha256(csv_file)
+            entry = files.get(name)
+            if entry is not None and entry["sha256"] == sha256 and not rewrite_all:
+                continue
+            df = processor.load_csv_file(csv_file)
+            if df is None:
+                report["skipped"].append(name)
+                continue
+            restaurant_id = entry["id"] if entry is not None else manifest["next_id"]
+            partition = f"{restaurant_id:05d}-{sha256[:12]}-v{STORE_VERSION}.parquet"
+            pq.write_table(self._to_table(df, csv_file, restaurant_id), os.path.join(self.store_dir, partition),
+                           compression="zstd")
+            if entry is not None and entry["partition"] != partition:
+                superseded.append(entry["partition"])
+            files[name] = {"sha256": sha256, "id": restaurant_id, "partition": partition, "rows": len(df)}
+            report["changed" if entry is not None else "added"].append(name)
+            if entry is None:
+                manifest["next_id"] = restaurant_id + 1
+
+        for name in [name for name in files if name not in current]:
+            superseded.append(files.pop(name)["partition"])
+            report["removed"].append(name)
+
+        self._save_manifest(manifest)
+        for partition in superseded:
+            partition_path = os.path.join(self.store_dir, partition)
+            if os.path.exists(partition_path):
+                os.remove(partition_path)
+        print(f"리뷰 저장소 변환 완료: 추가 {len(report['added'])}개, 변경 {len(report['changed'])}개, "
+              f"삭제 {len(report['removed'])}개 (전체 {len(files)}개 식당, "
+              f"{sum(entry['rows'] for entry in files.values())}개 리뷰)")
+        return report
+
+    def _partitions(self) -> List[Tuple[str, Dict]]:
+        """(원본 CSV 이름, 매니페스트 항목)을 원본 파일명 순서대로"""
+        return sorted(self.load_manifest()["files"].items())
+
+    def read_table(self, columns: Optional[List[str]] = None) -> pa.Table:
+        """필요한 컬럼만 읽은 전체 리뷰 테이블"""
+        paths = [os.path.join(self.store_dir, entry["partition"]) for _, entry in self._partitions()]
+        if not paths:
+            return SCHEMA.empty_table().select(columns or SCHEMA.names)
+        return pq.ParquetDataset(paths, schema=SCHEMA).read(columns=columns)
+
+    def iter_frames(self, columns: List[str] = PROCESSING_COLUMNS) -> Iterator[Tuple[int, str, pd.DataFrame]]:
+        """식당별 (식당 id, 원본 CSV 이름, 원본 컬럼명의 DataFrame) 스트리밍
+
+        필요한 컬럼만 한 번에 읽어 변환한 뒤 파티션(식당)별 행 범위로 나눔
+        '리뷰 태그'는 문자열이 아닌 태그 목록 (data_preprocessing.tag_text 참고)
+        """
+        partitions = self._partitions()
+        table = self.read_table(columns)
+        df = table.rename_columns([CSV_COLUMNS.get(name, name) for name in table.column_names]).to_pandas()
+        start = 0
+        for name, entry in partitions:
+            yield entry["id"], name, df.iloc[start:start + entry["rows"]]
+            start += entry["rows"]
+
+    def tag_counts(self) -> Counter:
+        """태그 빈도 (태그 컬럼만 읽어 pyarrow에서 집계)"""
+        tags = pc.list_flatten(self.read_table(["tags"]).column("tags"))
+        counts = pc.value_counts(tags)
+        return Counter({item["values"].as_py(): item["counts"].as_py() for item in counts})
+
+def default_store_dir(data_dir: str) -> str:
+    return os.path.join(data_dir, REVIEW_STORE_DIR)
+
+def main():
+    parser = argparse.ArgumentParser(description="크롤링 CSV → 리뷰 단위 Parquet 저장소 변환")
+    parser.add_argument("--data-dir", default="../data/", help="CSV 데이터 디렉토리")
+    parser.add_argument("--store-dir", help=f"저장소 디렉토리 (기본: <data-dir>/{REVIEW_STORE_DIR})")
+    args = parser.parse_args()
+
+    store = ReviewStore(args.store_dir or default_store_dir(args.data_dir))
+    store.compact(args.data_dir)
+    print(f"상위 태그: {[tag for tag, _ in store.tag_counts().most_common(10)]}")
+
+if __name__ == "__main__":
+    main()
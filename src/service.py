@@ -0,0 +1,452 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+# 현재 디렉토리를 Python 경로에 추가
+sys.path.append(os.path.dirname(__file__))
+
+import metrics
+from vector_db import VectorDB
+from sharded_db import ShardedVectorDB, is_sharded
+from llm_integration import SimpleRecommender, GemmaRecommender, StubRecommender, RecommendationBatcher
+from recommendation_cache import RecommendationCache
+from reranker import FeatureReranker, CrossEncoderReranker
+from embedding_backends import BACKENDS
+from index_snapshots import SnapshotWatcher
+
+SEARCH_OPTIONS = ("k", "granularity", "pooling", "chunk_fanout", "filters", "fusion", "sparse_weight", "rerank_results")
+
+class ServiceBusy(Exception):
+    """대기 중인 작업이 상한을 넘음 (HTTP 503)"""
+
+class BoundedExecutor:
+    """스레드 수와 대기 작업 수가 제한된 실행기
+
+    인코딩/FAISS 검색/생성은 CPU를 오래 쓰므로 이벤트 루프 밖의 스레드에서 실행하고,
+    대기 작업이 max_pending을 넘으면 큐에 무한히 쌓는 대신 바로 ServiceBusy를 발생시킨다.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, thread_name_prefix: str):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self.max_pending = max_pending
+        self.pending = 0
+
+    def check_capacity(self):
+        if self.pending >= self.max_pending:
+            raise ServiceBusy()
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        self.check_capacity()
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, lambda: fn(*args, **kwargs))
+        finally:
+            self.pending -= 1
+
+    async def run_future(self, submit: Callable[[], Future]):
+        """다른 스케줄러(배치 생성 등)에 맡긴 작업도 대기 작업 수에 포함해 기다림 (상한을 넘으면 맡기지 않음)"""
+        self.check_capacity()
+        self.pending += 1
+        try:
+            return await asyncio.wrap_future(submit())
+        finally:
+            self.pending -= 1
+
+    def submit(self, fn: Callable, *args, **kwargs):
+        """대기 작업 상한과 무관하게 작업 예약 (시작 시 모델 로드 등)"""
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+def to_jsonable(value):
+    """numpy 스칼라 등 json이 모르는 값 변환"""
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+def dumps(data) -> str:
+    return json.dumps(data, ensure_ascii=False, default=to_jsonable)
+
+def serialize_results(results: List[Tuple[Dict, float]]) -> List[Dict]:
+    return [{"restaurant": restaurant, "score": float(score)} for restaurant, score in results]
+
+class RecommendationService:
+    """VectorDB와 추천기를 프로세스당 한 번만 로드해 HTTP로 제공하는 서비스
+
+    - POST /search        {"query", "k", "filters", "auto_filter", ...}
+    - POST /search_batch  {"queries", "k", "filters", ...}
+    - POST /recommend     {"query", "k", "use_llm", "max_time", "stream"}
+      stream=true면 NDJSON으로 검색 결과 한 줄 후 지금까지 생성된 추천글 전체를 줄마다 전송
+    - GET  /health, GET /stats
+    - GET  /metrics       구간별 지연시간/카운터 (Prometheus 텍스트, ?format=json이면 JSON)
+
+    allow_profiling=True이면 요청 body에 "profile": true를 넣은 /search, /search_batch, /recommend 요청의
+    검색 단계를 프로파일링해 응답의 "profile"에 리포트를 담는다.
+    시작 시에는 인덱스만 읽고 바로 요청을 받는다. 임베딩 모델은 백그라운드 스레드에서, LLM은 생성 스레드에서
+    미리 로드하며, 로드가 끝나기 전에 온 요청은 로드를 기다린다.
+
+    reload_interval > 0이면 새 인덱스 스냅샷이 게시될 때 재시작 없이 교체한다.
+    각 요청은 시작 시점의 self.vector_db 참조 하나만 사용하므로 교체 중에도 한 스냅샷으로 끝난다.
+    """
+
+    def __init__(self, index_path: str, use_llm: bool = False, search_workers: int = 4,
+                 max_pending: int = 64, cache_path: Optional[str] = None,
+                 cross_encoder: Optional[str] = None, rerank_budget_ms: float = 150.0, backend: str = "torch",
+                 reload_interval: float = 10.0, allow_profiling: bool = False, profiler: str = "cprofile",
+                 metrics_log: Optional[str] = None, metrics_log_interval: float = 60.0,
+                 llm_stub_tps: Optional[float] = None, llm_batch_size: int = 8, llm_batch_wait_ms: float = 20.0,
+                 llm_cpu_int8: bool = False):
+        """llm_stub_tps: 지정하면 GemmaRecommender 대신 이 토큰 속도의 StubRecommender 사용 (부하 테스트용)
+        llm_batch_size / llm_batch_wait_ms: 스트리밍이 아닌 /recommend 생성 요청을 모으는 배치 크기/대기 시간 (1이면 배치 안 함)
+        llm_cpu_int8: GPU가 없을 때 LLM에 동적 int8 양자화 적용
+        """
+        self.backend = backend
+        self.allow_profiling = allow_profiling
+        self.profiler = profiler
+        self.metrics_log = metrics_log
+        self.metrics_log_interval = metrics_log_interval
+        self._metrics_log_task = None
+        self.rerankers = None
+        if cross_encoder:
+            self.rerankers = [FeatureReranker(), CrossEncoderReranker(cross_encoder, latency_budget_ms=rerank_budget_ms)]
+        self.vector_db = self._load_vector_db(index_path)
+        self.vector_db.preload_model()
+        self.watcher = None
+        if reload_interval > 0:
+            self.watcher = SnapshotWatcher(index_path, self._load_vector_db, self._swap_vector_db,
+                                           interval=reload_interval, loaded=self.vector_db.snapshot).start()
+        self.simple_recommender = SimpleRecommender()
+        self.recommendation_cache = RecommendationCache(
+            cache_path or os.path.join(os.path.dirname(index_path.rstrip("/")), "recommendation_cache.sqlite")
+        )
+        self.search_executor = BoundedExecutor(search_workers, max_pending, "search")
+        # 모델 하나로 동시에 생성하면 서로 느려지기만 하므로 생성은 한 스레드에서 순서대로 처리
+        self.llm_executor = BoundedExecutor(1, max_pending, "llm")
+        # LLM 로드도 생성 스레드에 먼저 예약하므로 이후 생성 작업은 자연히 로드가 끝난 뒤에 실행됨
+        self._recommender_future = self.llm_executor.submit(self._load_recommender, llm_stub_tps, llm_cpu_int8) if use_llm else None
+        self.llm_batch_size = llm_batch_size
+        self.llm_batch_wait_ms = llm_batch_wait_ms
+        self._batcher = None
+
+    @staticmethod
+    def _load_recommender(llm_stub_tps: Optional[float] = None, cpu_int8: bool = False) -> Optional[GemmaRecommender]:
+        if llm_stub_tps:
+            return StubRecommender(tokens_per_second=llm_stub_tps)
+        try:
+            return GemmaRecommender(cpu_int8=cpu_int8)
+        except Exception as e:
+            print(f"LLM 로딩 실패, 간단 모드로 동작합니다: {e}")
+            return None
+
+    @property
+    def recommender(self) -> Optional[GemmaRecommender]:
+        """로드가 끝난 LLM 추천기 (LLM을 쓰지 않거나, 로드 중이거나, 로드에 실패했으면 None)"""
+        if self._recommender_future is None or not self._recommender_future.done():
+            return None
+        return self._recommender_future.result()
+
+    @property
+    def llm_enabled(self) -> bool:
+        """LLM을 쓸 수 있거나 로드 중인지"""
+        future = self._recommender_future
+        return future is not None and (not future.done() or future.result() is not None)
+
+    async def _get_recommender(self) -> Optional[GemmaRecommender]:
+        """LLM 추천기 (로드 중이면 끝날 때까지 대기)"""
+        if self._recommender_future is None:
+            return None
+        return await asyncio.wrap_future(self._recommender_future)
+
+    def _get_batcher(self, recommender: GemmaRecommender) -> Optional[RecommendationBatcher]:
+        """비스트리밍 생성용 배치 스케줄러 (배치 생성을 지원하지 않거나 끈 경우 None)
+
+        배치 생성도 생성 스레드에서 실행하므로 스트리밍 생성과 모델을 동시에 쓰지 않음
+        """
+        if self._batcher is None and self.llm_batch_size > 1 and hasattr(recommender, "generate_batch"):
+            self._batcher = RecommendationBatcher(
+                recommender, max_batch_size=self.llm_batch_size, max_wait_ms=self.llm_batch_wait_ms,
+                run=lambda fn: self.llm_executor.submit(fn).result(),
+            )
+        return self._batcher
+
+    async def _generate_batched(self, batcher: RecommendationBatcher, query: str, results: List[Tuple[Dict, float]],
+                                index_version: str) -> str:
+        """캐시에 없으면 동시에 들어온 요청들과 한 배치로 생성 후 저장"""
+        key, cached = await self.search_executor.run(self.recommendation_cache.lookup, batcher.recommender, query,
+                                                     results, index_version)
+        if cached is not None:
+            return cached
+        future = None
+        def submit():
+            nonlocal future
+            future = batcher.submit(query, results)
+            return future
+        text = await self.llm_executor.run_future(submit)
+        await self.search_executor.run(self.recommendation_cache.store, key, text, future.generation_stats)
+        return text
+
+    def _load_vector_db(self, index_path: str) -> VectorDB:
+        """인덱스 로드 (임베딩 모델은 embedding_backends에서 공유되므로 다시 로드하지 않음)
+        
+        샤드 인덱스(vector_db.py --shard-by)면 샤드들을 로드해 동시 검색
+        """
+        vector_db_class = ShardedVectorDB if is_sharded(index_path) else VectorDB
+        vector_db = vector_db_class(backend=self.backend, rerankers=self.rerankers)
+        vector_db.load_index(index_path, mmap=True)
+        return vector_db
+
+    def _swap_vector_db(self, vector_db: VectorDB):
+        # 참조 교체는 원자적이며, 이전 인덱스는 진행 중인 요청이 끝나 참조가 사라지면 해제됨
+        self.vector_db = vector_db
+
+    def create_app(self) -> web.Application:
+        app = web.Application(middlewares=[self.error_middleware])
+        app.add_routes([
+            web.get("/health", self.handle_health),
+            web.get("/stats", self.handle_stats),
+            web.get("/metrics", self.handle_metrics),
+            web.post("/search", self.handle_search),
+            web.post("/search_batch", self.handle_search_batch),
+            web.post("/recommend", self.handle_recommend),
+        ])
+        app.on_startup.append(self.on_startup)
+        app.on_shutdown.append(self.on_shutdown)
+        return app
+
+    @web.middleware
+    async def error_middleware(self, request: web.Request, handler):
+        start = time.perf_counter()
+        try:
+            return await handler(request)
+        except ServiceBusy:
+            metrics.incr("http.rejected")
+            return web.json_response({"error": "서버가 혼잡합니다. 잠시 후 다시 시도해주세요."}, status=503)
+        except (ValueError, KeyError, TypeError) as e:
+            return web.json_response({"error": f"잘못된 요청: {e}"}, status=400, dumps=dumps)
+        finally:
+            # 요청 경로 그대로 쓰면 404/스캐너 URL마다 지표가 생기므로 등록된 라우트 이름만 사용
+            resource = request.match_info.route.resource
+            metrics.observe(f"http{resource.canonical}" if resource is not None else "http.unmatched",
+                            time.perf_counter() - start)
+
+    async def on_startup(self, app: web.Application):
+        if self.metrics_log:
+            self._metrics_log_task = asyncio.ensure_future(self._write_metrics_log())
+
+    async def _write_metrics_log(self):
+        while True:
+            await asyncio.sleep(self.metrics_log_interval)
+            metrics.METRICS.log_json(self.metrics_log)
+
+    async def on_shutdown(self, app: web.Application):
+        if self._metrics_log_task is not None:
+            self._metrics_log_task.cancel()
+            metrics.METRICS.log_json(self.metrics_log)
+        if self.watcher is not None:
+            self.watcher.stop()
+        if self._batcher is not None:
+            self._batcher.shutdown(wait=False)
+        self.search_executor.shutdown()
+        self.llm_executor.shutdown()
+
+    @staticmethod
+    def _search_options(body: Dict) -> Dict:
+        return {name: body[name] for name in SEARCH_OPTIONS if name in body}
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        vector_db = self.vector_db
+        return web.json_response({
+            "status": "ok",
+            "restaurants": len(vector_db.restaurants),
+            "index_version": vector_db.index_version,
+            "snapshot": vector_db.snapshot,
+            "embedding_model_loaded": vector_db.model_loaded,
+            "shards": ({key: len(shard.restaurants) for key, shard in vector_db.shards.items()}
+                       if isinstance(vector_db, ShardedVectorDB) else None),
+            "llm": self.llm_enabled,
+            "llm_loaded": self.recommender is not None,
+        })
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        """?restaurants=false면 식당 목록 없이 반환 (화면을 갱신할 때마다 부르는 캐시/대기 작업 통계용)"""
+        vector_db = self.vector_db
+        return web.json_response({
+            "restaurants": [
+                {name: restaurant[name] for name in ("id", "name", "location", "menu_type")}
+                for restaurant in vector_db.restaurants
+            ] if request.query.get("restaurants") != "false" else None,
+            "restaurant_count": len(vector_db.restaurants),
+            "query_cache": vector_db.query_cache.stats() if vector_db.query_cache is not None else None,
+            "index_reloads": self.watcher.reloads if self.watcher is not None else 0,
+            "recommendation_cache": self.recommendation_cache.stats(),
+            "pending": {"search": self.search_executor.pending, "llm": self.llm_executor.pending},
+            "llm_batches": dict(self._batcher.stats) if self._batcher is not None else None,
+        }, dumps=dumps)
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        if request.query.get("format") == "json":
+            return web.json_response(metrics.METRICS.snapshot(), dumps=dumps)
+        return web.Response(text=metrics.METRICS.prometheus_text(), content_type="text/plain", charset="utf-8")
+
+    async def _run_search(self, body: Dict, fn: Callable, *args, **kwargs) -> Tuple[object, Optional[str]]:
+        """검색 스레드에서 실행 (요청이 원하고 서버가 허용하면 그 스레드 안에서 프로파일링)"""
+        profile = self.allow_profiling and bool(body.get("profile"))
+        return await self.search_executor.run(metrics.maybe_profiled, profile, fn, *args,
+                                              profiler=self.profiler, **kwargs)
+
+    async def _search(self, vector_db: VectorDB, body: Dict) -> Tuple[List[Tuple[Dict, float]], Optional[str]]:
+        return await self._run_search(
+            body, vector_db.search, body["query"], auto_filter=body.get("auto_filter", False),
+            **self._search_options(body)
+        )
+
+    @staticmethod
+    def _with_profile(data: Dict, report: Optional[str]) -> Dict:
+        if report is not None:
+            data["profile"] = report
+        return data
+
+    async def handle_search(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        results, report = await self._search(self.vector_db, body)
+        return web.json_response(self._with_profile({"results": serialize_results(results)}, report), dumps=dumps)
+
+    async def handle_search_batch(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        batch_results, report = await self._run_search(
+            body, self.vector_db.search_batch, list(body["queries"]), **self._search_options(body)
+        )
+        return web.json_response(
+            self._with_profile({"results": [serialize_results(results) for results in batch_results]}, report),
+            dumps=dumps,
+        )
+
+    def _recommendation_stream(self, recommender: GemmaRecommender, query: str, results: List[Tuple[Dict, float]],
+                               index_version: str, max_time: Optional[float],
+                               stop_event: Optional[threading.Event] = None):
+        return self.recommendation_cache.stream(recommender, query, results, index_version, max_time=max_time,
+                                                stop_event=stop_event)
+
+    async def handle_recommend(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        body.setdefault("auto_filter", True)
+        vector_db = self.vector_db
+        results, report = await self._search(vector_db, body)
+        recommender = await self._get_recommender() if body.get("use_llm", True) and results else None
+        use_llm = recommender is not None
+        max_time = body.get("max_time")
+
+        if not body.get("stream"):
+            batcher = self._get_batcher(recommender) if use_llm and max_time is None else None
+            if batcher is not None:
+                # 요청별 시간 예산이 없으면 동시에 들어온 요청들과 한 번의 배치 생성으로 처리
+                text = await self._generate_batched(batcher, body["query"], results, vector_db.index_version)
+            elif use_llm:
+                text = await self.llm_executor.run(
+                    lambda: list(self._recommendation_stream(recommender, body["query"], results,
+                                                             vector_db.index_version, max_time))[-1]
+                )
+            else:
+                text = self.simple_recommender.generate_recommendation_text(body["query"], results)
+            return web.json_response(
+                self._with_profile({"results": serialize_results(results), "text": text, "llm": use_llm}, report),
+                dumps=dumps,
+            )
+
+        if use_llm:
+            # 스트리밍 응답을 시작한 뒤에는 503을 보낼 수 없으므로 미리 확인
+            self.llm_executor.check_capacity()
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson; charset=utf-8"})
+        await response.prepare(request)
+        header = self._with_profile({"results": serialize_results(results), "llm": use_llm}, report)
+        await response.write((dumps(header) + "\n").encode("utf-8"))
+        if not use_llm:
+            text = self.simple_recommender.generate_recommendation_text(body["query"], results)
+            await response.write((dumps({"text": text}) + "\n").encode("utf-8"))
+        else:
+            # 생성 스레드에서 나오는 텍스트를 이벤트 루프 쪽 큐로 넘겨 바로 전송
+            loop = asyncio.get_running_loop()
+            chunks = asyncio.Queue()
+            stop_event = threading.Event()
+            def produce():
+                try:
+                    for text in self._recommendation_stream(recommender, body["query"], results,
+                                                            vector_db.index_version, max_time, stop_event):
+                        loop.call_soon_threadsafe(chunks.put_nowait, text)
+                finally:
+                    loop.call_soon_threadsafe(chunks.put_nowait, None)
+            generation = asyncio.ensure_future(self.llm_executor.run(produce))
+            try:
+                while True:
+                    text = await chunks.get()
+                    if text is None:
+                        break
+                    await response.write((dumps({"text": text}) + "\n").encode("utf-8"))
+            except (ConnectionError, asyncio.CancelledError) as e:
+                # 클라이언트 연결이 끊기면 생성을 멈춰 생성 스레드를 다음 요청에 넘김 (잘린 응답은 캐시하지 않음)
+                stop_event.set()
+                metrics.incr("recommend.client_disconnects")
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                return response
+            await generation
+        await response.write_eof()
+        return response
+
+def main():
+    parser = argparse.ArgumentParser(description="맛집 검색/추천 HTTP 서비스")
+    parser.add_argument("--index", default="models/faiss_index", help="벡터 DB 디렉토리")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--llm", action="store_true", help="LLM 추천기 사용 (시작 후 백그라운드에서 로드)")
+    parser.add_argument("--llm-stub-tps", type=float,
+                        help="지정하면 LLM 대신 초당 이 토큰 수로 템플릿 텍스트를 스트리밍하는 스텁 사용 (--llm 포함, 부하 테스트용)")
+    parser.add_argument("--llm-batch-size", type=int, default=8,
+                        help="스트리밍이 아닌 /recommend 생성 요청을 모아 한 번에 생성하는 최대 배치 크기 (1이면 배치 안 함)")
+    parser.add_argument("--llm-batch-wait-ms", type=float, default=20.0, help="배치를 모으는 최대 대기 시간(ms)")
+    parser.add_argument("--llm-cpu-int8", action="store_true",
+                        help="GPU가 없을 때 LLM Linear 레이어에 동적 int8 양자화 적용 (빠르지만 출력 품질이 달라질 수 있음)")
+    parser.add_argument("--recommendation-cache", help="생성 결과 캐시 파일 (기본: 인덱스 디렉토리 옆 recommendation_cache.sqlite)")
+    parser.add_argument("--search-workers", type=int, default=4, help="검색(인코딩/FAISS) 스레드 수")
+    parser.add_argument("--backend", default="torch", choices=BACKENDS,
+                        help="쿼리 임베딩 백엔드 (인덱스 구축 때와 같은 모델이어야 함)")
+    parser.add_argument("--cross-encoder", help="재정렬에 사용할 cross-encoder 모델 (예: cross-encoder/mmarco-mMiniLMv2-L12-H384-v1)")
+    parser.add_argument("--rerank-budget-ms", type=float, default=150.0, help="cross-encoder 재정렬 시간 예산 (초과 시 1차 순서 사용)")
+    parser.add_argument("--reload-interval", type=float, default=10.0,
+                        help="새 인덱스 스냅샷 확인 주기(초), 0이면 자동 교체 안 함")
+    parser.add_argument("--max-pending", type=int, default=64, help="대기 작업 상한 (초과 시 503)")
+    parser.add_argument("--metrics", action="store_true",
+                        help="구간별 지연시간/카운터 수집 (GET /metrics, 환경변수 RECOMMENDER_METRICS=1과 같음)")
+    parser.add_argument("--metrics-log", help="수집한 지표를 주기적으로 추가할 JSON Lines 파일")
+    parser.add_argument("--metrics-log-interval", type=float, default=60.0, help="지표 JSON 로그 주기(초)")
+    parser.add_argument("--allow-profiling", action="store_true",
+                        help='요청 body에 "profile": true가 있으면 검색 단계를 프로파일링해 응답에 포함')
+    parser.add_argument("--profiler", default="cprofile", choices=["cprofile", "pyinstrument"])
+    args = parser.parse_args()
+
+    if args.metrics or args.metrics_log:
+        metrics.METRICS.enable()
+
+    service = RecommendationService(args.index, use_llm=args.llm or bool(args.llm_stub_tps),
+                                    search_workers=args.search_workers, max_pending=args.max_pending,
+                                    cache_path=args.recommendation_cache, cross_encoder=args.cross_encoder,
+                                    rerank_budget_ms=args.rerank_budget_ms, backend=args.backend,
+                                    reload_interval=args.reload_interval, allow_profiling=args.allow_profiling,
+                                    profiler=args.profiler, metrics_log=args.metrics_log,
+                                    metrics_log_interval=args.metrics_log_interval, llm_stub_tps=args.llm_stub_tps,
+                                    llm_batch_size=args.llm_batch_size, llm_batch_wait_ms=args.llm_batch_wait_ms,
+                                    llm_cpu_int8=args.llm_cpu_int8)
+    web.run_app(service.create_app(), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
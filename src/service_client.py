@@ -0,0 +1,82 @@
+import json
+import urllib.request
+from typing import Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_SERVICE_URL = "http://localhost:8000"
+
+class TextStream:
+    """추천글 스트림 (지금까지 생성된 전체 텍스트를 yield, 끝까지 읽거나 close()하면 HTTP 응답을 닫음)"""
+
+    def __init__(self, response):
+        self._response = response
+
+    def __iter__(self) -> Iterator[str]:
+        with self._response:
+            for line in self._response:
+                if line.strip():
+                    yield json.loads(line.decode("utf-8"))["text"]
+
+    def close(self):
+        self._response.close()
+
+    def __enter__(self) -> "TextStream":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class ServiceClient:
+    """service.py HTTP 서비스 클라이언트 (표준 라이브러리만 사용)"""
+
+    def __init__(self, base_url: str = DEFAULT_SERVICE_URL, timeout: float = 120.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, path: str, body: Optional[Dict] = None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8") if body is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data,
+                                         headers={"Content-Type": "application/json"})
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+    def _get_json(self, path: str, body: Optional[Dict] = None) -> Dict:
+        with self._request(path, body) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    @staticmethod
+    def _results(items: List[Dict]) -> List[Tuple[Dict, float]]:
+        return [(item["restaurant"], item["score"]) for item in items]
+
+    def health(self) -> Dict:
+        return self._get_json("/health")
+
+    def stats(self, restaurants: bool = True) -> Dict:
+        """서비스 통계 (restaurants=False면 식당 목록 없이 캐시/대기 작업 통계만)"""
+        return self._get_json("/stats" if restaurants else "/stats?restaurants=false")
+
+    def search(self, query: str, k: int = 3, **options) -> List[Tuple[Dict, float]]:
+        return self._results(self._get_json("/search", {"query": query, "k": k, **options})["results"])
+
+    def search_batch(self, queries: List[str], k: int = 3, **options) -> List[List[Tuple[Dict, float]]]:
+        response = self._get_json("/search_batch", {"queries": queries, "k": k, **options})
+        return [self._results(items) for items in response["results"]]
+
+    def recommend(self, query: str, k: int = 3, use_llm: bool = True,
+                  max_time: Optional[float] = None) -> Tuple[List[Tuple[Dict, float]], str]:
+        response = self._get_json("/recommend", {"query": query, "k": k, "use_llm": use_llm,
+                                                 "max_time": max_time})
+        return self._results(response["results"]), response["text"]
+
+    def stream_recommend(self, query: str, k: int = 3, use_llm: bool = True,
+                         max_time: Optional[float] = None) -> Tuple[List[Tuple[Dict, float]], bool, TextStream]:
+        """(검색 결과, LLM 사용 여부, 추천글 스트림) 반환
+
+        스트림을 끝까지 읽지 않는 경우 close()하거나 with 문으로 감싸 연결을 닫아야 함
+        """
+        response = self._request("/recommend", {"query": query, "k": k, "use_llm": use_llm,
+                                                "max_time": max_time, "stream": True})
+        try:
+            header = json.loads(response.readline().decode("utf-8"))
+        except Exception:
+            response.close()
+            raise
+        return self._results(header["results"]), header["llm"], TextStream(response)
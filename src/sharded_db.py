@@ -0,0 +1,292 @@
+import heapq
+import itertools
+import json
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+import metrics
+from index_snapshots import SNAPSHOTS_DIR, current_snapshot, publish_snapshot, resolve_snapshot
+from sparse_index import BM25Index
+from vector_db import FUSION_DEPTH, VectorDB
+
+# 샤드 인덱스 구조
+#   <save_dir>/shards/<샤드>/snapshots/<버전>/   샤드별 VectorDB.save_index (샤드마다 따로 구축/저장/로드)
+#   <save_dir>/snapshots/<버전>/shards.json      샤드 나누는 방식 + 샤드별 스냅샷 이름 + 원본 CSV 해시
+#   <save_dir>/CURRENT                            최상위 포인터 (샤드 하나만 다시 구축해도 새 구성을 원자적으로 게시)
+SHARDS_DIR = "shards"
+SHARD_CONFIG_FILE = "shards.json"
+
+# location: 식당 위치(건대/홍대/성수 ...)별 샤드, 위치 필터가 있는 쿼리는 해당 샤드만 검색
+# hash: 원본 CSV 이름의 해시로 num_shards개에 고르게 분산 (위치가 한쪽에 몰려 있을 때)
+SHARD_STRATEGIES = ("location", "hash")
+DEFAULT_LOCATION_SHARD = "기타"
+
+def is_sharded(save_dir: str) -> bool:
+    """save_dir(또는 스냅샷 디렉토리)가 샤드 인덱스인지"""
+    return os.path.exists(os.path.join(resolve_snapshot(save_dir), SHARD_CONFIG_FILE))
+
+def load_shard_config(save_dir: str) -> Optional[Dict]:
+    """현재 게시된 샤드 구성 (없으면 None)"""
+    config_path = os.path.join(resolve_snapshot(save_dir), SHARD_CONFIG_FILE)
+    if not os.path.exists(config_path):
+        return None
+    with open(config_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _score(item: Tuple[Dict, float]) -> float:
+    return item[1]
+
+class _ChainedRestaurants:
+    """샤드별 식당 목록을 이어 붙인 읽기 전용 목록 (mmap 메타데이터 저장소를 한꺼번에 읽지 않음)"""
+
+    def __init__(self, parts: List):
+        self._parts = parts
+        self._offsets = np.cumsum([0] + [len(part) for part in parts])
+
+    def __len__(self) -> int:
+        return int(self._offsets[-1])
+
+    def __iter__(self) -> Iterator[Dict]:
+        return itertools.chain.from_iterable(self._parts)
+
+    def __getitem__(self, idx: int) -> Dict:
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        part = int(np.searchsorted(self._offsets, idx, side="right")) - 1
+        return self._parts[part][idx - int(self._offsets[part])]
+
+class ShardedVectorDB(VectorDB):
+    """식당을 위치(또는 해시)별 샤드로 나눈 VectorDB
+
+    샤드마다 FAISS 인덱스/메타데이터/청크 인덱스/키워드 역색인을 따로 구축·저장·로드하므로
+    지역이 늘어도 샤드 하나의 재구축 시간과 메모리는 그 지역 크기에만 비례한다.
+    검색은 쿼리를 한 번만 인코딩해 대상 샤드들의 결합 전 후보 검색(_first_stage)을 스레드 풀에서 동시에 실행하고
+    (FAISS 검색은 GIL을 놓음), 샤드별 밀집/BM25 후보를 각각 힙으로 병합한 뒤 키워드 결합과 재정렬을 한 번만 한다.
+    BM25는 전체 샤드의 문서 수/평균 길이/문서 빈도를 합산해 채점하므로 단일 인덱스와 같은 척도다.
+    location 샤딩에서 위치 필터가 있는 쿼리는 해당 위치의 샤드만 검색한다.
+    쿼리 임베딩/검색 결과 캐시와 재정렬 단계는 이 객체에만 두고 샤드는 검색만 담당.
+    """
+
+    def __init__(self, shard_by: str = "location", num_shards: int = 4, shard_workers: Optional[int] = None,
+                 **vector_db_options):
+        """
+        shard_by: location / hash (SHARD_STRATEGIES 참고), num_shards: hash 샤딩의 샤드 수
+        shard_workers: 샤드 동시 검색 스레드 수 (기본: 샤드 수와 CPU 코어 수 중 작은 값)
+        vector_db_options: 샤드마다 사용할 VectorDB 설정 (index_type, backend 등)
+        """
+        if shard_by not in SHARD_STRATEGIES:
+            raise ValueError(f"지원하지 않는 샤딩 방식입니다: {shard_by}")
+        super().__init__(**vector_db_options)
+        self.shard_by = shard_by
+        self.num_shards = num_shards
+        self.shard_workers = shard_workers
+        self._shard_options = {name: value for name, value in vector_db_options.items()
+                               if name not in ("cache_max_bytes", "rerankers", "embedding_cache")}
+        self.shards: Dict[str, VectorDB] = {}
+        self._shard_entries: Dict[str, Dict] = {}
+        self._executor = None
+
+    def shard_key(self, restaurant: Dict) -> str:
+        """식당이 속할 샤드 이름"""
+        if self.shard_by == "location":
+            return restaurant.get('location') or DEFAULT_LOCATION_SHARD
+        source = restaurant.get('source_file') or restaurant['name']
+        return f"hash-{zlib.crc32(source.encode('utf-8')) % self.num_shards:02d}"
+
+    def route(self, filters: Optional[Dict]) -> List[str]:
+        """검색할 샤드 (location 샤딩이고 위치 필터가 있으면 해당 위치 샤드만)"""
+        locations = (filters or {}).get("location")
+        if self.shard_by != "location" or not locations:
+            return sorted(self.shards)
+        if isinstance(locations, str):
+            locations = [locations]
+        return [key for key in sorted(self.shards) if key in locations]
+
+    def _new_shard(self) -> VectorDB:
+        # 샤드는 캐시/재정렬 없이 검색만 하고, 임베딩 모델은 embedding_backends에서 프로세스 안에 하나만 로드됨
+        shard = VectorDB(cache_max_bytes=0, rerankers=[], **self._shard_options)
+        shard.embedding_cache = self.embedding_cache
+        return shard
+
+    def _set_shards(self, shards: Dict[str, VectorDB], entries: Dict[str, Dict]):
+        self.shards = shards
+        self._shard_entries = entries
+        self.restaurants = _ChainedRestaurants([shards[key].restaurants for key in sorted(shards)])
+        workers = self.shard_workers or max(1, min(len(shards), os.cpu_count() or 1))
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shard")
+        self._invalidate_results()
+
+    def _search_candidates(self, queries: List[str], k: int, granularity: str, pooling: str, chunk_fanout: int,
+                           filters: Optional[Dict], fusion: Optional[str], sparse_weight: float,
+                           query_embeddings: Optional[np.ndarray] = None) -> List[List[Tuple[Dict, float]]]:
+        """대상 샤드에서 동시에 결합 전 후보를 구해 병합한 뒤 키워드 결합으로 쿼리별 상위 k개
+
+        밀집 검색 후보와 BM25 후보를 샤드 전체 순위로 병합한 뒤 결합하므로
+        weighted의 BM25 정규화(전체 최고 점수)와 rrf 순위가 단일 인덱스와 같음
+        """
+        if not self.shards:
+            raise ValueError("샤드가 구축되지 않았습니다. build_shards() 또는 load_index()를 먼저 실행하세요.")
+        keys = self.route(filters)
+        metrics.incr("search.shards_searched", len(keys))
+        if not keys:
+            return [[] for _ in queries]
+        if query_embeddings is None:
+            query_embeddings = self._encode_queries(queries)
+        # 라우팅과 무관하게 전체 샤드의 용어 통계를 합산 (위치 필터가 있어도 단일 인덱스와 같은 IDF)
+        sparse_indexes = [shard.sparse_index for shard in self.shards.values() if shard.sparse_index is not None]
+        sparse_stats = None
+        if fusion and sparse_indexes:
+            sparse_stats = [BM25Index.merge_stats([index.collection_stats(query) for index in sparse_indexes])
+                            for query in queries]
+
+        def search_shard(key: str) -> List[Tuple[List[Tuple[Dict, float]], Optional[List]]]:
+            return self.shards[key]._first_stage(queries, k, granularity, pooling, chunk_fanout, filters,
+                                                 fusion, query_embeddings, sparse_stats)
+
+        with metrics.span("search.shard_fanout"):
+            if len(keys) == 1:
+                shard_results = [search_shard(keys[0])]
+            else:
+                shard_results = list(self._executor.map(search_shard, keys))
+
+        # 샤드별 후보는 점수 내림차순이므로 힙 병합으로 앞에서부터 필요한 개수만 꺼냄
+        dense_k = max(k, FUSION_DEPTH) if fusion else k
+        results = []
+        with metrics.span("search.shard_merge"):
+            for per_shard in zip(*shard_results):
+                dense_results = list(itertools.islice(
+                    heapq.merge(*(dense for dense, _ in per_shard), key=_score, reverse=True), dense_k))
+                sparse_lists = [sparse for _, sparse in per_shard if sparse is not None]
+                sparse_results = list(itertools.islice(
+                    heapq.merge(*sparse_lists, key=_score, reverse=True), FUSION_DEPTH)) if sparse_lists else None
+                results.append(self._fuse(dense_results, sparse_results, k, fusion, sparse_weight))
+        return results
+
+    def build_shards(self, processor, restaurant_data: List[Dict], save_dir: str, build_chunks: bool = False,
+                     build_sparse: bool = True, shards: Optional[List[str]] = None, incremental: bool = False,
+                     keep_snapshots: int = 3):
+        """식당을 샤드로 나눠 샤드마다 임베딩/구축/저장하고 샤드 구성을 새 스냅샷으로 게시
+
+        shards를 주면 그 샤드만, incremental=True이면 원본 CSV가 바뀐 샤드만 다시 구축하고 나머지는 저장된 스냅샷을 로드.
+        식당 id나 샤드/인덱스 설정이 이전 구성과 다르면(CSV 추가/삭제 등) 샤드 간 id가 어긋나므로 전체를 다시 구축.
+        processor: 데이터를 로드한 RestaurantDataProcessor (청크/키워드 문서를 샤드별 식당만 골라 스트리밍)
+        """
+        from data_preprocessing import file_sha256
+
+        groups = {}
+        for restaurant in restaurant_data:
+            groups.setdefault(self.shard_key(restaurant), []).append(restaurant)
+        ids = {restaurant['source_file']: restaurant['id'] for restaurant in restaurant_data}
+        hashes = {name: file_sha256(os.path.join(processor.data_dir, name)) for name in ids}
+        files = {key: {restaurant['source_file']: hashes[restaurant['source_file']] for restaurant in group}
+                 for key, group in groups.items()}
+
+        previous = load_shard_config(save_dir)
+        reusable = previous is not None and previous["ids"] == ids and all(
+            previous[name] == value for name, value in
+            (("shard_by", self.shard_by), ("num_shards", self.num_shards), ("index_type", self.index_type),
+             ("model", self.model_name))
+        )
+        if shards is not None:
+            unknown = sorted(set(shards) - set(groups))
+            if unknown:
+                raise ValueError(f"없는 샤드입니다: {unknown} (샤드: {sorted(groups)})")
+        if (shards is not None or incremental) and reusable:
+            targets = set(shards) if shards is not None else {
+                key for key in groups if previous["shards"].get(key, {}).get("files") != files[key]
+            }
+        else:
+            if shards is not None or incremental:
+                print("이전 샤드 구성과 식당 id/설정이 달라 전체 샤드를 다시 구축합니다.")
+            targets = set(groups)
+        print(f"샤드 {len(groups)}개 ({self.shard_by}), 다시 구축할 샤드: {sorted(targets) or '없음'}")
+
+        built, entries = {}, {}
+        for key in sorted(groups):
+            group = groups[key]
+            shard_dir = os.path.join(save_dir, SHARDS_DIR, key)
+            shard = self._new_shard()
+            if key in targets:
+                print(f"\n--- 샤드 {key}: {len(group)}개 식당 ---")
+                shard.build_index(group)
+                if build_chunks:
+                    shard.add_chunks(processor.iter_review_chunks(group))
+                if build_sparse:
+                    shard.build_sparse_index(processor.iter_review_documents(group))
+                shard.save_index(shard_dir, keep_snapshots)
+            else:
+                shard.load_index(os.path.join(shard_dir, SNAPSHOTS_DIR, previous["shards"][key]["snapshot"]))
+            built[key] = shard
+            entries[key] = {"snapshot": shard.snapshot, "restaurants": len(group), "files": files[key]}
+
+        self._set_shards(built, entries)
+        self._new_index_version()
+        self.save_index(save_dir, keep_snapshots, ids=ids)
+
+    def save_index(self, save_dir: str, keep_snapshots: int = 3, ids: Optional[Dict[str, int]] = None):
+        """샤드 구성(샤드별 스냅샷 이름)을 새 최상위 스냅샷으로 게시 (샤드 파일은 build_shards에서 샤드별로 저장됨)"""
+        if ids is None:
+            ids = {restaurant['source_file']: restaurant['id'] for restaurant in self.restaurants}
+        config = {
+            "shard_by": self.shard_by,
+            "num_shards": self.num_shards,
+            "index_type": self.index_type,
+            "model": self.model_name,
+            "index_version": self.index_version,
+            "ids": ids,
+            "shards": self._shard_entries,
+        }
+        with publish_snapshot(save_dir, self.index_version, keep_snapshots) as snapshot_dir:
+            with open(os.path.join(snapshot_dir, SHARD_CONFIG_FILE), "w", encoding="utf-8") as f:
+                json.dump(config, f, ensure_ascii=False, indent=2)
+        self.snapshot = current_snapshot(save_dir)
+        print(f"샤드 구성 저장 완료: {save_dir} (스냅샷 {self.snapshot}, 샤드 {len(self.shards)}개)")
+
+    def load_index(self, save_dir: str, nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                   mmap: bool = False):
+        """게시된 샤드 구성을 읽고 샤드들을 동시에 로드 (save_dir에 최상위 스냅샷 디렉토리를 직접 줘도 됨)"""
+        self.snapshot = current_snapshot(save_dir)
+        if self.snapshot is not None:
+            root, config_dir = save_dir, os.path.join(save_dir, SNAPSHOTS_DIR, self.snapshot)
+        else:
+            # 스냅샷 디렉토리를 직접 지정한 경우 (SnapshotWatcher)
+            config_dir = os.path.normpath(save_dir)
+            root = os.path.dirname(os.path.dirname(config_dir))
+            self.snapshot = os.path.basename(config_dir)
+        with open(os.path.join(config_dir, SHARD_CONFIG_FILE), "r", encoding="utf-8") as f:
+            config = json.load(f)
+        self.shard_by = config["shard_by"]
+        self.num_shards = config["num_shards"]
+        self.index_type = config["index_type"]
+        self.index_version = config["index_version"]
+        if config["model"] != self.model_name:
+            print(f"경고: 인덱스는 {config['model']} 임베딩으로 구축되었지만 현재 모델은 {self.model_name}입니다.")
+
+        def load_shard(key: str) -> VectorDB:
+            shard = self._new_shard()
+            shard.load_index(os.path.join(root, SHARDS_DIR, key, SNAPSHOTS_DIR, config["shards"][key]["snapshot"]),
+                             nprobe, ef_search, mmap)
+            return shard
+
+        keys = sorted(config["shards"])
+        with ThreadPoolExecutor(max_workers=max(1, min(len(keys), os.cpu_count() or 1))) as executor:
+            shards = dict(zip(keys, executor.map(load_shard, keys)))
+        self._set_shards(shards, config["shards"])
+        print(f"샤드 인덱스 로드 완료: {', '.join(f'{key}({len(shards[key].restaurants)})' for key in keys)}")
+
+    def set_search_params(self, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+        for shard in self.shards.values():
+            shard.set_search_params(nprobe, ef_search)
+        self._invalidate_results()
+
+    def _unsupported(self, *args, **kwargs):
+        raise NotImplementedError("샤드 인덱스는 build_shards()로 샤드 단위로 다시 구축하세요.")
+
+    build_index = rebuild_index = update_index = _unsupported
+    add_chunks = remove_chunks = build_sparse_index = update_sparse_index = _unsupported
@@ -0,0 +1,205 @@
+import json
+import os
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+SPARSE_CONFIG_FILE = "sparse_config.json"
+SPARSE_ARRAYS = ("term_offsets", "posting_docs", "posting_tfs", "impacts", "doc_ids", "doc_lens")
+# 쿼리 포스팅 수 × 이 값이 문서 수보다 작으면 닿은 문서끼리만 합산 (크면 문서 전체 길이의 bincount)
+SPARSE_ACCUMULATE_RATIO = 8
+
+HANGUL_TOKEN = re.compile("[가-힣]+|[a-z0-9]+")
+
+def tokenize(text: str) -> List[str]:
+    """한국어 검색용 토큰화 (형태소 분석기 없이 사용)
+
+    한글 어절은 글자 2-gram으로 쪼개 조사/붙여쓰기와 무관하게 매칭되도록 하고
+    ("트러플포테이토" → 트러, 러플, 플포, ...), 영문/숫자는 단어 그대로 사용
+    """
+    tokens = []
+    for word in HANGUL_TOKEN.findall(unicodedata.normalize("NFC", text).lower()):
+        if len(word) == 1 or not "가" <= word[0] <= "힣":
+            tokens.append(word)
+        else:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+class BM25Index:
+    """문자 n-gram 역색인 + BM25 점수
+
+    포스팅은 용어별로 연속 배치된 CSR 배열(term_offsets → posting_docs/posting_tfs)이고,
+    문서 길이 정규화까지 반영한 포스팅별 BM25 가중치(impacts)를 미리 계산해 두므로
+    쿼리 시에는 쿼리 용어의 포스팅 구간만 모아, 포스팅이 닿은 문서끼리만 점수를 합산하고
+    그 문서들 안에서 상위 k개를 고른다 (전체 문서 길이의 배열은 포스팅이 문서 수에 견줄 만큼 길 때만 쓴다).
+    문서는 식당 id로 식별하며, 용어 빈도를 보관하므로 증분 갱신 시 원문을 다시 읽지 않는다.
+    여러 색인(샤드)을 한 척도로 채점할 때는 collection_stats()를 합산(merge_stats)해 넘기면
+    미리 계산한 가중치 대신 합산한 문서 수/평균 길이/문서 빈도로 쿼리 용어의 포스팅만 다시 계산한다.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocab: Dict[str, int] = {}
+        self.term_offsets = np.zeros(1, dtype=np.int64)
+        self.posting_docs = np.zeros(0, dtype=np.int32)
+        self.posting_tfs = np.zeros(0, dtype=np.float32)
+        self.impacts = np.zeros(0, dtype=np.float32)
+        self.doc_ids = np.zeros(0, dtype=np.int64)
+        self.doc_lens = np.zeros(0, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def _count_terms(self, documents: Iterable[Tuple[int, str]]):
+        """문서들을 토큰화해 (용어, 문서 번호, 빈도) COO 배열로 변환"""
+        terms, docs, tfs, doc_ids, doc_lens = [], [], [], [], []
+        for doc, (doc_id, text) in enumerate(documents):
+            counts = Counter(tokenize(text))
+            for token, tf in counts.items():
+                term = self.vocab.setdefault(token, len(self.vocab))
+                terms.append(term)
+                docs.append(doc)
+                tfs.append(tf)
+            doc_ids.append(doc_id)
+            doc_lens.append(sum(counts.values()))
+        return (np.array(terms, dtype=np.int64), np.array(docs, dtype=np.int32), np.array(tfs, dtype=np.float32),
+                np.array(doc_ids, dtype=np.int64), np.array(doc_lens, dtype=np.float32))
+
+    def _set_postings(self, terms: np.ndarray, docs: np.ndarray, tfs: np.ndarray,
+                      doc_ids: np.ndarray, doc_lens: np.ndarray):
+        """COO 포스팅을 용어 순 CSR로 정렬하고 BM25 가중치 계산"""
+        order = np.argsort(terms, kind="stable")
+        terms, docs, tfs = terms[order], docs[order], tfs[order]
+        self.term_offsets = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        self.term_offsets[1:] = np.cumsum(np.bincount(terms, minlength=len(self.vocab)))
+        self.posting_docs = docs.astype(np.int32)
+        self.posting_tfs = tfs.astype(np.float32)
+        self.doc_ids = doc_ids
+        self.doc_lens = doc_lens
+
+        num_docs = len(doc_ids)
+        doc_freqs = np.diff(self.term_offsets)[terms].astype(np.float32)
+        idf = np.log1p((num_docs - doc_freqs + 0.5) / (doc_freqs + 0.5))
+        avg_len = float(doc_lens.mean()) if num_docs else 1.0
+        norm = self.k1 * (1 - self.b + self.b * doc_lens[docs] / max(avg_len, 1e-6))
+        self.impacts = (idf * tfs * (self.k1 + 1) / (tfs + norm)).astype(np.float32)
+
+    def build(self, documents: Iterable[Tuple[int, str]]):
+        """(식당 id, 전체 리뷰 텍스트) 문서들로 색인 구축"""
+        self.vocab = {}
+        self._set_postings(*self._count_terms(documents))
+
+    def update(self, added_documents: List[Tuple[int, str]], removed_ids: List[int]):
+        """문서 추가/삭제 반영 (기존 포스팅의 용어 빈도로 재계산, 원문 재토큰화 없음)"""
+        terms = np.repeat(np.arange(len(self.vocab), dtype=np.int64), np.diff(self.term_offsets))
+        docs = np.asarray(self.posting_docs)
+        tfs = np.asarray(self.posting_tfs)
+        doc_ids = np.asarray(self.doc_ids)
+        doc_lens = np.asarray(self.doc_lens)
+
+        # 삭제된 문서의 포스팅을 빼고 남은 문서 번호를 앞으로 당김
+        keep_docs = ~np.isin(doc_ids, np.asarray(removed_ids, dtype=np.int64))
+        new_doc_numbers = np.cumsum(keep_docs) - 1
+        keep_postings = keep_docs[docs]
+        terms, docs, tfs = terms[keep_postings], new_doc_numbers[docs[keep_postings]], tfs[keep_postings]
+        doc_ids, doc_lens = doc_ids[keep_docs], doc_lens[keep_docs]
+
+        new_terms, new_docs, new_tfs, new_doc_ids, new_doc_lens = self._count_terms(added_documents)
+        self._set_postings(
+            np.concatenate([terms, new_terms]),
+            np.concatenate([docs, new_docs + len(doc_ids)]),
+            np.concatenate([tfs, new_tfs]),
+            np.concatenate([doc_ids, new_doc_ids]),
+            np.concatenate([doc_lens, new_doc_lens]),
+        )
+
+    def collection_stats(self, query: str) -> Dict:
+        """쿼리 용어의 문서 빈도와 문서 수/전체 문서 길이 (샤드별 값을 merge_stats로 합산)"""
+        doc_freqs = {}
+        for token in set(tokenize(query)):
+            term = self.vocab.get(token)
+            if term is not None:
+                doc_freqs[token] = int(self.term_offsets[term + 1] - self.term_offsets[term])
+        return {"num_docs": len(self.doc_ids), "total_len": float(np.sum(self.doc_lens)), "doc_freqs": doc_freqs}
+
+    @staticmethod
+    def merge_stats(stats_list: List[Dict]) -> Dict:
+        doc_freqs = Counter()
+        for stats in stats_list:
+            doc_freqs.update(stats["doc_freqs"])
+        return {"num_docs": sum(stats["num_docs"] for stats in stats_list),
+                "total_len": sum(stats["total_len"] for stats in stats_list), "doc_freqs": dict(doc_freqs)}
+
+    def score(self, query: str, stats: Optional[Dict] = None,
+              doc_mask: Optional[np.ndarray] = None) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """쿼리 용어 포스팅이 닿은 문서의 (문서 번호 오름차순, BM25 점수). 색인에 있는 쿼리 용어가 없으면 None
+
+        stats: 여러 색인을 합산한 collection_stats (주면 IDF/평균 길이를 이 값으로 계산)
+        doc_mask: 주어지면 False인 문서는 제외
+        """
+        tokens = sorted({token for token in tokenize(query) if token in self.vocab})
+        if not tokens:
+            return None
+        ranges = [(self.term_offsets[self.vocab[token]], self.term_offsets[self.vocab[token] + 1]) for token in tokens]
+        docs = np.concatenate([self.posting_docs[start:end] for start, end in ranges])
+        if stats is None:
+            weights = np.concatenate([self.impacts[start:end] for start, end in ranges])
+        else:
+            doc_freqs = np.array([stats["doc_freqs"][token] for token in tokens], dtype=np.float32)
+            idf = np.log1p((stats["num_docs"] - doc_freqs + 0.5) / (doc_freqs + 0.5))
+            idf = np.repeat(idf, [end - start for start, end in ranges])
+            avg_len = stats["total_len"] / stats["num_docs"] if stats["num_docs"] else 1.0
+            tfs = np.concatenate([self.posting_tfs[start:end] for start, end in ranges])
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lens[docs] / max(avg_len, 1e-6))
+            weights = (idf * tfs * (self.k1 + 1) / (tfs + norm)).astype(np.float32)
+
+        if len(docs) * SPARSE_ACCUMULATE_RATIO >= len(self.doc_ids):
+            # 포스팅이 문서 수에 견줄 만큼 길면 정렬보다 문서 전체 길이의 누적이 빠르다
+            scores = np.bincount(docs, weights=weights, minlength=len(self.doc_ids))
+            touched = np.flatnonzero(scores > 0 if doc_mask is None else (scores > 0) & doc_mask)
+            return touched, scores[touched]
+        if len(ranges) == 1:
+            # 한 용어의 포스팅은 문서 번호 오름차순이고 문서당 하나
+            touched, scores = docs.astype(np.int64), weights.astype(np.float64)
+        else:
+            # 닿은 문서가 적으면 정렬로 문서 번호를 모아 그 문서들끼리만 합산
+            touched, inverse = np.unique(docs, return_inverse=True)
+            touched, scores = touched.astype(np.int64), np.bincount(inverse, weights=weights)
+        if doc_mask is not None:
+            keep = doc_mask[touched]
+            touched, scores = touched[keep], scores[keep]
+        return touched, scores
+
+    def search(self, query: str, k: int, doc_mask: Optional[np.ndarray] = None,
+               stats: Optional[Dict] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """상위 k개 (문서 번호, 점수). doc_mask가 주어지면 False인 문서는 제외"""
+        scored = self.score(query, stats, doc_mask)
+        if scored is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        candidates, scores = scored
+        if len(candidates) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            candidates, scores = candidates[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return candidates[order], scores[order]
+
+    def save(self, save_dir: str):
+        os.makedirs(save_dir, exist_ok=True)
+        for name in SPARSE_ARRAYS:
+            np.save(os.path.join(save_dir, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(save_dir, SPARSE_CONFIG_FILE), "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "vocab": self.vocab}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, save_dir: str, mmap: bool = False) -> "BM25Index":
+        with open(os.path.join(save_dir, SPARSE_CONFIG_FILE), "r", encoding="utf-8") as f:
+            config = json.load(f)
+        index = cls(config["k1"], config["b"])
+        index.vocab = config["vocab"]
+        for name in SPARSE_ARRAYS:
+            setattr(index, name, np.load(os.path.join(save_dir, f"{name}.npy"), mmap_mode="r" if mmap else None))
+        return index
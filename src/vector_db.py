@@ -3,21 +3,146 @@ import numpy as np
 import pickle
 import os
 import glob
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Tuple
-from data_preprocessing import RestaurantDataProcessor
+import json
+import time
+import uuid
+import argparse
+import threading
+from typing import List, Dict, Tuple, Iterable, Optional
+import index_factory
+import metrics
+from query_cache import QueryCache, normalize_query
+from metadata_store import RestaurantStore
+from sparse_index import BM25Index
+from reranker import FeatureReranker, rerank
+from embedding_backends import BACKENDS, EmbeddingCache, get_backend
+from index_snapshots import SNAPSHOTS_DIR, current_snapshot, publish_snapshot, resolve_snapshot
+from query_parser import CATEGORICAL_FILTERS, NUMERIC_FILTERS, parse_query_filters, validate_filters, filters_key
+
+MANIFEST_FILE = "manifest.json"
+DEDUP_REPORT_FILE = "dedup_report.json"
+CHUNK_INDEX_FILE = "chunk_index.index"
+CHUNK_IDS_FILE = "chunk_restaurant_ids.npy"
+INDEX_CONFIG_FILE = "index_config.json"
+METADATA_DIR = "metadata"
+SPARSE_DIR = "sparse_index"
+
+# 하이브리드 검색: 밀집(FAISS) 점수와 BM25 점수 결합 방식
+FUSION_METHODS = ("weighted", "rrf")
+FUSION_DEPTH = 50
+RRF_K = 60
+
+# 재정렬 단계에 넘길 1차 후보 수
+RERANK_DEPTH = 50
 
 class VectorDB:
-    def __init__(self, model_name: str = "jhgan/ko-sroberta-multitask"):
+    def __init__(self, model_name: str = "jhgan/ko-sroberta-multitask",
+                 index_type: str = "flat", index_params: Optional[Dict] = None,
+                 cache_max_bytes: int = 64 * 1024 * 1024, rerankers: Optional[List] = None,
+                 backend: str = "torch", batch_size: int = 64, max_seq_length: Optional[int] = None,
+                 embedding_cache: Optional[str] = None):
         """
         벡터 DB 초기화
         ko-sroberta-multitask: 한국어 특화 임베딩 모델
+        index_type: flat(정확 검색) / ivf_flat / ivf_pq / hnsw (근사 검색, index_factory 참고)
+        cache_max_bytes: 쿼리 임베딩/검색 결과 LRU 캐시 크기 (0이면 캐시 사용 안 함)
+        rerankers: 상위 RERANK_DEPTH개 후보에 차례로 적용할 재정렬 단계 (None이면 FeatureReranker, []이면 사용 안 함)
+        backend: 임베딩 백엔드 (torch / torch-int8 / onnx / onnx-int8, embedding_backends 참고)
+        embedding_cache: 문서 텍스트 → 임베딩 영구 캐시 파일 경로 (바뀌지 않은 텍스트는 다시 인코딩하지 않음)
+        
+        임베딩 모델은 처음 인코딩할 때 로드됨 (미리 받으려면 preload_model())
         """
-        self.model = SentenceTransformer(model_name)
+        if index_type not in index_factory.INDEX_TYPES:
+            raise ValueError(f"지원하지 않는 인덱스 종류입니다: {index_type}")
+        if backend not in BACKENDS:
+            raise ValueError(f"지원하지 않는 임베딩 백엔드입니다: {backend}")
+        self.model_name = model_name
+        self.backend = backend
+        self._backend_options = (batch_size, max_seq_length)
+        self._model = None
+        self.embedding_cache = EmbeddingCache(embedding_cache) if embedding_cache else None
+        self.index_type = index_type
+        self.index_params = index_factory.resolve_index_params(index_params)
         self.index = None
         self.restaurants = []
         self.embeddings = None
         
+        # 리뷰 청크 단위 인덱스 (선택): 청크 벡터 + 청크별 식당 id 매핑 배열
+        self.chunk_index = None
+        self.chunk_restaurant_ids = np.zeros(0, dtype=np.int32)
+        
+        # 전체 리뷰 키워드 역색인 (선택): 메뉴명 등 정확한 단어 매칭 보완
+        self.sparse_index = None
+        self._sparse_positions = None
+        
+        # 쿼리 임베딩/검색 결과 캐시 (인덱스가 바뀌면 검색 결과 캐시는 비움)
+        self.query_cache = QueryCache(cache_max_bytes) if cache_max_bytes > 0 else None
+        self._id_positions = None
+        self._filter_bitmaps = None
+        
+        # 인덱스 내용 버전 (내용이 바뀔 때마다 새로 발급, 생성 결과 캐시 키 등에 사용)
+        self.index_version = None
+        # 로드한 스냅샷 이름 (스냅샷 구조가 아닌 이전 저장 형식이면 None)
+        self.snapshot = None
+        
+        self.rerankers = [FeatureReranker()] if rerankers is None else list(rerankers)
+    
+    @property
+    def model(self):
+        """임베딩 백엔드 (첫 사용 시 로드, 같은 설정은 embedding_backends에서 프로세스 안에 한 번만 로드)"""
+        if self._model is None:
+            with metrics.span("embed.load_model"):
+                self._model = get_backend(self.model_name, self.backend, *self._backend_options)
+        return self._model
+    
+    @property
+    def model_loaded(self) -> bool:
+        return self._model is not None
+    
+    def preload_model(self) -> threading.Thread:
+        """임베딩 모델을 백그라운드 스레드에서 로드 (그동안 인덱스 로드/화면 표시 등을 진행)
+        
+        로드 중에 인코딩이 필요해지면 get_backend의 잠금에서 로드가 끝날 때까지 기다림
+        """
+        def load():
+            try:
+                self.model
+            except Exception as e:
+                print(f"임베딩 모델 로드 실패: {e}")
+        thread = threading.Thread(target=load, daemon=True)
+        thread.start()
+        return thread
+        
+    def _encode_documents(self, texts: List[str], batch_size: Optional[int] = None,
+                          show_progress_bar: bool = False) -> np.ndarray:
+        """색인할 문서 텍스트 임베딩 (영구 캐시가 있으면 캐시에 없는 텍스트만 인코딩)"""
+        with metrics.span("embed.documents"):
+            if self.embedding_cache is None:
+                return self.model.encode(texts, batch_size, show_progress_bar)
+            return self.embedding_cache.encode(self.model, texts, batch_size, show_progress_bar)
+        
+    def _new_index_version(self):
+        """인덱스 내용 변경 시 새 버전 발급"""
+        self.index_version = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        
+    def _invalidate_results(self):
+        """인덱스 변경 시 캐시된 검색 결과, id→위치 매핑, 필터 비트맵 무효화"""
+        self._id_positions = None
+        self._filter_bitmaps = None
+        self._sparse_positions = None
+        if self.query_cache is not None:
+            self.query_cache.clear_results()
+    
+    def _position_by_id(self) -> Dict[int, int]:
+        """식당 id → self.restaurants 위치 매핑 (mmap 저장소는 id 컬럼만 읽음)"""
+        if self._id_positions is None:
+            if isinstance(self.restaurants, RestaurantStore):
+                ids = self.restaurants.column('id').tolist()
+            else:
+                ids = [restaurant['id'] for restaurant in self.restaurants]
+            self._id_positions = {restaurant_id: pos for pos, restaurant_id in enumerate(ids)}
+        return self._id_positions
+        
     def build_index(self, restaurant_data: List[Dict]):
         """식당 데이터로부터 FAISS 인덱스 구축"""
         self.restaurants = restaurant_data
@@ -27,89 +152,763 @@ class VectorDB:
         
         print("텍스트 임베딩 생성 중...")
         # 임베딩 생성
-        self.embeddings = self.model.encode(texts, show_progress_bar=True)
-        
-        # FAISS 인덱스 생성 (코사인 유사도를 위해 정규화)
-        dimension = self.embeddings.shape[1]
-        self.index = faiss.IndexFlatIP(dimension)  # Inner Product (코사인 유사도)
+        self.embeddings = self._encode_documents(texts, show_progress_bar=True)
         
         # 임베딩 정규화 (코사인 유사도 계산을 위해)
         normalized_embeddings = self.embeddings / np.linalg.norm(self.embeddings, axis=1, keepdims=True)
         
-        # 인덱스에 임베딩 추가
-        self.index.add(normalized_embeddings.astype(np.float32))
+        # FAISS 인덱스 생성 (Inner Product = 코사인 유사도) 및 임베딩 추가
+        self.index = index_factory.build_index(self.index_type, normalized_embeddings, self.index_params)
+        
+        self._new_index_version()
+        self._invalidate_results()
+        print(f"벡터 DB 구축 완료: {len(restaurant_data)}개 식당 ({self.index_type})")
+        
+    def rebuild_index(self, index_type: str, index_params: Optional[Dict] = None):
+        """저장된 임베딩으로 다른 종류의 FAISS 인덱스를 다시 구성 (재임베딩 없음)"""
+        if index_type not in index_factory.INDEX_TYPES:
+            raise ValueError(f"지원하지 않는 인덱스 종류입니다: {index_type}")
+        embeddings = np.asarray(self.embeddings, dtype=np.float32)
+        normalized_embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+        self.index_type = index_type
+        self.index_params = index_factory.resolve_index_params(index_params)
+        self.index = index_factory.build_index(index_type, normalized_embeddings, self.index_params)
+        self._invalidate_results()
+        
+    def set_rerankers(self, rerankers: List):
+        """재정렬 단계 교체 (이전 설정으로 캐시된 검색 결과 무효화)"""
+        self.rerankers = list(rerankers)
+        self._invalidate_results()
         
-        print(f"벡터 DB 구축 완료: {len(restaurant_data)}개 식당")
+    def set_search_params(self, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+        """쿼리 시점 근사 검색 파라미터 변경 (IVF: nprobe, HNSW: efSearch)"""
+        if nprobe is not None:
+            self.index_params["nprobe"] = nprobe
+        if ef_search is not None:
+            self.index_params["ef_search"] = ef_search
+        if self.index is not None:
+            index_factory.set_search_params(self.index, nprobe, ef_search)
+        self._invalidate_results()
         
-    def search(self, query: str, k: int = 3) -> List[Tuple[Dict, float]]:
-        """쿼리에 대해 유사한 식당 검색"""
+    def update_index(self, added_restaurants: List[Dict], removed_ids: List[int]):
+        """변경된 식당만 반영하여 인덱스를 제자리에서 갱신 (증분 빌드)"""
+        if self.index is None:
+            raise ValueError("인덱스가 구축되지 않았습니다. build_index() 또는 load_index()를 먼저 실행하세요.")
+        
+        # 삭제/변경된 식당 제거 (IndexFlat.remove_ids는 남은 벡터 순서를 유지)
+        removed = set(removed_ids)
+        positions = [pos for pos, restaurant in enumerate(self.restaurants) if restaurant['id'] in removed]
+        if positions:
+            if self.index_type == "flat":
+                self.index.remove_ids(np.array(positions, dtype=np.int64))
+            self.embeddings = np.delete(self.embeddings, positions, axis=0)
+            self.restaurants = [r for r in self.restaurants if r['id'] not in removed]
+        
+        # 추가/변경된 식당만 임베딩
+        if added_restaurants:
+            texts = [restaurant['search_text'] for restaurant in added_restaurants]
+            
+            print(f"텍스트 임베딩 생성 중... ({len(texts)}개 식당)")
+            new_embeddings = self._encode_documents(texts, show_progress_bar=True)
+            
+            if self.index_type == "flat":
+                normalized_embeddings = new_embeddings / np.linalg.norm(new_embeddings, axis=1, keepdims=True)
+                self.index.add(normalized_embeddings.astype(np.float32))
+            
+            self.embeddings = np.vstack([self.embeddings, new_embeddings])
+            self.restaurants = list(self.restaurants) + list(added_restaurants)
+        
+        # 근사 인덱스는 id 재배치/삭제를 지원하지 않으므로 저장된 임베딩으로 재구성 (재임베딩 없음)
+        if self.index_type != "flat" and (positions or added_restaurants):
+            normalized_embeddings = self.embeddings / np.linalg.norm(self.embeddings, axis=1, keepdims=True)
+            self.index = index_factory.build_index(self.index_type, normalized_embeddings, self.index_params)
+        
+        self._new_index_version()
+        self._invalidate_results()
+        print(f"벡터 DB 증분 갱신 완료: 추가 {len(added_restaurants)}개, 제거 {len(positions)}개 (총 {len(self.restaurants)}개 식당)")
+        
+    def add_chunks(self, chunks: Iterable[Tuple[int, str]], batch_size: int = 64, buffer_size: int = 1024):
+        """(식당 id, 리뷰 청크) 스트림을 배치 단위로 임베딩하여 청크 인덱스에 추가
+        
+        buffer_size개 청크만 메모리에 두고 바로 인덱스에 넣으므로 리뷰 수와 무관하게 메모리가 제한됨
+        """
+        if self.chunk_index is None:
+            self.chunk_index = faiss.IndexFlatIP(self.model.dimension)
+        
+        new_ids = []
+        ids_buffer, text_buffer = [], []
+        
+        def flush():
+            embeddings = self._encode_documents(text_buffer, batch_size)
+            embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+            self.chunk_index.add(embeddings.astype(np.float32))
+            new_ids.append(np.array(ids_buffer, dtype=np.int32))
+            ids_buffer.clear()
+            text_buffer.clear()
+        
+        for restaurant_id, text in chunks:
+            ids_buffer.append(restaurant_id)
+            text_buffer.append(text)
+            if len(text_buffer) >= buffer_size:
+                flush()
+                print(f"리뷰 청크 임베딩 중... ({self.chunk_index.ntotal}개)")
+        if text_buffer:
+            flush()
+        
+        self.chunk_restaurant_ids = np.concatenate([self.chunk_restaurant_ids] + new_ids)
+        self._new_index_version()
+        self._invalidate_results()
+        print(f"리뷰 청크 인덱스: 총 {self.chunk_index.ntotal}개 청크")
+    
+    def remove_chunks(self, removed_ids: List[int]):
+        """지정한 식당들의 리뷰 청크를 청크 인덱스에서 제거"""
+        if self.chunk_index is None or not removed_ids:
+            return
+        mask = np.isin(self.chunk_restaurant_ids, np.array(removed_ids, dtype=np.int32))
+        positions = np.flatnonzero(mask).astype(np.int64)
+        if len(positions):
+            self.chunk_index.remove_ids(positions)
+            self.chunk_restaurant_ids = self.chunk_restaurant_ids[~mask]
+            self._new_index_version()
+            self._invalidate_results()
+    
+    def build_sparse_index(self, documents: Iterable[Tuple[int, str]]):
+        """(식당 id, 전체 리뷰 텍스트) 문서들로 BM25 역색인 구축"""
+        self.sparse_index = BM25Index()
+        self.sparse_index.build(documents)
+        self._new_index_version()
+        self._invalidate_results()
+        print(f"키워드 역색인 구축 완료: {len(self.sparse_index)}개 문서, {len(self.sparse_index.vocab)}개 용어")
+    
+    def update_sparse_index(self, added_documents: List[Tuple[int, str]], removed_ids: List[int]):
+        """삭제/변경된 식당 문서를 빼고 추가/변경된 문서를 역색인에 반영"""
+        if self.sparse_index is None:
+            return
+        self.sparse_index.update(added_documents, removed_ids)
+        self._new_index_version()
+        self._invalidate_results()
+    
+    def _sparse_doc_positions(self) -> np.ndarray:
+        """역색인 문서 번호 → self.restaurants 위치 (없는 식당은 -1)"""
+        if self._sparse_positions is None:
+            position_by_id = self._position_by_id()
+            self._sparse_positions = np.array(
+                [position_by_id.get(doc_id, -1) for doc_id in self.sparse_index.doc_ids.tolist()], dtype=np.int64
+            )
+        return self._sparse_positions
+    
+    def _sparse_candidates(self, query: str, query_embedding: np.ndarray, dense_results: List[Tuple[Dict, float]],
+                           mask: Optional[np.ndarray], stats: Optional[Dict] = None) -> List[Tuple[Dict, float, float]]:
+        """BM25 상위 FUSION_DEPTH개 (식당, BM25 점수, 코사인 유사도), BM25 점수 내림차순
+        
+        코사인 유사도는 밀집 검색 후보에 있으면 그 점수, 없으면 저장된 식당 임베딩으로 계산
+        stats: 여러 샤드를 합산한 BM25Index.collection_stats (샤드 간 BM25 점수 척도를 맞출 때)
+        """
+        doc_positions = self._sparse_doc_positions()
+        doc_mask = doc_positions >= 0
+        if mask is not None:
+            doc_mask &= mask[np.maximum(doc_positions, 0)]
+        docs, sparse_scores = self.sparse_index.search(query, FUSION_DEPTH, doc_mask, stats)
+        if len(docs) == 0:
+            return []
+        
+        position_by_id = self._position_by_id()
+        dense_scores = {position_by_id[restaurant['id']]: score for restaurant, score in dense_results}
+        sparse_positions = doc_positions[docs].tolist()
+        missing = [pos for pos in sparse_positions if pos not in dense_scores]
+        if missing:
+            embeddings = np.asarray(self.embeddings[missing], dtype=np.float32)
+            cosine = embeddings @ query_embedding / np.linalg.norm(embeddings, axis=1)
+            dense_scores.update(zip(missing, cosine.tolist()))
+        return [(self.restaurants[pos], score, dense_scores[pos])
+                for pos, score in zip(sparse_positions, sparse_scores.tolist())]
+    
+    @staticmethod
+    def _fuse(dense_results: List[Tuple[Dict, float]], sparse_results: Optional[List[Tuple[Dict, float, float]]],
+              k: int, fusion: str, sparse_weight: float) -> List[Tuple[Dict, float]]:
+        """밀집 검색 후보와 BM25 후보(_sparse_candidates)를 합쳐 상위 k개 재정렬
+        
+        weighted: (1 - w) * 코사인 유사도 + w * (BM25 / 쿼리 내 최고 BM25)
+        rrf: 두 순위 목록의 1 / (RRF_K + 순위) 합
+        BM25 후보가 없으면 밀집 검색 결과 그대로
+        """
+        if not sparse_results:
+            return dense_results[:k]
+        
+        restaurants, fused = {}, {}
+        if fusion == "rrf":
+            for ranked in (dense_results, sparse_results):
+                for rank, (restaurant, *_) in enumerate(ranked):
+                    restaurants[restaurant['id']] = restaurant
+                    fused[restaurant['id']] = fused.get(restaurant['id'], 0.0) + 1.0 / (RRF_K + rank + 1)
+        else:
+            dense_scores = {}
+            for restaurant, score in dense_results:
+                restaurants[restaurant['id']] = restaurant
+                dense_scores[restaurant['id']] = score
+            sparse_norm = {}
+            for restaurant, sparse_score, cosine in sparse_results:
+                restaurants.setdefault(restaurant['id'], restaurant)
+                dense_scores.setdefault(restaurant['id'], cosine)
+                sparse_norm[restaurant['id']] = sparse_score / sparse_results[0][1]
+            fused = {
+                restaurant_id: (1 - sparse_weight) * score + sparse_weight * sparse_norm.get(restaurant_id, 0.0)
+                for restaurant_id, score in dense_scores.items()
+            }
+        
+        top = sorted(fused.items(), key=lambda item: -item[1])[:k]
+        return [(restaurants[restaurant_id], score) for restaurant_id, score in top]
+    
+    def _build_filter_bitmaps(self) -> Dict:
+        """속성별 사전 계산 비트맵 (범주형: 값 → bool 배열, 수치형: 값 배열)"""
+        if self._filter_bitmaps is None:
+            columns = {}
+            for name in CATEGORICAL_FILTERS + tuple(NUMERIC_FILTERS.values()):
+                if isinstance(self.restaurants, RestaurantStore):
+                    if name in CATEGORICAL_FILTERS:
+                        columns[name] = np.array(self.restaurants.string_column(name), dtype=object)
+                    else:
+                        columns[name] = np.asarray(self.restaurants.column(name))
+                else:
+                    values = [restaurant[name] for restaurant in self.restaurants]
+                    columns[name] = np.array(values, dtype=object if name in CATEGORICAL_FILTERS else np.float64)
+            
+            bitmaps = {}
+            for name in CATEGORICAL_FILTERS:
+                bitmaps[name] = {value: columns[name] == value for value in set(columns[name].tolist())}
+            for name in NUMERIC_FILTERS.values():
+                bitmaps[name] = columns[name]
+            self._filter_bitmaps = bitmaps
+        return self._filter_bitmaps
+    
+    def _filter_mask(self, filters: Optional[Dict]) -> Optional[np.ndarray]:
+        """필터 조건을 만족하는 식당 위치의 bool 마스크 (필터가 없으면 None)"""
+        filters = validate_filters(filters)
+        if not filters:
+            return None
+        
+        bitmaps = self._build_filter_bitmaps()
+        mask = np.ones(len(self.restaurants), dtype=bool)
+        for name in CATEGORICAL_FILTERS:
+            if name not in filters:
+                continue
+            values = filters[name]
+            if isinstance(values, str):
+                values = [values]
+            value_mask = np.zeros(len(self.restaurants), dtype=bool)
+            for value in values:
+                if value in bitmaps[name]:
+                    value_mask |= bitmaps[name][value]
+            mask &= value_mask
+        for filter_name, column in NUMERIC_FILTERS.items():
+            if filter_name in filters:
+                mask &= bitmaps[column] >= filters[filter_name]
+        return mask
+    
+    def _selector_params(self, mask: np.ndarray):
+        """bool 마스크를 FAISS IDSelectorBitmap 검색 파라미터로 변환 (FAISS 내부에서 필터링)"""
+        packed = np.packbits(mask, bitorder="little")
+        selector = faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(packed))
+        if self.index_type in ("ivf_flat", "ivf_pq"):
+            params = faiss.SearchParametersIVF(sel=selector, nprobe=self.index_params["nprobe"])
+        elif self.index_type == "hnsw":
+            params = faiss.SearchParametersHNSW(sel=selector, efSearch=self.index_params["ef_search"])
+        else:
+            params = faiss.SearchParameters(sel=selector)
+        # packed 버퍼와 selector가 검색 중 해제되지 않도록 함께 반환
+        return params, (packed, selector)
+    
+    def _encode_queries(self, queries: List[str], batch_size: int = 64) -> np.ndarray:
+        """쿼리들을 한 번에 임베딩하고 행렬 단위로 정규화 (캐시에 없는 쿼리만 인코딩)
+        
+        캐시 키는 결과 캐시와 같은 정규화(공백/NFC, 대소문자 유지)이고, 인코딩은 키마다 처음 나온 원문으로 함
+        """
+        if self.query_cache is None:
+            return self._encode_queries_uncached(queries, batch_size)
+        
+        keys = [normalize_query(query, lowercase=False) for query in queries]
+        cached = [self.query_cache.embeddings.get(key) for key in keys]
+        # 정규화 키 → 인코딩할 원문 (같은 키의 쿼리는 한 번만 인코딩)
+        missing = {}
+        for key, query, embedding in zip(keys, queries, cached):
+            if embedding is None:
+                missing.setdefault(key, query)
+        metrics.incr("query_cache.embedding_hits", len(queries) - len(missing))
+        metrics.incr("query_cache.embedding_misses", len(missing))
+        if missing:
+            new_embeddings = self._encode_queries_uncached(list(missing.values()), batch_size)
+            encoded = dict(zip(missing, new_embeddings))
+            for key, embedding in encoded.items():
+                self.query_cache.embeddings.put(key, embedding)
+            cached = [embedding if embedding is not None else encoded[key] for key, embedding in zip(keys, cached)]
+        return np.vstack(cached)
+    
+    def _encode_queries_uncached(self, queries: List[str], batch_size: int) -> np.ndarray:
+        """쿼리 임베딩 생성 (캐시 미사용)"""
+        with metrics.span("embed.query"):
+            query_embeddings = self.model.encode(queries, batch_size)
+        query_embeddings /= np.linalg.norm(query_embeddings, axis=1, keepdims=True)
+        return query_embeddings
+    
+    def _search_chunks(self, query_embeddings: np.ndarray, k: int, pooling: str, fanout: int,
+                       mask: Optional[np.ndarray] = None) -> List[List[Tuple[Dict, float]]]:
+        """청크 검색 결과를 식당 단위로 집계 (max/mean pooling)"""
+        if self.chunk_index is None:
+            raise ValueError("청크 인덱스가 구축되지 않았습니다. add_chunks()를 먼저 실행하세요.")
+        if pooling not in ("max", "mean"):
+            raise ValueError(f"지원하지 않는 pooling 방식입니다: {pooling}")
+        
+        num_chunks = min(self.chunk_index.ntotal, k * fanout)
+        position_by_id = self._position_by_id()
+        if mask is None:
+            with metrics.span("search.index_chunks"):
+                scores, indices = self.chunk_index.search(query_embeddings, num_chunks)
+        else:
+            # 식당 마스크 → 허용된 식당의 청크 마스크
+            allowed_ids = [restaurant_id for restaurant_id, pos in position_by_id.items() if mask[pos]]
+            chunk_mask = np.isin(self.chunk_restaurant_ids, np.array(allowed_ids, dtype=np.int32))
+            packed = np.packbits(chunk_mask, bitorder="little")
+            selector = faiss.IDSelectorBitmap(len(chunk_mask), faiss.swig_ptr(packed))
+            with metrics.span("search.index_chunks"):
+                scores, indices = self.chunk_index.search(query_embeddings, num_chunks,
+                                                          params=faiss.SearchParameters(sel=selector))
+        
+        batch_results = []
+        for row_scores, row_indices in zip(scores, indices):
+            valid = row_indices != -1
+            hit_ids = self.chunk_restaurant_ids[row_indices[valid]]
+            hit_scores = row_scores[valid]
+            
+            # 식당 id별 점수 집계 (검색 결과는 점수 내림차순이므로 첫 등장이 최댓값)
+            unique_ids, first_pos, inverse = np.unique(hit_ids, return_index=True, return_inverse=True)
+            if pooling == "max":
+                pooled = hit_scores[first_pos]
+            else:
+                pooled = np.bincount(inverse, weights=hit_scores) / np.bincount(inverse)
+            
+            results = []
+            for order in np.argsort(-pooled)[:k]:
+                pos = position_by_id.get(int(unique_ids[order]))
+                if pos is not None:
+                    results.append((self.restaurants[pos], float(pooled[order])))
+            batch_results.append(results)
+        return batch_results
+    
+    def _first_stage(self, queries: List[str], k: int, granularity: str, pooling: str, chunk_fanout: int,
+                     filters: Optional[Dict], fusion: Optional[str], query_embeddings: Optional[np.ndarray] = None,
+                     sparse_stats: Optional[List[Dict]] = None) -> List[Tuple[List[Tuple[Dict, float]], Optional[List]]]:
+        """필터 → 밀집 검색 → BM25 검색까지의 결합 전 후보: 쿼리별 (밀집 검색 후보, BM25 후보 또는 None)
+        
+        query_embeddings: 정규화된 쿼리 임베딩 (주지 않으면 인코딩, 샤드 검색은 한 번 인코딩한 값을 넘김)
+        sparse_stats: 쿼리별 BM25 collection_stats (샤드 검색은 전체 샤드를 합산한 값을 넘김)
+        """
         if self.index is None:
             raise ValueError("인덱스가 구축되지 않았습니다. build_index()를 먼저 실행하세요.")
+        if self.sparse_index is None:
+            fusion = None
+        
+        mask = self._filter_mask(filters)
+        if mask is not None and not mask.any():
+            return [([], None) for _ in queries]
+        if query_embeddings is None:
+            query_embeddings = self._encode_queries(queries)
+        # 결합할 때는 BM25 후보와 겹치도록 밀집 검색 후보를 넉넉히 가져옴
+        dense_k = max(k, FUSION_DEPTH) if fusion else k
+        
+        if granularity == "chunk":
+            results = self._search_chunks(query_embeddings, dense_k, pooling, chunk_fanout, mask)
+        else:
+            with metrics.span("search.index"):
+                if mask is None:
+                    scores, indices = self.index.search(query_embeddings, dense_k)
+                else:
+                    params, _keepalive = self._selector_params(mask)
+                    scores, indices = self.index.search(query_embeddings, dense_k, params=params)
+            
+            # 결과 구성 (numpy 스칼라 변환을 행 단위 tolist()로 한 번에 처리)
+            with metrics.span("search.assemble"):
+                restaurants = self.restaurants
+                results = [
+                    [(restaurants[idx], score) for idx, score in zip(row_indices, row_scores) if idx != -1]
+                    for row_indices, row_scores in zip(indices.tolist(), scores.tolist())
+                ]
         
-        # 쿼리 임베딩 생성
-        query_embedding = self.model.encode([query])
-        query_embedding = query_embedding / np.linalg.norm(query_embedding, axis=1, keepdims=True)
+        if not fusion:
+            return [(query_results, None) for query_results in results]
+        with metrics.span("search.sparse_fusion"):
+            return [
+                (query_results, self._sparse_candidates(query, query_embedding, query_results, mask,
+                                                        sparse_stats[i] if sparse_stats else None))
+                for i, (query, query_embedding, query_results) in enumerate(zip(queries, query_embeddings, results))
+            ]
+    
+    def _search_candidates(self, queries: List[str], k: int, granularity: str, pooling: str, chunk_fanout: int,
+                           filters: Optional[Dict], fusion: Optional[str], sparse_weight: float,
+                           query_embeddings: Optional[np.ndarray] = None) -> List[List[Tuple[Dict, float]]]:
+        """필터 → 밀집 검색 → 키워드 결합까지의 1차 후보 (쿼리별 최대 k개, 점수 내림차순, 재정렬 전)"""
+        candidates = self._first_stage(queries, k, granularity, pooling, chunk_fanout, filters, fusion,
+                                       query_embeddings)
+        return [self._fuse(dense_results, sparse_results, k, fusion, sparse_weight)
+                for dense_results, sparse_results in candidates]
+    
+    @metrics.timed("search.batch")
+    def search_batch(self, queries: List[str], k: int = 3, granularity: str = "restaurant",
+                     pooling: str = "max", chunk_fanout: int = 20,
+                     filters: Optional[Dict] = None, fusion: Optional[str] = "weighted",
+                     sparse_weight: float = 0.3, rerank_results: bool = True) -> List[List[Tuple[Dict, float]]]:
+        """여러 쿼리를 한 번의 임베딩 + 한 번의 FAISS 검색으로 처리
+        
+        결과의 식당 dict는 복사본이 아닌 공유 객체이므로 수정하지 말 것
+        동일한 (정규화된 쿼리, k, 옵션)은 LRU 캐시에서 바로 반환 (정규화는 캐시 키에만 쓰고 인코딩/재정렬에는 원문 사용)
+        filters(location, menu_type, price_range, min_rating, min_review_count)는 모든 쿼리에 적용되며,
+        사전 계산된 속성 비트맵으로 FAISS 검색 내부에서 걸러냄
+        키워드 역색인이 있으면 fusion(weighted / rrf) 방식으로 BM25 점수와 결합 (None이면 밀집 검색만)
+        rerank_results=True이면 상위 RERANK_DEPTH개 후보를 self.rerankers로 재정렬한 뒤 k개 반환
+        """
+        if fusion is not None and fusion not in FUSION_METHODS:
+            raise ValueError(f"지원하지 않는 fusion 방식입니다: {fusion}")
+        if not queries:
+            return []
+        rerank_results = rerank_results and bool(self.rerankers)
+        
+        # 정규화된 쿼리 텍스트 + 검색 옵션 단위로 결과 캐시 조회
+        option_key = (k, granularity, pooling, chunk_fanout, filters_key(filters), fusion, sparse_weight, rerank_results)
+        result_keys = [(normalize_query(query, lowercase=False),) + option_key for query in queries]
+        if self.query_cache is not None:
+            batch_results = [self.query_cache.results.get(key) for key in result_keys]
+        else:
+            batch_results = [None] * len(queries)
+        missing = [i for i, results in enumerate(batch_results) if results is None]
+        metrics.incr("query_cache.result_hits", len(queries) - len(missing))
+        metrics.incr("query_cache.result_misses", len(missing))
+        if not missing:
+            return batch_results
+        
+        # 재정렬할 때는 1차 후보를 RERANK_DEPTH개까지 가져옴
+        first_k = max(k, RERANK_DEPTH) if rerank_results else k
+        new_results = self._search_candidates([queries[i] for i in missing], first_k, granularity, pooling,
+                                              chunk_fanout, filters, fusion, sparse_weight)
+        if rerank_results:
+            with metrics.span("search.rerank"):
+                new_results = [rerank(self.rerankers, queries[i], results)[:k]
+                               for i, results in zip(missing, new_results)]
+        
+        for i, results in zip(missing, new_results):
+            batch_results[i] = results
+            if self.query_cache is not None:
+                self.query_cache.results.put(result_keys[i], results)
+        return batch_results
         
-        # 검색 수행
-        scores, indices = self.index.search(query_embedding.astype(np.float32), k)
+    def search(self, query: str, k: int = 3, granularity: str = "restaurant",
+               pooling: str = "max", chunk_fanout: int = 20,
+               filters: Optional[Dict] = None, auto_filter: bool = False,
+               fusion: Optional[str] = "weighted", sparse_weight: float = 0.3,
+               rerank_results: bool = True) -> List[Tuple[Dict, float]]:
+        """쿼리에 대해 유사한 식당 검색
         
-        # 결과 구성
-        results = []
-        for i, (idx, score) in enumerate(zip(indices[0], scores[0])):
-            if idx != -1:  # 유효한 인덱스인 경우
-                restaurant = self.restaurants[idx].copy()
-                results.append((restaurant, float(score)))
+        granularity="chunk"이면 리뷰 청크 인덱스를 검색한 뒤 식당 단위로 pooling하여 집계
+        auto_filter=True이면 쿼리 텍스트에서 위치/메뉴 등 필터를 추출해 적용하고,
+        결과가 k개보다 적으면 필터 없는 결과로 나머지를 채움
+        키워드 역색인이 있으면 BM25 점수를 fusion 방식으로 결합하고, 상위 후보를 재정렬 (search_batch 참고)
+        """
+        if filters is None and auto_filter:
+            filters = parse_query_filters(query)
+        results = self.search_batch([query], k, granularity, pooling, chunk_fanout, filters, fusion, sparse_weight,
+                                    rerank_results)[0]
         
-        return results
+        if auto_filter and filters and len(results) < k:
+            seen = {restaurant['id'] for restaurant, _ in results}
+            for restaurant, score in self.search_batch([query], k, granularity, pooling, chunk_fanout,
+                                                       None, fusion, sparse_weight, rerank_results)[0]:
+                if len(results) >= k:
+                    break
+                if restaurant['id'] not in seen:
+                    results = results + [(restaurant, score)]
+        return [(restaurant.copy(), score) for restaurant, score in results]
     
-    def save_index(self, save_dir: str):
-        """벡터 DB를 파일로 저장"""
-        os.makedirs(save_dir, exist_ok=True)
+    def save_index(self, save_dir: str, keep_snapshots: int = 3):
+        """벡터 DB를 새 버전 스냅샷으로 저장하고 CURRENT 포인터를 원자적으로 교체
         
+        기존 파일을 덮어쓰지 않으므로 읽는 쪽은 항상 완성된 스냅샷만 보게 됨 (index_snapshots 참고)
+        """
+        with publish_snapshot(save_dir, self.index_version, keep_snapshots) as snapshot_dir:
+            self._write_files(snapshot_dir)
+        self.snapshot = current_snapshot(save_dir)
+        print(f"벡터 DB 저장 완료: {save_dir} (스냅샷 {self.snapshot})")
+    
+    def _write_files(self, save_dir: str):
+        """인덱스/메타데이터/임베딩 파일 저장"""
         # FAISS 인덱스 저장
         faiss.write_index(self.index, os.path.join(save_dir, "faiss_index.index"))
         
-        # 식당 데이터 저장
+        # 인덱스 설정 저장 (로드 시 nprobe/efSearch 복원용)
+        with open(os.path.join(save_dir, INDEX_CONFIG_FILE), "w", encoding="utf-8") as f:
+            json.dump({"index_type": self.index_type, "index_params": self.index_params,
+                       "index_version": self.index_version,
+                       "embedding": {"model": self.model_name, "backend": self.backend, "name": self.model.name}},
+                      f, ensure_ascii=False, indent=2)
+        
+        # 식당 데이터 저장 (pickle + mmap 로드용 컬럼 저장소)
+        restaurants = list(self.restaurants)
         with open(os.path.join(save_dir, "restaurants.pkl"), "wb") as f:
-            pickle.dump(self.restaurants, f)
+            pickle.dump(restaurants, f)
+        RestaurantStore.write(os.path.join(save_dir, METADATA_DIR), restaurants)
             
         # 임베딩 저장
         np.save(os.path.join(save_dir, "embeddings.npy"), self.embeddings)
         
-        print(f"벡터 DB 저장 완료: {save_dir}")
+        # 리뷰 청크 인덱스 저장 (구축된 경우)
+        if self.chunk_index is not None:
+            faiss.write_index(self.chunk_index, os.path.join(save_dir, CHUNK_INDEX_FILE))
+            np.save(os.path.join(save_dir, CHUNK_IDS_FILE), self.chunk_restaurant_ids)
+        
+        # 키워드 역색인 저장 (구축된 경우)
+        if self.sparse_index is not None:
+            self.sparse_index.save(os.path.join(save_dir, SPARSE_DIR))
     
-    def load_index(self, save_dir: str):
-        """저장된 벡터 DB 로드"""
-        # FAISS 인덱스 로드
-        self.index = faiss.read_index(os.path.join(save_dir, "faiss_index.index"))
+    def load_index(self, save_dir: str, nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                   mmap: bool = False):
+        """저장된 벡터 DB 로드 (nprobe/ef_search를 주면 저장된 검색 파라미터 대신 사용)
+        
+        mmap=True이면 인덱스/임베딩/메타데이터를 메모리 맵으로 열어 여러 워커 프로세스가
+        같은 페이지를 공유하고, 식당 정보는 검색된 행만 읽음 (읽기 전용 서빙용)
+        save_dir에 CURRENT 포인터가 있으면 포인터가 가리키는 스냅샷을 로드
+        """
+        self.snapshot = current_snapshot(save_dir)
+        if self.snapshot is not None:
+            save_dir = os.path.join(save_dir, SNAPSHOTS_DIR, self.snapshot)
+        elif os.path.basename(os.path.dirname(os.path.normpath(save_dir))) == SNAPSHOTS_DIR:
+            # 스냅샷 디렉토리를 직접 지정한 경우 (SnapshotWatcher)
+            self.snapshot = os.path.basename(os.path.normpath(save_dir))
         
-        # 식당 데이터 로드
-        with open(os.path.join(save_dir, "restaurants.pkl"), "rb") as f:
-            self.restaurants = pickle.load(f)
+        # 인덱스 설정 로드 (설정 파일이 없는 이전 버전 인덱스는 flat)
+        config_path = os.path.join(save_dir, INDEX_CONFIG_FILE)
+        if os.path.exists(config_path):
+            with open(config_path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+            self.index_type = config["index_type"]
+            self.index_params = index_factory.resolve_index_params(config["index_params"])
+            self.index_version = config.get("index_version")
+            embedding = config.get("embedding")
+            if embedding and embedding["model"] != self.model_name:
+                print(f"경고: 인덱스는 {embedding['model']} 임베딩으로 구축되었지만 현재 모델은 {self.model_name}입니다.")
+        else:
+            self.index_type = "flat"
+            self.index_version = None
+        if self.index_version is None:
+            # 버전 정보가 없는 이전 인덱스는 파일 수정 시각으로 구분
+            self.index_version = f"legacy-{int(os.path.getmtime(os.path.join(save_dir, 'faiss_index.index')))}"
+        
+        # FAISS 인덱스 로드 (mmap 플래그는 인덱스 종류별로 다름)
+        io_flags = index_factory.mmap_io_flags(self.index_type) if mmap else 0
+        self.index = faiss.read_index(os.path.join(save_dir, "faiss_index.index"), io_flags)
+        self.set_search_params(
+            nprobe if nprobe is not None else self.index_params["nprobe"],
+            ef_search if ef_search is not None else self.index_params["ef_search"],
+        )
+        
+        # 식당 데이터 로드 (mmap 모드는 컬럼 저장소를 지연 로드, 없으면 pickle)
+        metadata_dir = os.path.join(save_dir, METADATA_DIR)
+        if mmap and os.path.exists(metadata_dir):
+            self.restaurants = RestaurantStore(metadata_dir)
+        else:
+            with open(os.path.join(save_dir, "restaurants.pkl"), "rb") as f:
+                self.restaurants = pickle.load(f)
             
-        # 임베딩 로드
-        self.embeddings = np.load(os.path.join(save_dir, "embeddings.npy"))
+        # 임베딩 로드 (검색에는 쓰이지 않으므로 mmap 모드에서는 필요할 때만 페이지 로드)
+        self.embeddings = np.load(os.path.join(save_dir, "embeddings.npy"), mmap_mode="r" if mmap else None)
+        
+        # 리뷰 청크 인덱스 로드 (있는 경우)
+        chunk_index_path = os.path.join(save_dir, CHUNK_INDEX_FILE)
+        if os.path.exists(chunk_index_path):
+            # 청크 인덱스는 항상 flat
+            self.chunk_index = faiss.read_index(chunk_index_path, index_factory.mmap_io_flags("flat") if mmap else 0)
+            self.chunk_restaurant_ids = np.load(os.path.join(save_dir, CHUNK_IDS_FILE), mmap_mode="r" if mmap else None)
+            print(f"리뷰 청크 인덱스 로드 완료: {self.chunk_index.ntotal}개 청크")
+        
+        # 키워드 역색인 로드 (있는 경우)
+        sparse_dir = os.path.join(save_dir, SPARSE_DIR)
+        if os.path.exists(sparse_dir):
+            self.sparse_index = BM25Index.load(sparse_dir, mmap=mmap)
+            print(f"키워드 역색인 로드 완료: {len(self.sparse_index)}개 문서")
+        
+        # 새 인덱스 버전이 로드되었으므로 이전 검색 결과 캐시 무효화
+        self._invalidate_results()
         
         print(f"벡터 DB 로드 완료: {len(self.restaurants)}개 식당")
 
-def build_restaurant_db():
-    """식당 벡터 DB 구축 메인 함수"""
-    print("=== 식당 추천 벡터 DB 구축 (다중 CSV 파일) ===")
+def load_manifest(save_dir: str) -> Dict:
+    """증분 빌드용 CSV 해시 매니페스트 로드 (없으면 빈 매니페스트)"""
+    manifest_path = os.path.join(save_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return {"files": {}, "next_id": 1}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(save_dir: str, manifest: Dict):
+    """CSV 해시 매니페스트 저장"""
+    os.makedirs(save_dir, exist_ok=True)
+    with open(os.path.join(save_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+def build_manifest(csv_files: List[str], restaurant_data: List[Dict]) -> Dict:
+    """전체 빌드 결과로부터 매니페스트 생성"""
+    from data_preprocessing import file_sha256
+    
+    ids = {restaurant['source_file']: restaurant['id'] for restaurant in restaurant_data}
+    files = {}
+    for csv_file in csv_files:
+        name = os.path.basename(csv_file)
+        files[name] = {"sha256": file_sha256(csv_file), "id": ids.get(name)}
+    next_id = max(ids.values(), default=0) + 1
+    return {"files": files, "next_id": next_id}
+
+def save_dedup_report(save_dir: str, report: Dict):
+    """중복 리뷰 제거 리포트 저장 및 요약 출력"""
+    os.makedirs(save_dir, exist_ok=True)
+    with open(os.path.join(save_dir, DEDUP_REPORT_FILE), "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    summary = (f"유사 중복 리뷰: {report['duplicates']}/{report['reviews']}개 ({report['duplicate_ratio']:.1%}, "
+               f"{report['mode']} 모드)")
+    if report['chunks_saved']:
+        summary += (f", 절약한 청크 {report['chunks_saved']}개, "
+                    f"임베딩 연산 약 {report['estimated_embedding_flops_saved'] / 1e12:.2f} TFLOPs")
+    print(summary)
+
+def update_restaurant_db(data_dir: str, save_dir: str, dedup: Optional[str] = None, dedup_threshold: float = 0.8,
+                         **vector_db_options) -> VectorDB:
+    """추가/변경/삭제된 CSV만 다시 처리하는 증분 빌드"""
+    # pandas 등 전처리 의존성은 구축할 때만 로드 (검색만 하는 서비스의 시작 시간 단축)
+    from data_preprocessing import RestaurantDataProcessor, list_csv_files, file_sha256
+    
+    manifest = load_manifest(save_dir)
+    old_files = manifest["files"]
+    
+    current = {os.path.basename(f): (f, file_sha256(f)) for f in list_csv_files(data_dir)}
+    added = [name for name in current if name not in old_files]
+    changed = [name for name in current if name in old_files and old_files[name]["sha256"] != current[name][1]]
+    removed = [name for name in old_files if name not in current]
+    print(f"CSV 변경 사항: 추가 {len(added)}개, 변경 {len(changed)}개, 삭제 {len(removed)}개")
+    
+    vector_db = VectorDB(**vector_db_options)
+    vector_db.load_index(save_dir)
+    if not (added or changed or removed):
+        print("변경된 CSV가 없어 인덱스를 그대로 유지합니다.")
+        return vector_db
     
-    # 1. 데이터 전처리 (모든 CSV 파일)
-    processor = RestaurantDataProcessor("data/")
-    restaurant_data = processor.preprocess_data()
+    # 변경/삭제된 파일의 기존 식당 제거
+    removed_ids = [old_files[name]["id"] for name in changed + removed if old_files[name]["id"] is not None]
     
-    if not restaurant_data:
-        print("처리할 식당 데이터가 없습니다!")
-        return
+    # 추가/변경된 파일만 전처리 (변경된 식당은 기존 id 유지)
+    processor = RestaurantDataProcessor(data_dir, dedup=dedup, dedup_threshold=dedup_threshold)
+    next_id = manifest["next_id"]
+    added_restaurants = []
+    added_chunks = []
+    added_documents = []
+    files = {name: entry for name, entry in old_files.items() if name not in removed}
+    for name in sorted(changed + added):
+        csv_file, sha256 = current[name]
+        restaurant_id = old_files.get(name, {}).get("id")
+        df = processor.load_csv_file(csv_file)
+        if df is None:
+            files[name] = {"sha256": sha256, "id": None}
+            continue
+        if restaurant_id is None:
+            restaurant_id = next_id
+            next_id += 1
+        restaurant = processor.process_restaurant(df, csv_file, restaurant_id)
+        added_restaurants.append(restaurant)
+        df = processor.deduplicate_reviews(df, csv_file)
+        if vector_db.chunk_index is not None:
+            added_chunks.extend((restaurant_id, chunk) for chunk in processor.extract_review_chunks(df, restaurant))
+        if vector_db.sparse_index is not None:
+            added_documents.append((restaurant_id, processor.build_review_document(df, restaurant)))
+        files[name] = {"sha256": sha256, "id": restaurant_id}
     
-    # 2. 벡터 DB 구축
-    vector_db = VectorDB()
-    vector_db.build_index(restaurant_data)
+    vector_db.update_index(added_restaurants, removed_ids)
+    if vector_db.chunk_index is not None:
+        vector_db.remove_chunks(removed_ids)
+        vector_db.add_chunks(added_chunks)
+    vector_db.update_sparse_index(added_documents, removed_ids)
+    vector_db.save_index(save_dir)
+    save_manifest(save_dir, {"files": files, "next_id": next_id})
+    if dedup:
+        save_dedup_report(save_dir, processor.dedup_report(chunks_embedded=vector_db.chunk_index is not None))
+    return vector_db
+
+def build_restaurant_db(incremental: bool = False, build_chunks: bool = False, data_dir: str = "data/",
+                        save_dir: str = "models/faiss_index", index_type: str = "flat", index_params: Optional[Dict] = None,
+                        workers: int = 0, build_sparse: bool = True, backend: str = "torch",
+                        batch_size: int = 64, max_seq_length: Optional[int] = None, embedding_cache: bool = True,
+                        review_store: Optional[str] = None, dedup: Optional[str] = None,
+                        dedup_threshold: float = 0.8, shard_by: Optional[str] = None, num_shards: int = 4,
+                        shards: Optional[List[str]] = None):
+    """식당 벡터 DB 구축 메인 함수
+    
+    review_store: 리뷰 저장소 디렉토리 (지정하면 전체 빌드에서 CSV 대신 저장소의 필요한 컬럼만 읽음)
+    dedup: 식당별 유사 중복 리뷰 처리 (drop: 청크/키워드 색인과 평점 추정에서 제외, weight: 평점 추정 가중치만 낮춤,
+           None: 처리 안 함). 결과는 save_dir/dedup_report.json
+    shard_by: location / hash이면 샤드별로 따로 구축 (sharded_db 참고, shards를 주거나 incremental이면 해당/변경된 샤드만)
+    """
+    from data_preprocessing import RestaurantDataProcessor, list_csv_files
+    
+    print("=== 식당 추천 벡터 DB 구축 (다중 CSV 파일) ===")
     
-    # 3. 저장
-    vector_db.save_index("models/faiss_index")
+    # 임베딩 설정 (영구 캐시는 인덱스 디렉토리 옆에 두어 전체 재구축에서도 재사용)
+    embedding_options = {
+        "backend": backend,
+        "batch_size": batch_size,
+        "max_seq_length": max_seq_length,
+        "embedding_cache": os.path.join(os.path.dirname(os.path.normpath(save_dir)), "embedding_cache.sqlite")
+                           if embedding_cache else None,
+    }
+    
+    index_exists = os.path.exists(os.path.join(resolve_snapshot(save_dir), "faiss_index.index"))
+    manifest_exists = os.path.exists(os.path.join(save_dir, MANIFEST_FILE))
+    if shard_by is None and incremental and index_exists and manifest_exists:
+        vector_db = update_restaurant_db(data_dir, save_dir, dedup=dedup, dedup_threshold=dedup_threshold,
+                                         **embedding_options)
+    else:
+        if incremental and shard_by is None:
+            print("기존 인덱스/매니페스트가 없어 전체 빌드를 수행합니다.")
+        
+        # 1. 데이터 전처리 (모든 CSV 파일)
+        processor = RestaurantDataProcessor(data_dir, store_dir=review_store, dedup=dedup,
+                                            dedup_threshold=dedup_threshold)
+        restaurant_data = processor.preprocess_data(parallel=workers != 0, max_workers=workers if workers > 0 else None)
+        
+        if not restaurant_data:
+            print("처리할 식당 데이터가 없습니다!")
+            return
+        
+        if shard_by is not None:
+            # 2-3. 샤드별로 구축/저장 후 샤드 구성 게시
+            from sharded_db import ShardedVectorDB
+            
+            vector_db = ShardedVectorDB(shard_by, num_shards, index_type=index_type, index_params=index_params,
+                                        **embedding_options)
+            vector_db.build_shards(processor, restaurant_data, save_dir, build_chunks, build_sparse,
+                                   shards=shards, incremental=incremental)
+        else:
+            # 2. 벡터 DB 구축
+            vector_db = VectorDB(index_type=index_type, index_params=index_params, **embedding_options)
+            vector_db.build_index(restaurant_data)
+            
+            # 2-1. 리뷰 청크 인덱스 구축 (선택)
+            if build_chunks:
+                vector_db.add_chunks(processor.iter_review_chunks(restaurant_data))
+            
+            # 2-2. 전체 리뷰 키워드 역색인 구축 (하이브리드 검색용)
+            if build_sparse:
+                vector_db.build_sparse_index(processor.iter_review_documents(restaurant_data))
+            
+            # 3. 저장
+            vector_db.save_index(save_dir)
+        
+        # 다음 증분 빌드를 위한 매니페스트
+        save_manifest(save_dir, build_manifest(list_csv_files(data_dir), restaurant_data))
+        if dedup:
+            save_dedup_report(save_dir, processor.dedup_report(chunks_embedded=build_chunks))
     
     # 4. 테스트 검색
     print("\n=== 테스트 검색 ===")
@@ -121,12 +920,46 @@ def build_restaurant_db():
         "회식 장소로 좋은 곳"
     ]
     
-    for query in test_queries:
+    for query, results in zip(test_queries, vector_db.search_batch(test_queries, k=3)):
         print(f"\n검색어: '{query}'")
-        results = vector_db.search(query, k=3)
         for i, (restaurant, score) in enumerate(results, 1):
             print(f"{i}. {restaurant['name']} (유사도: {score:.3f})")
             print(f"   위치: {restaurant['location']}, 메뉴: {restaurant['menu_type']}, 리뷰: {restaurant['review_count']}개")
 
 if __name__ == "__main__":
-    build_restaurant_db() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="식당 추천 벡터 DB 구축")
+    parser.add_argument("--incremental", action="store_true", help="추가/변경/삭제된 CSV만 다시 임베딩")
+    parser.add_argument("--chunks", action="store_true", help="리뷰 청크 단위 인덱스도 함께 구축")
+    parser.add_argument("--no-sparse", action="store_true", help="키워드(BM25) 역색인을 구축하지 않음")
+    parser.add_argument("--backend", default="torch", choices=BACKENDS, help="임베딩 백엔드")
+    parser.add_argument("--batch-size", type=int, default=64, help="임베딩 배치 크기")
+    parser.add_argument("--max-seq-length", type=int, help="임베딩 최대 토큰 길이 (기본: 모델 설정)")
+    parser.add_argument("--no-embedding-cache", action="store_true", help="텍스트→임베딩 영구 캐시 사용 안 함")
+    parser.add_argument("--index-type", default="flat", choices=index_factory.INDEX_TYPES, help="FAISS 인덱스 종류")
+    parser.add_argument("--review-store", nargs="?", const="data/review_store",
+                        help="CSV 대신 리뷰 저장소(Parquet) 사용 (review_store.py로 변환, 기본: data/review_store)")
+    parser.add_argument("--dedup", default="none", choices=["drop", "weight", "none"],
+                        help="식당별 유사 중복 리뷰 처리 (drop: 색인/평점에서 제외, weight: 평점 가중치만 낮춤, 기본: none)")
+    parser.add_argument("--dedup-threshold", type=float, default=0.8, help="중복으로 볼 MinHash 추정 Jaccard 유사도")
+    parser.add_argument("--shard-by", choices=["location", "hash"],
+                        help="위치/해시별 샤드로 나눠 샤드마다 따로 구축 (--incremental이면 CSV가 바뀐 샤드만)")
+    parser.add_argument("--num-shards", type=int, default=4, help="hash 샤딩의 샤드 수")
+    parser.add_argument("--shards", nargs="+", help="지정한 샤드만 다시 구축 (예: --shards 홍대)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="CSV 병렬 수집 워커 수 (0: 순차 처리, -1: CPU 코어 수)")
+    parser.add_argument("--metrics", action="store_true", help="단계별 소요 시간/카운터를 수집해 끝난 뒤 출력")
+    parser.add_argument("--metrics-log", help="수집한 지표를 추가할 JSON Lines 파일 (--metrics 포함)")
+    args = parser.parse_args()
+    
+    if args.metrics or args.metrics_log:
+        metrics.METRICS.enable()
+    build_restaurant_db(incremental=args.incremental, build_chunks=args.chunks, index_type=args.index_type,
+                        workers=args.workers, build_sparse=not args.no_sparse, backend=args.backend,
+                        batch_size=args.batch_size, max_seq_length=args.max_seq_length,
+                        embedding_cache=not args.no_embedding_cache, review_store=args.review_store,
+                        dedup=None if args.dedup == "none" else args.dedup, dedup_threshold=args.dedup_threshold,
+                        shard_by=args.shard_by, num_shards=args.num_shards, shards=args.shards)
+    if metrics.METRICS.enabled:
+        print(metrics.METRICS.prometheus_text())
+        if args.metrics_log:
+            metrics.METRICS.log_json(args.metrics_log)
\ No newline at end of file